@@ -0,0 +1,130 @@
+"""
+Descarga y preparación del audio para Whisper.
+
+Modos (env AUDIO_MODE o parámetro `modo`):
+- native: guarda el contenedor que entrega yt-dlp (m4a/webm/mp4) tal cual y
+          faster-whisper lo decodifica directamente. Sin re-encode.
+- pcm:    igual que native, pero decodifica con ffmpeg a PCM float32 16 kHz mono
+          y pasa el array a `WhisperModel.transcribe`. Con `mmap_path` el PCM se
+          escribe a disco (o tmpfs) y se lee con un memory map.
+- mp3:    comportamiento anterior: FFmpegExtractAudio re-codifica a MP3 192 kbps.
+
+yt-dlp y numpy se importan dentro de las funciones: importar este módulo no los
+carga, así las rutas que no transcriben (info, scrape) arrancan rápido.
+"""
+
+import os
+import subprocess
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+AUDIO_MODES = ("native", "pcm", "mp3")
+AUDIO_MODE = os.environ.get("AUDIO_MODE", "native")
+SAMPLE_RATE = 16000
+
+
+def resolver_modo(modo: Optional[str] = None) -> str:
+    modo = (modo or AUDIO_MODE).lower()
+    if modo not in AUDIO_MODES:
+        raise ValueError(f"Modo de audio inválido: {modo} (opciones: {', '.join(AUDIO_MODES)})")
+    return modo
+
+
+def opciones_red() -> Dict[str, Any]:
+    """
+    Opciones de red de yt-dlp desde el entorno, pensadas para fuentes HLS/DASH
+    (lives y videos largos de Facebook) que llegan en cientos de fragmentos:
+    - YTDLP_CONCURRENT_FRAGMENTS: fragmentos en paralelo (concurrent_fragment_downloads, default: 4)
+    - YTDLP_FRAGMENT_RETRIES: reintentos por fragmento (default: 10)
+    - YTDLP_HTTP_CHUNK_SIZE: bytes por request en descargas HTTP directas (evita el throttling
+      de algunos CDN; default: sin partir)
+    """
+    opciones: Dict[str, Any] = {
+        'concurrent_fragment_downloads': int(os.environ.get("YTDLP_CONCURRENT_FRAGMENTS", "4")),
+        'fragment_retries': int(os.environ.get("YTDLP_FRAGMENT_RETRIES", "10")),
+    }
+    if os.environ.get("YTDLP_HTTP_CHUNK_SIZE"):
+        opciones['http_chunk_size'] = int(os.environ["YTDLP_HTTP_CHUNK_SIZE"])
+    return opciones
+
+
+def opciones_descarga(temp_path: str, modo: Optional[str] = None, cookies_path: Optional[str] = None) -> Dict[str, Any]:
+    """Opciones de yt-dlp para el modo indicado"""
+    opciones: Dict[str, Any] = {
+        'format': 'bestaudio/best',
+        'outtmpl': f'{temp_path}.%(ext)s',
+        'quiet': True,
+        'no_warnings': True,
+        **opciones_red()
+    }
+    if resolver_modo(modo) == "mp3":
+        opciones['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': '192',
+        }]
+    if cookies_path and os.path.exists(cookies_path):
+        opciones['cookiefile'] = cookies_path
+    return opciones
+
+
+def extraer_info(url: str, cookies_path: Optional[str] = None) -> Dict[str, Any]:
+    """Metadatos de yt-dlp sin descargar (extractor, id, duración...)"""
+    opciones: Dict[str, Any] = {'format': 'bestaudio/best', 'quiet': True, 'no_warnings': True, 'skip_download': True}
+    if cookies_path and os.path.exists(cookies_path):
+        opciones['cookiefile'] = cookies_path
+    import yt_dlp
+    with yt_dlp.YoutubeDL(opciones) as ydl:
+        return ydl.extract_info(url, download=False)
+
+
+def descargar(url: str, temp_path: str, modo: Optional[str] = None, cookies_path: Optional[str] = None,
+              info: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Descarga el audio y devuelve la ruta real del archivo (la extensión depende del modo).
+    Si se pasa el `info` de `extraer_info`, se reutiliza en vez de volver a extraer.
+    """
+    import yt_dlp
+    opciones = opciones_descarga(temp_path, modo, cookies_path)
+    with yt_dlp.YoutubeDL(opciones) as ydl:
+        if info:
+            info = ydl.process_ie_result(ydl.sanitize_info(info), download=True)
+        else:
+            info = ydl.extract_info(url, download=True)
+        descargas = info.get("requested_downloads") or []
+        if descargas and descargas[-1].get("filepath"):
+            return descargas[-1]["filepath"]
+        if resolver_modo(modo) == "mp3":
+            return f"{temp_path}.mp3"
+        return ydl.prepare_filename(info)
+
+
+def decodificar_pcm(archivo: str, mmap_path: Optional[str] = None, sample_rate: int = SAMPLE_RATE) -> "np.ndarray":
+    """
+    Decodifica cualquier contenedor a PCM float32 mono con ffmpeg.
+    Sin `mmap_path` el audio queda en memoria; con `mmap_path` se escribe ahí
+    y se devuelve un np.memmap de solo lectura.
+    """
+    import numpy as np
+    comando = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0",
+        "-i", archivo,
+        "-f", "f32le", "-ac", "1", "-ar", str(sample_rate),
+    ]
+    if mmap_path:
+        subprocess.run(comando + ["-y", mmap_path], check=True)
+        if os.path.getsize(mmap_path) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(mmap_path, dtype=np.float32, mode="r")
+
+    salida = subprocess.run(comando + ["-"], check=True, stdout=subprocess.PIPE).stdout
+    return np.frombuffer(salida, dtype=np.float32)
+
+
+def preparar_entrada(archivo: str, modo: Optional[str] = None, mmap_path: Optional[str] = None) -> Union[str, "np.ndarray"]:
+    """Lo que se le pasa a `WhisperModel.transcribe`: la ruta o el PCM ya decodificado"""
+    if resolver_modo(modo) == "pcm":
+        return decodificar_pcm(archivo, mmap_path=mmap_path)
+    return archivo
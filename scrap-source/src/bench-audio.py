@@ -0,0 +1,101 @@
+"""
+Benchmark de preparación de audio para Whisper.
+
+Compara, sobre archivos locales (m4a/webm/mp4 tal como los baja yt-dlp):
+- mp3:    re-encode a MP3 192 kbps (lo que hacía FFmpegExtractAudio) + transcribir el mp3
+- native: transcribir el contenedor original directamente
+- pcm:    decodificar a PCM float32 16 kHz mono (en memoria) + transcribir el array
+- mmap:   igual que pcm, pero a través de un archivo memory-mapped
+
+Uso:
+    python src/bench-audio.py muestras/*.m4a
+    python src/bench-audio.py muestras/*.m4a --skip-transcribe   # solo preparación
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from audio import decodificar_pcm
+from workspace import JobWorkspace
+
+PATHS = ["mp3", "native", "pcm", "mmap"]
+
+
+def encode_mp3(archivo: str, destino: str):
+    subprocess.run([
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+        "-i", archivo, "-vn", "-codec:a", "libmp3lame", "-b:a", "192k", destino
+    ], check=True)
+
+
+def run_path(path: str, archivo: str, ws: JobWorkspace, model, beam_size: int) -> Dict[str, float]:
+    """Ejecuta un camino y devuelve tiempos (s) y bytes escritos a disco"""
+    t0 = time.perf_counter()
+    bytes_escritos = 0
+    entrada = archivo
+
+    if path == "mp3":
+        entrada = ws.path("bench.mp3")
+        encode_mp3(archivo, entrada)
+        bytes_escritos = os.path.getsize(entrada)
+    elif path == "pcm":
+        entrada = decodificar_pcm(archivo)
+    elif path == "mmap":
+        mmap_path = ws.path("bench.pcm")
+        entrada = decodificar_pcm(archivo, mmap_path=mmap_path)
+        bytes_escritos = os.path.getsize(mmap_path)
+    preparacion = time.perf_counter() - t0
+
+    transcripcion = 0.0
+    if model is not None:
+        t0 = time.perf_counter()
+        segments, _ = model.transcribe(entrada, beam_size=beam_size)
+        for _ in segments:
+            pass
+        transcripcion = time.perf_counter() - t0
+
+    return {"preparacion": preparacion, "transcripcion": transcripcion, "bytes": bytes_escritos}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara mp3 vs contenedor nativo vs PCM 16 kHz para Whisper")
+    parser.add_argument("archivos", nargs="+", help="Archivos de audio/video locales")
+    parser.add_argument("--paths", default=",".join(PATHS), help=f"Caminos a medir ({','.join(PATHS)})")
+    parser.add_argument("--model", default=os.environ.get("WHISPER_MODEL_SIZE", "small"), help="Tamaño del modelo")
+    parser.add_argument("--beam-size", type=int, default=5)
+    parser.add_argument("--skip-transcribe", action="store_true", help="Medir solo la preparación del audio")
+    args = parser.parse_args()
+
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+    model = None
+    if not args.skip_transcribe:
+        from faster_whisper import WhisperModel
+        model = WhisperModel(args.model, device="cpu", compute_type="int8")
+
+    totales: Dict[str, List[float]] = {p: [] for p in paths}
+    with JobWorkspace("bench-audio") as ws:
+        for archivo in args.archivos:
+            print(f"\n🎧 {archivo} ({os.path.getsize(archivo) / 1e6:.1f} MB)")
+            for path in paths:
+                r = run_path(path, archivo, ws, model, args.beam_size)
+                total = r["preparacion"] + r["transcripcion"]
+                totales[path].append(total)
+                print(f"  {path:7s} preparación {r['preparacion']:7.2f}s | transcripción {r['transcripcion']:7.2f}s | "
+                      f"total {total:7.2f}s | escrito {r['bytes'] / 1e6:7.1f} MB")
+
+    print("\n📊 Total por camino")
+    base = sum(totales.get("mp3", [])) or None
+    for path in paths:
+        total = sum(totales[path])
+        extra = f" ({base / total:.2f}x vs mp3)" if base and total else ""
+        print(f"  {path:7s} {total:8.2f}s{extra}")
+
+
+if __name__ == "__main__":
+    main()
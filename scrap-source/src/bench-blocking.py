@@ -0,0 +1,88 @@
+"""
+Benchmark del bloqueo de recursos (blocking.py).
+
+Carga los mismos posts con cada preset de bloqueo, en un contexto nuevo cada vez
+(sin caché), y mide:
+- dcl s:    tiempo hasta domcontentloaded
+- ready s:  tiempo hasta que el DOM y la red quedan quietos (PageWaiter.settle)
+- MB:       bytes de respuesta transferidos (headers + body)
+- requests: peticiones completadas / bloqueadas o fallidas
+
+Uso:
+    python src/bench-blocking.py --url "URL" --cookies facebook-cookies.json
+    python src/bench-blocking.py --list posts.txt --presets off media aggressive --runs 2
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from blocking import BLOCK_PRESETS, TrafficMeter, resolve_block_policy
+from browser_pool import CONTEXT_OPTIONS, LAUNCH_ARGS
+from cookies import load_cookies
+from waits import PageWaiter
+
+
+def measure(browser, url: str, preset: str, cookies: Optional[List[Dict]]) -> Dict[str, float]:
+    policy = resolve_block_policy(preset, types=[], urls=[])
+    context = browser.new_context(**CONTEXT_OPTIONS)
+    policy.apply(context)
+    if cookies:
+        context.add_cookies(cookies)
+    page = context.new_page()
+    meter = TrafficMeter(page)
+    waiter = PageWaiter(page, jitter=(0.0, 0.0))
+    try:
+        t0 = time.perf_counter()
+        page.goto(url, wait_until="domcontentloaded", timeout=60000)
+        dcl = time.perf_counter() - t0
+        waiter.settle()
+        ready = time.perf_counter() - t0
+        return {"dcl": dcl, "ready": ready, "bytes": meter.bytes, "requests": meter.requests,
+                "failed": meter.failed, "blocked": policy.summary()["blocked"]}
+    finally:
+        waiter.close()
+        context.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes y tiempo de carga con y sin bloqueo de recursos")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--url", help="URL del post")
+    grupo.add_argument("--list", help="Archivo con una URL por línea")
+    parser.add_argument("--cookies", default=None, help="JSON de cookies (opcional)")
+    parser.add_argument("--presets", nargs="*", choices=list(BLOCK_PRESETS), default=["off", "aggressive"])
+    parser.add_argument("--runs", type=int, default=1, help="Repeticiones por preset (se promedian)")
+    parser.add_argument("--headed", action="store_true", help="Con ventana")
+    args = parser.parse_args()
+
+    if args.list:
+        with open(args.list, "r", encoding="utf-8") as f:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        urls = [args.url]
+    cookies = load_cookies(args.cookies) if args.cookies else None
+
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=not args.headed, args=LAUNCH_ARGS)
+        print(f"{'preset':<12} {'dcl s':>7} {'ready s':>8} {'MB':>8} {'requests':>9} {'bloq.':>6}")
+        base_bytes = None
+        for preset in args.presets:
+            filas = [measure(browser, url, preset, cookies) for url in urls for _ in range(args.runs)]
+            n = len(filas)
+            media = {k: sum(f[k] for f in filas) / n for k in filas[0]}
+            base_bytes = base_bytes or media["bytes"]
+            ahorro = f"  (-{1 - media['bytes'] / base_bytes:.0%})" if base_bytes and preset != args.presets[0] else ""
+            print(f"{preset:<12} {media['dcl']:>7.2f} {media['ready']:>8.2f} {media['bytes'] / 1e6:>8.2f} "
+                  f"{media['requests']:>9.0f} {media['blocked']:>6.0f}{ahorro}")
+        browser.close()
+
+
+if __name__ == "__main__":
+    main()
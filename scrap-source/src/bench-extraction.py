@@ -0,0 +1,142 @@
+"""
+Benchmark de extracción de comentarios sobre HTML guardado.
+
+Compara el recorrido anterior (varias llamadas de Playwright por bloque) con
+extraction.extract_comments (un solo page.evaluate) y verifica que ambos
+devuelvan los mismos comentarios.
+
+Fixtures:
+- HTML guardado con `scraper-fb-comments.py --save-html` (o page.content())
+- --synthetic N: genera un post con N comentarios con la estructura de Facebook
+
+Uso:
+    python src/bench-extraction.py datos-crudos/page_*.html
+    python src/bench-extraction.py --synthetic 1000 --runs 3
+"""
+
+import argparse
+import html
+import sys
+import os
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from extraction import AUTHOR_SELECTORS, COMMENT_SELECTORS, TEXT_SELECTORS, extract_comments
+
+
+def extract_comments_locators(page) -> List[Dict]:
+    """El recorrido anterior, un round trip por cada count()/inner_text()/all_inner_texts()"""
+    results = []
+    comment_blocks = None
+    for selector in COMMENT_SELECTORS:
+        blocks = page.locator(selector)
+        if blocks.count() > 0:
+            comment_blocks = blocks
+            break
+    if not comment_blocks:
+        return results
+
+    for i in range(comment_blocks.count()):
+        try:
+            block = comment_blocks.nth(i)
+            author = ""
+            for auth_sel in AUTHOR_SELECTORS:
+                try:
+                    auth_elem = block.locator(auth_sel).first
+                    if auth_elem.count() > 0:
+                        author = auth_elem.inner_text(timeout=1000).strip()
+                        if author:
+                            break
+                except Exception:
+                    continue
+
+            texts = []
+            for text_sel in TEXT_SELECTORS:
+                try:
+                    spans = block.locator(text_sel)
+                    if spans.count() > 0:
+                        for text in spans.all_inner_texts():
+                            text = text.strip()
+                            if text and text != author and len(text) > 1:
+                                texts.append(text)
+                except Exception:
+                    continue
+
+            body = " ".join(dict.fromkeys(texts))
+            if (author and len(author) > 1) or (body and len(body) > 2):
+                comment = {"author": author, "text": body}
+                if comment not in results:
+                    results.append(comment)
+        except Exception:
+            continue
+    return results
+
+
+def synthetic_post(n: int) -> str:
+    """Post con n comentarios (autor en <strong>, texto en span[dir=auto], link con comment_id)"""
+    bloques = []
+    for i in range(n):
+        bloques.append(
+            f'<div role="article" aria-label="Comentario de Usuario {i}">'
+            f'<div><div><a role="link" href="/post/1?comment_id={100000 + i}"><strong>Usuario {i}</strong></a></div>'
+            f'<div><span dir="auto">{html.escape(f"Comentario número {i} sobre el debate, opinión {i % 7}")}</span></div>'
+            f'<div><span>Me gusta</span> <span>Responder</span></div></div></div>'
+        )
+    return f"<html><body><div id='comments'>{''.join(bloques)}</div></body></html>"
+
+
+def measure(fn, page, runs: int) -> Tuple[float, List[Dict]]:
+    tiempos = []
+    resultado: List[Dict] = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        resultado = fn(page)
+        tiempos.append(time.perf_counter() - t0)
+    return min(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la extracción por locators con la de un solo evaluate")
+    parser.add_argument("fixtures", nargs="*", help="Archivos HTML guardados")
+    parser.add_argument("--synthetic", type=int, nargs="*", default=None,
+                        help="Generar posts sintéticos con N comentarios (ej: --synthetic 100 1000)")
+    parser.add_argument("--runs", type=int, default=3, help="Repeticiones (se reporta la mejor)")
+    parser.add_argument("--skip-locators", action="store_true", help="No medir el recorrido anterior (lento con miles)")
+    args = parser.parse_args()
+
+    casos = [(ruta, open(ruta, "r", encoding="utf-8").read()) for ruta in args.fixtures]
+    casos += [(f"sintético-{n}", synthetic_post(n)) for n in (args.synthetic or [])]
+    if not casos:
+        parser.error("Indica archivos HTML o --synthetic N")
+
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        context = browser.new_context(java_script_enabled=True)
+        # Las fixtures guardadas no deben salir a la red
+        context.route("**/*", lambda route: route.abort())
+        page = context.new_page()
+
+        print(f"{'fixture':<40} {'coment.':>8} {'locators s':>11} {'evaluate s':>11} {'speedup':>8}  iguales")
+        for nombre, contenido in casos:
+            page.set_content(contenido, wait_until="domcontentloaded")
+            t_eval, nuevos = measure(extract_comments, page, args.runs)
+
+            if args.skip_locators:
+                print(f"{nombre[-40:]:<40} {len(nuevos):>8} {'-':>11} {t_eval:>11.3f} {'-':>8}  -")
+                continue
+
+            t_loc, viejos = measure(extract_comments_locators, page, args.runs)
+            iguales = [(c["author"], c["text"]) for c in viejos] == [(c["author"], c["text"]) for c in nuevos]
+            print(f"{nombre[-40:]:<40} {len(nuevos):>8} {t_loc:>11.3f} {t_eval:>11.3f} "
+                  f"{t_loc / t_eval if t_eval else 0:>7.1f}x  {'sí' if iguales else 'NO'}")
+
+        context.close()
+        browser.close()
+
+
+if __name__ == "__main__":
+    main()
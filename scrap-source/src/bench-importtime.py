@@ -0,0 +1,143 @@
+"""
+Benchmark de tiempo de import (arranque en frío) de la función de Appwrite.
+
+Ejecuta `python -X importtime` en un proceso nuevo por escenario y:
+- reporta el tiempo de `import main` y los módulos más pesados,
+- falla (exit 1) si se carga alguna dependencia pesada que ese escenario no
+  necesita, o si el total supera el presupuesto.
+
+Escenarios:
+- import: solo `import main` (lo que paga cada arranque en frío)
+- get:    `import main` + atender un GET de info con un contexto falso
+
+Uso:
+    python src/bench-importtime.py
+    python src/bench-importtime.py --budget-ms 200 --runs 5 --top 20
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Ninguna de estas debería cargarse para el GET ni al importar main
+HEAVY_MODULES = [
+    "yt_dlp", "faster_whisper", "ctranslate2", "av", "numpy", "onnxruntime",
+    "tokenizers", "huggingface_hub", "playwright", "appwrite", "requests",
+]
+
+FAKE_CONTEXT = """
+class _Res:
+    def json(self, data, status=200):
+        return data
+class _Req:
+    method = "GET"
+    body = ""
+class _Ctx:
+    req = _Req()
+    res = _Res()
+    def log(self, *a): pass
+    def error(self, *a): pass
+main.main(_Ctx())
+"""
+
+SCENARIOS = {
+    "import": "import main",
+    "get": "import main\n" + FAKE_CONTEXT,
+}
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_scenario(code: str) -> Tuple[List[Tuple[str, int, int, int]], str]:
+    """Devuelve [(módulo, self_us, cumulative_us, nivel)] y el stderr crudo"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "falló el proceso")
+
+    filas = []
+    for line in proc.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            self_us, cum_us, indent, modulo = m.groups()
+            filas.append((modulo, int(self_us), int(cum_us), (len(indent) - 1) // 2))
+    return filas, proc.stderr
+
+
+def subarbol_main(filas: List[Tuple[str, int, int, int]]) -> List[Tuple[str, int, int, int]]:
+    """Filas importadas por `main` (site/encodings son del intérprete, no de la función)"""
+    # -X importtime lista cada módulo después de sus dependencias (post-orden)
+    for i, (modulo, _, _, nivel) in enumerate(filas):
+        if modulo == "main" and nivel == 0:
+            inicio = i
+            while inicio > 0 and filas[inicio - 1][3] > 0:
+                inicio -= 1
+            return filas[inicio:i + 1]
+    return []
+
+
+def resumen(filas: List[Tuple[str, int, int, int]]) -> Dict[str, object]:
+    total_us = next((cum for modulo, _, cum, nivel in filas if modulo == "main" and nivel == 0), 0)
+    cargados = {modulo.split(".")[0] for modulo, _, _, _ in filas}
+    return {
+        "total_ms": total_us / 1000,
+        "heavy": sorted(m for m in HEAVY_MODULES if m in cargados),
+        "modulos": len(filas),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el tiempo de import de main.py")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--runs", type=int, default=5, help="Repeticiones por escenario (se reporta la mediana)")
+    parser.add_argument("--top", type=int, default=15, help="Módulos más pesados a mostrar")
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="Máximo de import total aceptado")
+    args = parser.parse_args()
+
+    fallas = []
+    for nombre in args.scenarios:
+        totales = []
+        filas: List[Tuple[str, int, int, int]] = []
+        for _ in range(args.runs):
+            try:
+                filas, _ = run_scenario(SCENARIOS[nombre])
+            except RuntimeError as e:
+                print(f"❌ {nombre}: {e}")
+                fallas.append(nombre)
+                break
+            totales.append(resumen(filas)["total_ms"])
+        if not totales:
+            continue
+
+        datos = resumen(filas)
+        mediana = statistics.median(totales)
+        print(f"\n=== {nombre} ===")
+        print(f"total: {mediana:.1f} ms (mediana de {len(totales)}, min {min(totales):.1f} ms), "
+              f"{datos['modulos']} módulos")
+        print(f"{'self ms':>9} {'cum ms':>9}  módulo")
+        for modulo, self_us, cum_us, nivel in sorted(subarbol_main(filas), key=lambda f: f[2], reverse=True)[:args.top]:
+            print(f"{self_us / 1000:9.1f} {cum_us / 1000:9.1f}  {'  ' * nivel}{modulo}")
+
+        if datos["heavy"]:
+            print(f"❌ Dependencias pesadas cargadas: {', '.join(datos['heavy'])}")
+            fallas.append(nombre)
+        if mediana > args.budget_ms:
+            print(f"❌ Supera el presupuesto de {args.budget_ms:.0f} ms")
+            fallas.append(nombre)
+
+    if fallas:
+        print(f"\n❌ Regresión en: {', '.join(sorted(set(fallas)))}")
+        sys.exit(1)
+    print("\n✅ Sin regresiones de import")
+
+
+if __name__ == "__main__":
+    main()
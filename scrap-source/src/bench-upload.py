@@ -0,0 +1,128 @@
+"""
+Benchmark de la subida de resultados a Appwrite Storage.
+
+Compara, con datos sintéticos del tamaño de un dump de comentarios o de una
+transcripción larga:
+- legacy:  json.dump(indent=2) a un archivo temporal + InputFile.from_path
+           ("temp MB" = bytes escritos a ese archivo)
+- compact: JSON compacto desde memoria (uploads.upload_json)
+- gzip:    JSON compacto + gzip desde memoria
+
+Por defecto sube al stand-in local (local_storage.LocalStorage, en un directorio
+temporal); con --appwrite usa el servidor de las variables APPWRITE_*.
+
+Uso:
+    python src/bench-upload.py --comments 1000 10000 100000
+    python src/bench-upload.py --segments 5000 --appwrite
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from uploads import serialize_json, upload_json
+from workspace import JobWorkspace
+
+
+def synthetic_comments(n: int) -> Dict[str, Any]:
+    comentarios = [{
+        "comment_id": str(1000000 + i), "author": f"Usuario {i}", "author_id": str(500000 + i % 997),
+        "text": f"Comentario número {i} sobre el debate de anoche, con opinión {i % 13} y algo más de texto",
+        "created_time": "2026-01-01T12:00:00+00:00", "parent_id": str(1000000 + i - 1) if i % 5 else None,
+        "reactions": i % 37, "depth": 1 if i % 5 else 0,
+    } for i in range(n)]
+    return {"url_origen": "https://facebook.com/post/1", "fecha_scraping": "2026-01-01T12:00:00",
+            "total_comentarios": n, "comentarios": comentarios}
+
+
+def synthetic_transcript(n: int) -> Dict[str, Any]:
+    segmentos = [{"start": i * 2.5, "end": i * 2.5 + 2.4,
+                  "text": f" y entonces el candidato dijo que la propuesta número {i} iba a cambiar todo"}
+                 for i in range(n)]
+    return {"url_origen": "https://facebook.com/video/1", "idioma": "es", "probabilidad_idioma": 0.99,
+            "texto_completo": "".join(s["text"] for s in segmentos).strip(), "segmentos": segmentos}
+
+
+def legacy_upload(storage, bucket_id: str, data: Any, filename: str) -> Tuple[Dict[str, Any], int]:
+    """El camino anterior de main.upload_to_bucket; devuelve también los bytes escritos a disco"""
+    import json
+    from appwrite.id import ID
+    from appwrite.input_file import InputFile
+
+    with JobWorkspace("upload") as ws:
+        filepath = ws.path(filename)
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        escritos = os.path.getsize(filepath)
+        return storage.create_file(bucket_id=bucket_id, file_id=ID.unique(), file=InputFile.from_path(filepath)), escritos
+
+
+def measure(fn: Callable[[], Tuple[Dict[str, Any], int]], runs: int) -> Tuple[float, Dict[str, Any], int]:
+    mejor = float("inf")
+    resultado: Dict[str, Any] = {}
+    escritos = 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        resultado, escritos = fn()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, resultado, escritos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes y tiempo de subida: temp file indentado vs memoria compacta/gzip")
+    parser.add_argument("--comments", type=int, nargs="*", default=None, help="Dumps de N comentarios")
+    parser.add_argument("--segments", type=int, nargs="*", default=None, help="Transcripciones de N segmentos")
+    parser.add_argument("--runs", type=int, default=3, help="Repeticiones (se reporta la mejor)")
+    parser.add_argument("--appwrite", action="store_true", help="Subir al servidor de APPWRITE_* en vez del stand-in")
+    args = parser.parse_args()
+
+    casos: List[Tuple[str, Any]] = [(f"comentarios-{n}", synthetic_comments(n)) for n in (args.comments or [])]
+    casos += [(f"segmentos-{n}", synthetic_transcript(n)) for n in (args.segments or [])]
+    if not casos:
+        casos = [(f"comentarios-{n}", synthetic_comments(n)) for n in (1000, 20000)]
+
+    tmpdir = None
+    if args.appwrite:
+        from appwrite.client import Client
+        from appwrite.services.storage import Storage
+        client = Client()
+        client.set_endpoint(os.environ["APPWRITE_ENDPOINT"])
+        client.set_project(os.environ["APPWRITE_PROJECT_ID"])
+        client.set_key(os.environ["APPWRITE_API_KEY"])
+        storage = Storage(client)
+        bucket_id = os.environ["APPWRITE_BUCKET_ID"]
+    else:
+        from local_storage import LocalStorage
+        tmpdir = tempfile.mkdtemp(prefix="bench-upload-")
+        storage = LocalStorage(tmpdir)
+        bucket_id = "bench"
+
+    try:
+        print(f"{'caso':<20} {'método':<8} {'payload MB':>11} {'temp MB':>11} {'serializar s':>13} {'total s':>8}")
+        for nombre, data in casos:
+            metodos = [
+                ("legacy", lambda: legacy_upload(storage, bucket_id, data, f"{nombre}.json")),
+                ("compact", lambda: (upload_json(storage, bucket_id, data, f"{nombre}.json", compress=False), 0)),
+                ("gzip", lambda: (upload_json(storage, bucket_id, data, f"{nombre}.json", compress=True), 0)),
+            ]
+            for metodo, fn in metodos:
+                t_total, resultado, escritos = measure(fn, args.runs)
+                t0 = time.perf_counter()
+                payload, _, _ = serialize_json(data, nombre, compress=(metodo == "gzip"))
+                t_serial = time.perf_counter() - t0
+                tamano = resultado.get("sizeOriginal") or len(payload)
+                print(f"{nombre:<20} {metodo:<8} {tamano / 1e6:>11.2f} {escritos / 1e6:>11.2f} "
+                      f"{t_serial if metodo != 'legacy' else float('nan'):>13.3f} {t_total:>8.3f}")
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Pool de navegadores Chromium persistentes para el scraper de Facebook.
+
+Lanzar Chromium tarda varios segundos; el pool lo lanza una vez y reutiliza el
+navegador para todos los posts:
+
+- Cada worker es un hilo dueño de su propio Playwright + Chromium (la API sync
+  de Playwright no se puede compartir entre hilos). Con N workers se scrapean
+  N posts en paralelo.
+- Los contextos se crean una vez por juego de cookies y se reutilizan; cada
+  post abre una página nueva en ese contexto y la cierra al terminar.
+- Health check antes de cada job: si el navegador se cayó se relanza.
+- Política de reciclado: después de `max_pages` páginas el navegador se cierra y
+  se relanza, para acotar la memoria que Chromium va acumulando.
+- `block_policy` (blocking.BlockPolicy) se instala en cada contexto para no
+  descargar imágenes, video ni fuentes.
+
+Uso:
+    with BrowserPool(workers=2) as pool:
+        futures = [pool.submit(scrape_post, url, cookies=cookies) for url in urls]
+        resultados = [f.result() for f in futures]
+
+`fn` recibe la página como primer argumento: fn(page, *args, **kwargs).
+"""
+
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from cookies import cookies_key
+
+LAUNCH_ARGS = [
+    '--no-proxy-server',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-gpu'
+]
+
+CONTEXT_OPTIONS = {"bypass_csp": True, "ignore_https_errors": True}
+
+
+class _Worker(threading.Thread):
+    """Hilo dueño de un Chromium; ejecuta los jobs de la cola del pool"""
+
+    def __init__(self, pool: "BrowserPool", index: int):
+        super().__init__(name=f"browser-pool-{index}", daemon=True)
+        self.pool = pool
+        self.playwright = None
+        self.browser = None
+        self.contexts: "OrderedDict[str, Any]" = OrderedDict()
+        self.pages_served = 0
+
+    # ---- ciclo de vida del navegador ----
+
+    def _launch(self):
+        self.browser = self.playwright.chromium.launch(headless=self.pool.headless, args=self.pool.launch_args)
+        self.pages_served = 0
+        self.pool._count("launches")
+
+    def _close_browser(self):
+        for context in self.contexts.values():
+            try:
+                context.close()
+            except Exception:
+                pass
+        self.contexts.clear()
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+        self.browser = None
+
+    def _healthy(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+    def _ensure_browser(self):
+        if self._healthy():
+            return
+        if self.browser is not None:
+            print(f"⚠️  [{self.name}] Navegador caído, relanzando...")
+            self.pool._count("restarts")
+            self._close_browser()
+        self._launch()
+
+    def _context(self, cookies: Optional[List[Dict]]):
+        key = cookies_key(cookies)
+        if key in self.contexts:
+            self.contexts.move_to_end(key)
+            return self.contexts[key]
+        context = self.browser.new_context(**self.pool.context_options)
+        if self.pool.block_policy is not None:
+            self.pool.block_policy.apply(context)
+        if cookies:
+            context.add_cookies(cookies)
+        self.contexts[key] = context
+        # Pocas sesiones distintas a la vez: se cierra la menos usada
+        while len(self.contexts) > self.pool.max_contexts:
+            _, viejo = self.contexts.popitem(last=False)
+            try:
+                viejo.close()
+            except Exception:
+                pass
+        return context
+
+    # ---- loop ----
+
+    def _run_job(self, fn: Callable, args, kwargs, cookies) -> Any:
+        self._ensure_browser()
+        page = self._context(cookies).new_page()
+        try:
+            return fn(page, *args, **kwargs)
+        finally:
+            try:
+                page.close()
+            except Exception:
+                pass
+            self.pages_served += 1
+            self.pool._count("pages")
+            if self.pages_served >= self.pool.max_pages:
+                self.pool._count("recycles")
+                self._close_browser()
+
+    def run(self):
+        error = None
+        try:
+            from playwright.sync_api import sync_playwright
+            self.playwright = sync_playwright().start()
+        except Exception as e:
+            # Sin Playwright los jobs fallan con el error en vez de quedar colgados
+            error = e
+        try:
+            while True:
+                job = self.pool._jobs.get()
+                if job is None:
+                    break
+                fn, args, kwargs, cookies, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                    continue
+                try:
+                    future.set_result(self._run_job(fn, args, kwargs, cookies))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            self._close_browser()
+            if self.playwright is not None:
+                self.playwright.stop()
+
+
+class BrowserPool:
+    """N navegadores persistentes (uno por hilo worker) que atienden jobs de una cola común"""
+
+    def __init__(self, workers: int = 1, headless: bool = True, max_pages: int = 50, max_contexts: int = 4,
+                 launch_args: Optional[List[str]] = None, context_options: Optional[Dict[str, Any]] = None,
+                 block_policy: Optional[Any] = None):
+        if workers < 1:
+            raise ValueError(f"workers debe ser >= 1: {workers}")
+        self.headless = headless
+        self.max_pages = max_pages
+        self.max_contexts = max_contexts
+        self.launch_args = LAUNCH_ARGS if launch_args is None else launch_args
+        self.context_options = CONTEXT_OPTIONS if context_options is None else context_options
+        self.block_policy = block_policy
+        self.stats = {"launches": 0, "restarts": 0, "recycles": 0, "pages": 0}
+        self._stats_lock = threading.Lock()
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._workers = [_Worker(self, i) for i in range(workers)]
+        self._closed = False
+        for worker in self._workers:
+            worker.start()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    def submit(self, fn: Callable, *args, cookies: Optional[List[Dict]] = None, **kwargs) -> Future:
+        """Encola fn(page, *args, **kwargs); la página se abre con esas cookies"""
+        if self._closed:
+            raise RuntimeError("El pool de navegadores está cerrado")
+        future: Future = Future()
+        self._jobs.put((fn, args, kwargs, cookies, future))
+        return future
+
+    def run(self, fn: Callable, *args, cookies: Optional[List[Dict]] = None, **kwargs) -> Any:
+        return self.submit(fn, *args, cookies=cookies, **kwargs).result()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,173 @@
+"""
+Búsqueda del botón "ver más comentarios" en una sola consulta.
+
+Antes, en cada iteración se armaban ~19 selectores (`span:has-text`, `div:has-text`
+por label y los de aria/role) y se probaban uno por uno con
+`is_visible(timeout=1000)`: en el peor caso ~19 s por iteración. Aquí:
+
+- un solo `page.evaluate` recorre los nodos de texto una vez, resuelve todos
+  los candidatos en el mismo orden de prioridad y marca el primer elemento
+  visible con un atributo para hacer click con un locator directo;
+- el candidato que funcionó se recuerda por idioma de la página (`<html lang>`)
+  y se prueba primero en las siguientes búsquedas del proceso;
+- se lleva la cuenta de aciertos por candidato para detectar selectores muertos.
+
+`AsyncButtonFinder` hace lo mismo con páginas de playwright.async_api y comparte
+las mismas estadísticas.
+"""
+
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+MARK_ATTR = "data-scrap-button"
+
+FIND_JS = """
+({candidates, mark}) => {
+    document.querySelectorAll("[" + mark + "]").forEach((el) => el.removeAttribute(mark));
+
+    const visible = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) return false;
+        return getComputedStyle(el).visibility !== "hidden";
+    };
+
+    // Una sola pasada por los nodos de texto para todos los labels
+    const labels = [...new Set(candidates.filter((c) => c.text).map((c) => c.text))];
+    const textHits = new Map(labels.map((l) => [l, []]));
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+        const value = node.nodeValue.toLowerCase();
+        if (!value.trim()) continue;
+        for (const label of labels) {
+            if (value.includes(label)) textHits.get(label).push(node.parentElement);
+        }
+    }
+
+    const find = (c) => {
+        if (c.css) {
+            try {
+                return Array.from(document.querySelectorAll(c.css)).find(visible) || null;
+            } catch (e) { return null; }
+        }
+        for (const parent of textHits.get(c.text)) {
+            const el = parent && parent.closest(c.within);
+            if (el && visible(el)) return el;
+        }
+        return null;
+    };
+
+    for (let i = 0; i < candidates.length; i++) {
+        const el = find(candidates[i]);
+        if (el) {
+            el.setAttribute(mark, "1");
+            return {index: i, lang: document.documentElement.lang || ""};
+        }
+    }
+    return {index: -1, lang: document.documentElement.lang || ""};
+}
+"""
+
+# Estadísticas y ganadores compartidos por todas las páginas del proceso
+_lock = threading.Lock()
+_hits: Counter = Counter()
+_winners: Dict[str, str] = {}
+_last_winner: Dict[str, Optional[str]] = {"key": None}
+_searches = {"total": 0, "found": 0, "cached_first": 0}
+
+
+def build_candidates(labels: List[str]) -> List[Dict[str, str]]:
+    """Los mismos candidatos y en el mismo orden que los selectores anteriores"""
+    candidates = [{"key": f'span:has-text("{label}")', "within": "span", "text": label.lower()} for label in labels]
+    candidates += [{"key": f'div:has-text("{label}")', "within": "div", "text": label.lower()} for label in labels]
+    candidates += [
+        {"key": '[aria-label*="comments"]', "css": '[aria-label*="comments"]'},
+        {"key": '[role="button"]:has-text("más")', "within": '[role="button"]', "text": "más"},
+        {"key": '[role="button"]:has-text("more")', "within": '[role="button"]', "text": "more"},
+    ]
+    return candidates
+
+
+class ButtonFinder:
+    """Encuentra y clickea el botón de más comentarios de una página"""
+
+    def __init__(self, page, labels: List[str]):
+        self.page = page
+        self.candidates = build_candidates(labels)
+        self.keys = [c["key"] for c in self.candidates]
+        self.lang: Optional[str] = None
+        self.last_key: Optional[str] = None
+
+    def _ordered(self) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """Candidatos con el ganador cacheado primero (el del idioma, o el último si aún no se conoce)"""
+        with _lock:
+            winner = _winners.get(self.lang) if self.lang is not None else _last_winner["key"]
+        if winner in self.keys:
+            i = self.keys.index(winner)
+            return [self.candidates[i]] + self.candidates[:i] + self.candidates[i + 1:], winner
+        return self.candidates, None
+
+    def find(self) -> Optional[Any]:
+        """Locator del botón visible de mayor prioridad, o None"""
+        ordered, cached = self._ordered()
+        result = self.page.evaluate(FIND_JS, {"candidates": ordered, "mark": MARK_ATTR})
+        return self._resolve(result, ordered, cached)
+
+    def _resolve(self, result: Dict[str, Any], ordered: List[Dict[str, str]], cached: Optional[str]) -> Optional[Any]:
+        """Registra el resultado de FIND_JS y devuelve el locator del elemento marcado"""
+        self.lang = result["lang"]
+
+        with _lock:
+            _searches["total"] += 1
+            if result["index"] < 0:
+                return None
+            key = ordered[result["index"]]["key"]
+            self.last_key = key
+            _searches["found"] += 1
+            if cached == key:
+                _searches["cached_first"] += 1
+            _hits[key] += 1
+            _winners[self.lang] = key
+            _last_winner["key"] = key
+        return self.page.locator(f'[{MARK_ATTR}="1"]').first
+
+    def click_next(self, timeout: int = 3000) -> Optional[str]:
+        """Hace click en el botón; devuelve el selector que lo encontró o None si no hay"""
+        button = self.find()
+        if button is None:
+            return None
+        button.click(timeout=timeout)
+        return self.last_key
+
+
+class AsyncButtonFinder(ButtonFinder):
+    """ButtonFinder para páginas de playwright.async_api"""
+
+    async def find(self) -> Optional[Any]:
+        ordered, cached = self._ordered()
+        result = await self.page.evaluate(FIND_JS, {"candidates": ordered, "mark": MARK_ATTR})
+        return self._resolve(result, ordered, cached)
+
+    async def click_next(self, timeout: int = 3000) -> Optional[str]:
+        button = await self.find()
+        if button is None:
+            return None
+        await button.click(timeout=timeout)
+        return self.last_key
+
+
+def button_stats(labels: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Aciertos por selector, tasa de acierto del ganador cacheado y selectores sin uso"""
+    with _lock:
+        hits = dict(_hits)
+        searches = dict(_searches)
+        winners = dict(_winners)
+    dead = [c["key"] for c in build_candidates(labels)] if labels else []
+    return {
+        "searches": searches["total"],
+        "found": searches["found"],
+        "cached_hit_rate": round(searches["cached_first"] / searches["found"], 3) if searches["found"] else 0.0,
+        "hits": dict(sorted(hits.items(), key=lambda kv: kv[1], reverse=True)),
+        "winners_by_lang": winners,
+        "dead": [key for key in dead if key not in hits],
+    }
@@ -0,0 +1,210 @@
+"""
+Caché de transcripciones direccionada por contenido.
+
+Una transcripción se guarda bajo dos claves:
+- media: extractor de yt-dlp + ID del video (permite saltar la descarga)
+- audio: sha256 del archivo descargado (detecta el mismo audio bajo otra URL)
+Ambas incluyen la configuración del motor (modelo, compute type, beam_size, VAD,
+idioma), así un cambio de modelo nunca devuelve resultados viejos.
+
+Backends:
+- LocalCacheBackend: un JSON por clave en disco, con desalojo LRU por tamaño/cantidad
+- BucketCacheBackend: un archivo por clave en un bucket de Appwrite Storage
+
+Variables de entorno:
+- TRANSCRIPTION_CACHE: "0" para desactivar (default: "1")
+- CACHE_DIR: directorio del backend local (default: <tmp>/transcription-cache)
+- CACHE_MAX_MB: tamaño máximo del backend local (default: 2048)
+- CACHE_BUCKET_ID: si está definido, se usa además un bucket como segundo nivel
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+CACHE_VERSION = 1
+
+
+def hash_archivo(ruta: str, chunk_size: int = 1024 * 1024) -> str:
+    """sha256 del contenido del archivo"""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class LocalCacheBackend:
+    """Un archivo JSON por clave; el mtime marca el último uso para el desalojo LRU"""
+
+    def __init__(self, directory: str, max_bytes: int = 2048 * 1024 * 1024, max_items: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, None)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Borra los archivos menos usados hasta quedar dentro de los límites"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            while entries and (total > self.max_bytes or (self.max_items is not None and len(entries) > self.max_items)):
+                _, size, name = entries.pop(0)
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+class BucketCacheBackend:
+    """
+    Guarda cada entrada en un bucket de Appwrite con file_id derivado de la clave.
+    Con `overwrite=True` una entrada existente se reemplaza (estado mutable); si no,
+    la primera escritura gana (las entradas de caché son inmutables).
+    """
+
+    def __init__(self, client, bucket_id: str, overwrite: bool = False):
+        from uploads import get_storage
+        self.storage = get_storage(client)
+        self.bucket_id = bucket_id
+        self.overwrite = overwrite
+
+    @staticmethod
+    def _file_id(key: str) -> str:
+        # Appwrite limita los IDs a 36 caracteres
+        return key[:36]
+
+    def get(self, key: str) -> Optional[bytes]:
+        from appwrite.exception import AppwriteException
+        try:
+            return self.storage.get_file_download(bucket_id=self.bucket_id, file_id=self._file_id(key))
+        except AppwriteException as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def put(self, key: str, data: bytes):
+        from appwrite.exception import AppwriteException
+        from appwrite.input_file import InputFile
+
+        def crear():
+            self.storage.create_file(
+                bucket_id=self.bucket_id,
+                file_id=self._file_id(key),
+                file=InputFile.from_bytes(data, filename=f"{key}.json", mime_type="application/json")
+            )
+
+        try:
+            crear()
+        except AppwriteException as e:
+            # 409: otra ejecución ya guardó la misma entrada
+            if e.code != 409:
+                raise
+            if self.overwrite:
+                self.storage.delete_file(bucket_id=self.bucket_id, file_id=self._file_id(key))
+                crear()
+
+
+class TranscriptionCache:
+    """
+    Caché de varios niveles: se consulta en orden y un acierto en un nivel
+    posterior rellena los anteriores.
+    """
+
+    def __init__(self, backends: List[Any], engine_settings: str, language: Optional[str] = None):
+        self.backends = backends
+        self.settings = f"v{CACHE_VERSION}|{engine_settings}|lang={language or 'auto'}"
+
+    def _key(self, kind: str, ident: str) -> str:
+        return hashlib.sha256(f"{kind}:{ident}|{self.settings}".encode("utf-8")).hexdigest()
+
+    def media_key(self, info: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Clave a partir del info de yt-dlp (extractor + id), o None si no hay datos"""
+        if not info or not info.get("id"):
+            return None
+        extractor = info.get("extractor_key") or info.get("extractor") or "generic"
+        return self._key("media", f"{extractor}:{info['id']}")
+
+    def audio_key(self, audio_hash: Optional[str]) -> Optional[str]:
+        return self._key("audio", audio_hash) if audio_hash else None
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not key:
+            return None
+        for i, backend in enumerate(self.backends):
+            try:
+                data = backend.get(key)
+            except Exception as e:
+                print(f"⚠️  Error leyendo caché ({type(backend).__name__}): {e}")
+                continue
+            if data is None:
+                continue
+            for previous in self.backends[:i]:
+                try:
+                    previous.put(key, data)
+                except Exception:
+                    pass
+            return json.loads(data)
+        return None
+
+    def put(self, keys: Iterable[Optional[str]], resultado: Dict[str, Any]):
+        data = json.dumps(resultado, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for key in keys:
+            if not key:
+                continue
+            for backend in self.backends:
+                try:
+                    backend.put(key, data)
+                except Exception as e:
+                    print(f"⚠️  Error escribiendo caché ({type(backend).__name__}): {e}")
+
+
+def cache_from_env(config, client=None, directory: Optional[str] = None) -> Optional[TranscriptionCache]:
+    """Arma la caché para una EngineConfig según las variables de entorno; None si está desactivada"""
+    if os.environ.get("TRANSCRIPTION_CACHE", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+
+    directory = directory or os.environ.get("CACHE_DIR") or os.path.join(tempfile.gettempdir(), "transcription-cache")
+    max_bytes = int(float(os.environ.get("CACHE_MAX_MB", "2048")) * 1024 * 1024)
+    backends: List[Any] = [LocalCacheBackend(directory, max_bytes=max_bytes)]
+
+    bucket_id = os.environ.get("CACHE_BUCKET_ID")
+    if bucket_id and client is not None:
+        backends.append(BucketCacheBackend(client, bucket_id))
+
+    return TranscriptionCache(backends, config.cache_settings(), config.language)
@@ -0,0 +1,223 @@
+"""
+Transcripción de audio largo por chunks de voz en paralelo.
+
+Una sola llamada a `WhisperModel.transcribe` sobre un stream de varias horas solo
+usa el paralelismo interno de CTranslate2. Este modo:
+
+1. decodifica el audio a PCM 16 kHz (memory-mapped en el workspace del job),
+2. detecta los tramos con voz (Silero VAD de faster-whisper) y los agrupa en
+   chunks de hasta `chunk_seconds`, cortando siempre en silencios,
+3. transcribe los chunks en paralelo:
+   - backend "threads": el mismo modelo que el resto de los jobs (no se carga otro);
+     cuántos chunks decodifica a la vez lo fija su num_workers (WHISPER_NUM_WORKERS)
+   - backend "processes": un modelo por proceso (un único pool persistente; si cambia
+     la configuración se cierra el anterior)
+4. une los segmentos en orden corrigiendo los timestamps con el offset de cada chunk.
+
+El idioma se detecta una sola vez (primer chunk) y se fija para el resto, así
+todos los chunks se decodifican en el mismo idioma.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from audio import SAMPLE_RATE, decodificar_pcm
+from engine import EngineConfig, get_model
+
+CHUNK_BACKENDS = ("threads", "processes")
+
+# Máximo de audio que Whisper usa para detectar el idioma
+LANGUAGE_SAMPLE_SECONDS = 30
+
+
+def planificar_chunks(audio: np.ndarray, chunk_seconds: float,
+                      sample_rate: int = SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """Agrupa los tramos con voz en chunks (inicio, fin) en muestras, de hasta `chunk_seconds`"""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    regiones = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=500))
+    max_len = int(chunk_seconds * sample_rate)
+    chunks: List[Tuple[int, int]] = []
+    inicio = fin = None
+
+    for region in regiones:
+        start, end = region["start"], region["end"]
+        # Un tramo de voz continuo más largo que el chunk se corta en pedazos fijos
+        while end - start > max_len:
+            if inicio is not None:
+                chunks.append((inicio, fin))
+                inicio = None
+            chunks.append((start, start + max_len))
+            start += max_len
+        if inicio is None:
+            inicio, fin = start, end
+        elif end - inicio <= max_len:
+            fin = end
+        else:
+            chunks.append((inicio, fin))
+            inicio, fin = start, end
+
+    if inicio is not None:
+        chunks.append((inicio, fin))
+    return chunks
+
+
+def _segmentos_chunk(model, audio: np.ndarray, kwargs: Dict[str, Any], offset: float) -> List[Dict[str, Any]]:
+    segments, _ = model.transcribe(audio, **kwargs)
+    return [{"start": s.start + offset, "end": s.end + offset, "text": s.text} for s in segments]
+
+
+def _detectar_idioma(model, audio: np.ndarray, kwargs: Dict[str, Any]) -> Tuple[str, float]:
+    # transcribe() detecta el idioma antes de devolver el generador; no hace falta consumirlo
+    _, info = model.transcribe(audio[:LANGUAGE_SAMPLE_SECONDS * SAMPLE_RATE], **kwargs)
+    return info.language, info.language_probability
+
+
+# ---- Backend "processes": un modelo por proceso ----
+
+_worker_model = None
+
+
+def _init_proceso(config: EngineConfig):
+    global _worker_model
+    _worker_model = get_model(config)
+
+
+def _leer_pcm(pcm_path: str, inicio: int, fin: int) -> np.ndarray:
+    return np.array(np.memmap(pcm_path, dtype=np.float32, mode="r")[inicio:fin])
+
+
+def _chunk_en_proceso(pcm_path: str, inicio: int, fin: int, kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return _segmentos_chunk(_worker_model, _leer_pcm(pcm_path, inicio, fin), kwargs, inicio / SAMPLE_RATE)
+
+
+def _idioma_en_proceso(pcm_path: str, inicio: int, fin: int, kwargs: Dict[str, Any]) -> Tuple[str, float]:
+    return _detectar_idioma(_worker_model, _leer_pcm(pcm_path, inicio, fin), kwargs)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_key: Optional[Tuple] = None
+_pool_lock = threading.Lock()
+
+
+def _pool_procesos(config: EngineConfig) -> ProcessPoolExecutor:
+    """
+    Pool persistente: en una instancia caliente los modelos quedan cargados entre jobs.
+    Hay uno solo por proceso; otra configuración cierra el anterior (los chunks que ya
+    tenía encolados terminan, pero sus procesos y modelos no se acumulan).
+    """
+    global _pool, _pool_key
+    key = (config.model_key(), config.chunk_workers)
+    with _pool_lock:
+        if _pool is not None and _pool_key != key:
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=config.chunk_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_proceso,
+                initargs=(config,)
+            )
+            _pool_key = key
+        return _pool
+
+
+def cerrar_pool():
+    """Termina los procesos del pool (registrado con atexit)"""
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_key = None
+
+
+atexit.register(cerrar_pool)
+
+
+# ---- API ----
+
+def _limitar_workers(config: EngineConfig) -> EngineConfig:
+    """Limita los workers a los núcleos (chunk_workers no es parte de model_key)"""
+    nucleos = os.cpu_count() or 1
+    if config.chunk_workers > nucleos:
+        return config.with_values({"chunk_workers": nucleos})
+    return config
+
+
+def _config_procesos(config: EngineConfig) -> EngineConfig:
+    """Reparte los núcleos entre los modelos de los procesos si cpu_threads no está fijado"""
+    if config.cpu_threads:
+        return config
+    return config.with_values({"cpu_threads": max(1, (os.cpu_count() or 1) // config.chunk_workers)})
+
+
+def _en_orden(futures) -> Iterator[Dict[str, Any]]:
+    # Se entregan los chunks en orden: el chunk i sale apenas terminan él y los anteriores
+    for fut in futures:
+        yield from fut.result()
+
+
+def transcribir_por_chunks(archivo: str, config: EngineConfig, pcm_path: str):
+    """
+    Devuelve (info, generador de segmentos) igual que `WhisperModel.transcribe`,
+    con `info.language`, `info.language_probability` e `info.duration`.
+    """
+    if config.chunk_backend not in CHUNK_BACKENDS:
+        raise ValueError(f"Backend de chunks inválido: {config.chunk_backend} (opciones: {', '.join(CHUNK_BACKENDS)})")
+
+    config = _limitar_workers(config)
+    audio = decodificar_pcm(archivo, mmap_path=pcm_path)
+    duracion = len(audio) / SAMPLE_RATE
+    chunks = planificar_chunks(audio, config.chunk_seconds)
+    print(f"🧩 {len(chunks)} chunks de voz en {duracion:.0f}s de audio, "
+          f"{config.chunk_workers} workers ({config.chunk_backend})")
+
+    kwargs = config.transcribe_kwargs()
+    # Los chunks ya vienen recortados por VAD
+    kwargs["vad_filter"] = False
+
+    if not chunks:
+        info = SimpleNamespace(language=config.language, language_probability=0.0, duration=duracion)
+        return info, iter(())
+
+    idioma, probabilidad = kwargs.get("language"), 1.0
+    primero = chunks[0]
+    hilos = None
+
+    if config.chunk_backend == "processes":
+        pool = _pool_procesos(_config_procesos(config))
+        if not idioma:
+            idioma, probabilidad = pool.submit(_idioma_en_proceso, pcm_path, *primero, kwargs).result()
+            kwargs["language"] = idioma
+        futures = [pool.submit(_chunk_en_proceso, pcm_path, a, b, kwargs) for a, b in chunks]
+    else:
+        # Mismo model_key que el modelo ya cargado: otro num_workers lo sacaría del LRU de engine.py
+        model = get_model(config)
+        if config.num_workers < config.chunk_workers:
+            print(f"ℹ️  El modelo decodifica {config.num_workers} chunk(s) a la vez; para más, "
+                  f"WHISPER_NUM_WORKERS={config.chunk_workers}")
+        if not idioma:
+            idioma, probabilidad = _detectar_idioma(model, audio[primero[0]:primero[1]], kwargs)
+            kwargs["language"] = idioma
+        hilos = ThreadPoolExecutor(max_workers=config.chunk_workers)
+        futures = [hilos.submit(_segmentos_chunk, model, audio[a:b], kwargs, a / SAMPLE_RATE) for a, b in chunks]
+
+    info = SimpleNamespace(language=idioma, language_probability=probabilidad, duration=duracion)
+
+    def segmentos():
+        try:
+            yield from _en_orden(futures)
+        finally:
+            if hilos is not None:
+                hilos.shutdown(wait=False, cancel_futures=True)
+
+    return info, segmentos()
@@ -0,0 +1,208 @@
+"""
+Cookies de Facebook para el scraper (Playwright) y las descargas (yt-dlp).
+
+Un solo lugar para:
+- leer las cookies (archivo JSON, base64 del body o variables de entorno) y
+  sanearlas para Playwright; el resultado se memoiza por hash del contenido, así
+  las ejecuciones siguientes de la instancia no vuelven a decodificar ni parsear,
+- escribir el archivo de cookies en formato Netscape que espera la opción
+  `cookiefile` de yt-dlp; yt-dlp lo reescribe al cerrar, así que cada job tiene su
+  propia copia dentro de su JobWorkspace (se borra con él),
+- validar `expires` antes de lanzar un navegador: si la sesión (c_user / xs)
+  venció, el job falla enseguida con CookieError.
+
+Las listas devueltas se comparten entre llamadas: no modificarlas.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+# Cookies que forman la sesión de Facebook
+SESSION_COOKIES = ("c_user", "xs")
+
+_MAX_PARSED = 16
+_lock = threading.Lock()
+_parsed: "OrderedDict[str, List[Dict]]" = OrderedDict()
+_netscape: "OrderedDict[str, str]" = OrderedDict()
+
+
+class CookieError(ValueError):
+    """Cookies ilegibles o con la sesión vencida"""
+
+
+def cookies_key(cookies: Optional[List[Dict]]) -> str:
+    """Identifica un juego de cookies ya saneado"""
+    if not cookies:
+        return ""
+    data = json.dumps(cookies, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def sanitize_cookies(raw_cookies: List[Dict]) -> List[Dict]:
+    """Sanitiza cookies para Playwright"""
+    clean_cookies = []
+    for cookie in raw_cookies:
+        clean_cookie = {
+            "name": cookie.get("name", ""),
+            "value": cookie.get("value", ""),
+            "domain": cookie.get("domain", ""),
+            "path": cookie.get("path", "/"),
+        }
+
+        same_site = cookie.get("sameSite") or ""
+        if isinstance(same_site, str) and same_site.lower() in ["strict", "lax", "none"]:
+            clean_cookie["sameSite"] = same_site.lower().capitalize()
+        else:
+            clean_cookie["sameSite"] = "Lax"
+
+        if "httpOnly" in cookie:
+            clean_cookie["httpOnly"] = bool(cookie["httpOnly"])
+        if "secure" in cookie:
+            clean_cookie["secure"] = bool(cookie["secure"])
+        # Las extensiones de Chrome exportan `expirationDate` en vez de `expires`
+        expires = cookie.get("expires", cookie.get("expirationDate"))
+        if expires is not None and not cookie.get("session"):
+            clean_cookie["expires"] = expires
+
+        clean_cookies.append(clean_cookie)
+
+    return clean_cookies
+
+
+def parse_cookies(data: Union[str, bytes]) -> List[Dict]:
+    """JSON de cookies → cookies saneadas, memoizado por hash del contenido"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    key = hashlib.sha256(data).hexdigest()
+    with _lock:
+        if key in _parsed:
+            _parsed.move_to_end(key)
+            return _parsed[key]
+    try:
+        raw = json.loads(data)
+    except json.JSONDecodeError as e:
+        raise CookieError(f"Cookies con JSON inválido: {e}")
+    if not isinstance(raw, list):
+        raise CookieError("Las cookies deben ser una lista JSON")
+    cookies = sanitize_cookies(raw)
+    with _lock:
+        _parsed[key] = cookies
+        while len(_parsed) > _MAX_PARSED:
+            _parsed.popitem(last=False)
+    return cookies
+
+
+def parse_cookies_base64(data: str) -> List[Dict]:
+    try:
+        decoded = base64.b64decode(data)
+    except Exception as e:
+        raise CookieError(f"Cookies en base64 inválidas: {e}")
+    return parse_cookies(decoded)
+
+
+def load_cookies(cookies_path) -> List[Dict]:
+    """Cookies saneadas desde un archivo JSON"""
+    if not os.path.exists(cookies_path):
+        raise FileNotFoundError(f"No se encontró el archivo de cookies: {cookies_path}")
+    with open(cookies_path, "rb") as f:
+        return parse_cookies(f.read())
+
+
+def get_cookies(body: Dict[str, Any]) -> Optional[List[Dict]]:
+    """
+    Obtiene las cookies de Facebook desde el body (base64) o desde ENV.
+    Prioridad: body.cookies_base64, FACEBOOK_COOKIES_BASE64, FACEBOOK_COOKIES_JSON.
+    Retorna la lista de cookies o None; una fuente ilegible se salta.
+    """
+    fuentes = [
+        (parse_cookies_base64, body.get("cookies_base64")),
+        (parse_cookies_base64, os.environ.get("FACEBOOK_COOKIES_BASE64")),
+        (parse_cookies, os.environ.get("FACEBOOK_COOKIES_JSON")),
+    ]
+    for parser, data in fuentes:
+        if not data:
+            continue
+        try:
+            return parser(data)
+        except CookieError:
+            continue
+    return None
+
+
+def _expires(cookie: Dict) -> Optional[float]:
+    expires = cookie.get("expires")
+    if isinstance(expires, (int, float)) and expires > 0:
+        return float(expires)
+    return None
+
+
+def check_expiry(cookies: List[Dict], now: Optional[float] = None,
+                 required: tuple = SESSION_COOKIES) -> Dict[str, Any]:
+    """
+    Verifica que la sesión no haya vencido antes de usar las cookies.
+    Lanza CookieError si alguna cookie de sesión presente venció o si vencieron todas.
+    Devuelve {"cookies", "expired", "session_expires"} (fecha ISO del primer vencimiento de sesión).
+    """
+    now = time.time() if now is None else now
+    expired = [c["name"] for c in cookies if (_expires(c) or float("inf")) <= now]
+    session_expired = [name for name in required if name in expired]
+    if session_expired:
+        raise CookieError(f"Cookies de sesión vencidas: {', '.join(session_expired)}. Exporta cookies nuevas.")
+    if cookies and len(expired) == len(cookies):
+        raise CookieError("Todas las cookies están vencidas. Exporta cookies nuevas.")
+
+    vencimientos = [_expires(c) for c in cookies if c["name"] in required and _expires(c)]
+    return {
+        "cookies": len(cookies),
+        "expired": expired,
+        "session_expires": (datetime.fromtimestamp(min(vencimientos), tz=timezone.utc).isoformat()
+                            if vencimientos else None),
+    }
+
+
+def to_netscape(cookies: List[Dict]) -> str:
+    """Cookies en el formato Netscape/Mozilla que lee yt-dlp (`cookiefile`)"""
+    lineas = ["# Netscape HTTP Cookie File"]
+    for c in cookies:
+        domain = c.get("domain", "")
+        if c.get("httpOnly"):
+            domain = f"#HttpOnly_{domain}"
+        lineas.append("\t".join([
+            domain,
+            "TRUE" if c.get("domain", "").startswith(".") else "FALSE",
+            c.get("path", "/"),
+            "TRUE" if c.get("secure") else "FALSE",
+            str(int(_expires(c) or 0)),
+            c.get("name", ""),
+            c.get("value", ""),
+        ]))
+    return "\n".join(lineas) + "\n"
+
+
+def netscape_cookie_file(cookies: List[Dict], workspace) -> str:
+    """
+    Escribe el archivo Netscape para yt-dlp dentro del workspace del job (directorio
+    0700, archivo 0600) y devuelve su ruta. El texto se memoiza por juego de cookies;
+    el archivo no se comparte entre jobs porque yt-dlp lo reescribe al terminar.
+    """
+    key = cookies_key(cookies)
+    with _lock:
+        texto = _netscape.get(key)
+        if texto is None:
+            texto = _netscape[key] = to_netscape(cookies)
+            while len(_netscape) > _MAX_PARSED:
+                _netscape.popitem(last=False)
+        else:
+            _netscape.move_to_end(key)
+    path = workspace.path("cookies.txt")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(texto)
+    return path
@@ -1,27 +1,16 @@
 import argparse
-import json
 import time
 from pathlib import Path
 from playwright.sync_api import sync_playwright
 
+from cookies import check_expiry, load_cookies
+
 
 def debug_facebook_structure(url: str, cookies_path: Path):
     """Script para inspeccionar la estructura HTML de Facebook y encontrar los comentarios"""
     
-    with open(cookies_path, 'r', encoding='utf-8') as f:
-        raw_cookies = json.load(f)
-    
-    # Sanitizar cookies
-    clean_cookies = []
-    for cookie in raw_cookies:
-        clean_cookie = {
-            "name": cookie.get("name", ""),
-            "value": cookie.get("value", ""),
-            "domain": cookie.get("domain", ""),
-            "path": cookie.get("path", "/"),
-            "sameSite": "Lax"
-        }
-        clean_cookies.append(clean_cookie)
+    clean_cookies = load_cookies(cookies_path)
+    check_expiry(clean_cookies)
 
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=False)  # Siempre visible para debug
@@ -0,0 +1,89 @@
+"""
+De-duplicación de comentarios en O(1) por comentario.
+
+Cada comentario se identifica con una clave estable:
+- `id:<comment_id>` si se conoce el ID de Facebook (GraphQL o el link
+  `?comment_id=` del DOM),
+- `h:<hash>` en otro caso: SHA-1 de autor y texto normalizados (NFKC,
+  minúsculas, espacios colapsados), para que el mismo comentario renderizado
+  con otro espaciado o mayúsculas no cuente dos veces.
+
+`CommentIndex` guarda los registros en un dict por clave (orden de llegada), así
+la extracción queda lineal y los re-scrapes pueden compararse por clave.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Texto comparable: NFKC, casefold y espacios colapsados"""
+    if not text:
+        return ""
+    return _SPACES.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def content_hash(author: Optional[str], text: Optional[str]) -> str:
+    data = f"{normalize_text(author)}\x1f{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def comment_key(comment: Dict[str, Any]) -> str:
+    """Clave estable del comentario: ID de Facebook o hash del contenido normalizado"""
+    comment_id = comment.get("comment_id")
+    if comment_id:
+        return f"id:{comment_id}"
+    return f"h:{content_hash(comment.get('author'), comment.get('text'))}"
+
+
+class CommentIndex:
+    """
+    Comentarios únicos por clave. Si un comentario llega repetido (al paginar,
+    al abrir respuestas, por dos estrategias de extracción) se completan los
+    campos que le faltaban al primero.
+    """
+
+    def __init__(self, comments: Optional[Iterable[Dict[str, Any]]] = None):
+        self.by_key: Dict[str, Dict[str, Any]] = {}
+        self.duplicates = 0
+        if comments:
+            self.extend(comments)
+
+    def add(self, comment: Dict[str, Any]) -> bool:
+        """Agrega el comentario; devuelve False si ya estaba"""
+        key = comment_key(comment)
+        previo = self.by_key.get(key)
+        if previo is None:
+            self.by_key[key] = comment
+            return True
+        self.duplicates += 1
+        for campo, valor in comment.items():
+            if previo.get(campo) in (None, "", 0) and valor not in (None, ""):
+                previo[campo] = valor
+        return False
+
+    def extend(self, comments: Iterable[Dict[str, Any]]) -> int:
+        """Agrega varios; devuelve cuántos eran nuevos"""
+        return sum(1 for comment in comments if self.add(comment))
+
+    def __contains__(self, comment: Dict[str, Any]) -> bool:
+        return comment_key(comment) in self.by_key
+
+    def __len__(self) -> int:
+        return len(self.by_key)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.by_key.values())
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        return list(self.by_key.values())
+
+
+def dedup_comments(comments: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Lista sin repetidos, en el orden de llegada"""
+    return CommentIndex(comments).records
@@ -0,0 +1,306 @@
+"""
+Configuración del motor Whisper (faster-whisper / CTranslate2).
+
+Una sola capa de configuración para la función de Appwrite, transcriptor.py y
+runner.py. El orden de precedencia es:
+
+    defaults < WHISPER_PRESET < variables WHISPER_* < preset del job < campos del job
+
+donde "job" es el body de la petición o los argumentos de la CLI.
+
+Presets:
+- fast:     greedy (beam_size=1, sin fallback de temperatura) + VAD, int8
+- balanced: el comportamiento histórico (beam_size=5, int8, sin VAD)
+- accurate: beam_size=5, best_of=5, int8_float32 y sin VAD
+
+Con chunk_workers > 0 el audio se divide en chunks de voz que se transcriben en
+paralelo (ver chunking.py).
+
+Los campos que llegan en el body de un job pasan por `resolve_job`: solo se aceptan
+modelos de WHISPER_ALLOWED_MODELS (default: el de WHISPER_MODEL_SIZE), valores
+conocidos de device/compute_type/chunk_backend y beam/best_of acotados; download_root
+no se puede cambiar desde un job. cpu_threads y num_workers se recortan a los
+núcleos del host. Los modelos cargados se guardan en un LRU de WHISPER_MAX_MODELS
+(1 o 2, default: 1).
+
+WHISPER_CACHE_DIR fija dónde se descargan los pesos (`download_root`), así el
+build puede dejarlos descargados (`python src/warmup.py --download-only`) y
+`warmup()` los carga con una inferencia mínima antes del primer job.
+"""
+
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Dict, Optional, Tuple
+
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "fast": {"beam_size": 1, "greedy": True, "vad_filter": True, "compute_type": "int8"},
+    "balanced": {"beam_size": 5, "greedy": False, "vad_filter": False, "compute_type": "int8"},
+    "accurate": {"beam_size": 5, "best_of": 5, "greedy": False, "vad_filter": False, "compute_type": "int8_float32"},
+}
+
+ENV_VARS = {
+    "model_size": "WHISPER_MODEL_SIZE",
+    "device": "WHISPER_DEVICE",
+    "compute_type": "WHISPER_COMPUTE_TYPE",
+    "cpu_threads": "WHISPER_CPU_THREADS",
+    "num_workers": "WHISPER_NUM_WORKERS",
+    "beam_size": "WHISPER_BEAM_SIZE",
+    "best_of": "WHISPER_BEST_OF",
+    "greedy": "WHISPER_GREEDY",
+    "vad_filter": "WHISPER_VAD",
+    "language": "WHISPER_LANGUAGE",
+    "chunk_workers": "WHISPER_CHUNK_WORKERS",
+    "chunk_seconds": "WHISPER_CHUNK_SECONDS",
+    "chunk_backend": "WHISPER_CHUNK_BACKEND",
+    "download_root": "WHISPER_CACHE_DIR",
+}
+
+INT_FIELDS = ("cpu_threads", "num_workers", "beam_size", "best_of", "chunk_workers", "chunk_seconds")
+# Campos enteros donde 0 significa "automático" o "desactivado"
+ZERO_OK = ("cpu_threads", "chunk_workers")
+# Campos que no pueden superar los núcleos del host
+HOST_BOUND = ("cpu_threads", "num_workers")
+
+# Valores aceptados desde el body de un job (la CLI y el entorno no se restringen)
+JOB_CHOICES: Dict[str, Tuple[str, ...]] = {
+    "device": ("cpu", "cuda", "auto"),
+    "compute_type": ("default", "auto", "int8", "int8_float32", "int8_float16", "int8_bfloat16",
+                     "int16", "float16", "bfloat16", "float32"),
+    "chunk_backend": ("threads", "processes"),
+}
+JOB_MAX = {"beam_size": 10, "best_of": 10, "chunk_seconds": 600}
+JOB_FORBIDDEN = ("download_root",)
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class EngineConfig:
+    model_size: str = "small"
+    device: str = "cpu"
+    compute_type: str = "int8"
+    cpu_threads: int = 0
+    num_workers: int = 1
+    beam_size: int = 5
+    best_of: int = 5
+    greedy: bool = False
+    vad_filter: bool = False
+    language: Optional[str] = None
+    chunk_workers: int = 0
+    chunk_seconds: int = 120
+    chunk_backend: str = "threads"
+    download_root: Optional[str] = None
+
+    def with_values(self, values: Dict[str, Any]) -> "EngineConfig":
+        """Copia con los campos indicados (convirtiendo strings de env/CLI/JSON)"""
+        cambios: Dict[str, Any] = {}
+        for f in fields(self):
+            if f.name not in values or values[f.name] is None or values[f.name] == "":
+                continue
+            value = values[f.name]
+            if f.name in INT_FIELDS:
+                value = int(value)
+                if value < 0 or (f.name not in ZERO_OK and value == 0):
+                    raise ValueError(f"Valor inválido para {f.name}: {value}")
+                if f.name in HOST_BOUND:
+                    value = min(value, os.cpu_count() or 1)
+            elif f.name in ("greedy", "vad_filter"):
+                value = _parse_bool(value)
+            else:
+                value = str(value)
+            cambios[f.name] = value
+        return replace(self, **cambios)
+
+    def with_preset(self, preset: Optional[str]) -> "EngineConfig":
+        if not preset:
+            return self
+        if preset not in PRESETS:
+            raise ValueError(f"Preset inválido: {preset} (opciones: {', '.join(PRESETS)})")
+        return self.with_values(PRESETS[preset])
+
+    @classmethod
+    def from_env(cls) -> "EngineConfig":
+        config = cls().with_preset(os.environ.get("WHISPER_PRESET"))
+        return config.with_values({name: os.environ.get(var) for name, var in ENV_VARS.items()})
+
+    @classmethod
+    def resolve(cls, overrides: Optional[Dict[str, Any]] = None) -> "EngineConfig":
+        """Configuración del entorno con el preset y los campos de un job encima"""
+        overrides = overrides or {}
+        return cls.from_env().with_preset(overrides.get("preset")).with_values(overrides)
+
+    @classmethod
+    def resolve_job(cls, overrides: Optional[Dict[str, Any]] = None) -> "EngineConfig":
+        """Como `resolve`, pero valida los campos que vienen del body de una petición"""
+        overrides = {k: v for k, v in (overrides or {}).items() if v is not None and v != ""}
+        for name in JOB_FORBIDDEN:
+            if name in overrides:
+                raise ValueError(f"{name} no se puede cambiar desde un job")
+        config = cls.resolve(overrides)
+        permitidos = allowed_models(cls.from_env())
+        if config.model_size not in permitidos:
+            raise ValueError(f"Modelo no permitido: {config.model_size} (opciones: {', '.join(permitidos)})")
+        for name, opciones in JOB_CHOICES.items():
+            if getattr(config, name) not in opciones:
+                raise ValueError(f"Valor inválido para {name}: {getattr(config, name)} (opciones: {', '.join(opciones)})")
+        for name, tope in JOB_MAX.items():
+            if name in overrides and getattr(config, name) > tope:
+                raise ValueError(f"Valor inválido para {name}: {getattr(config, name)} (máximo: {tope})")
+        return config
+
+    # ---- Parámetros para faster-whisper ----
+
+    def model_key(self) -> Tuple:
+        """Campos que requieren cargar otro modelo (los demás solo cambian la decodificación)"""
+        return (self.model_size, self.device, self.compute_type, self.cpu_threads, self.num_workers)
+
+    def model_kwargs(self) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "device": self.device,
+            "compute_type": self.compute_type,
+            "cpu_threads": self.cpu_threads,
+            "num_workers": self.num_workers,
+        }
+        if self.download_root:
+            kwargs["download_root"] = self.download_root
+        return kwargs
+
+    def transcribe_kwargs(self) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "beam_size": 1 if self.greedy else self.beam_size,
+            "vad_filter": self.vad_filter,
+            "language": self.language,
+        }
+        if self.greedy:
+            kwargs["best_of"] = 1
+            kwargs["temperature"] = 0.0
+        else:
+            kwargs["best_of"] = self.best_of
+        return kwargs
+
+    def cache_settings(self) -> str:
+        """Identifica todo lo que afecta el texto resultante (para la caché)"""
+        t = self.transcribe_kwargs()
+        chunks = self.chunk_seconds if self.chunk_workers else 0
+        return (f"{self.model_size}|{self.compute_type}|beam={t['beam_size']}|best_of={t['best_of']}"
+                f"|greedy={self.greedy}|vad={self.vad_filter}|chunks={chunks}")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def allowed_models(base: EngineConfig) -> Tuple[str, ...]:
+    """Modelos que un job puede pedir (WHISPER_ALLOWED_MODELS, o solo el del entorno)"""
+    valor = os.environ.get("WHISPER_ALLOWED_MODELS", "")
+    modelos = tuple(m.strip() for m in valor.split(",") if m.strip())
+    return modelos or (base.model_size,)
+
+
+def max_models() -> int:
+    """Modelos cargados a la vez por proceso (WHISPER_MAX_MODELS, entre 1 y 2)"""
+    try:
+        return max(1, min(int(os.environ.get("WHISPER_MAX_MODELS", "1")), 2))
+    except ValueError:
+        return 1
+
+
+# ---- Modelos cargados (LRU por model_key, por proceso) ----
+
+_models: "OrderedDict[Tuple, Any]" = OrderedDict()
+_models_lock = threading.Lock()
+# Segundos que tardó cada carga (descarga incluida si no estaba en WHISPER_CACHE_DIR)
+_load_times: Dict[Tuple, float] = {}
+
+
+def model_loaded(config: EngineConfig) -> bool:
+    return config.model_key() in _models
+
+
+def model_load_time(config: EngineConfig) -> Optional[float]:
+    return _load_times.get(config.model_key())
+
+
+def model_load_stats() -> Dict[str, float]:
+    """Tiempo de carga de cada modelo cargado en este proceso, por clave model_size/device/compute_type/..."""
+    return {"/".join(str(v) for v in key): round(segundos, 3) for key, segundos in _load_times.items()}
+
+
+def get_model(config: EngineConfig):
+    """
+    Carga el modelo para esta configuración o reutiliza el ya cargado. Al pasar el
+    tope de WHISPER_MAX_MODELS se descarta el usado hace más tiempo (los jobs que lo
+    estén usando conservan su referencia hasta terminar).
+    """
+    key = config.model_key()
+    with _models_lock:
+        if key in _models:
+            _models.move_to_end(key)
+            return _models[key]
+        while len(_models) >= max_models():
+            viejo, _ = _models.popitem(last=False)
+            _load_times.pop(viejo, None)
+        from faster_whisper import WhisperModel
+        t0 = time.perf_counter()
+        _models[key] = WhisperModel(config.model_size, **config.model_kwargs())
+        _load_times[key] = time.perf_counter() - t0
+        return _models[key]
+
+
+def download_model(config: EngineConfig) -> str:
+    """Descarga los pesos a `download_root` sin cargarlos (para el paso de build)"""
+    from faster_whisper.utils import download_model as _download
+    return _download(config.model_size, cache_dir=config.download_root)
+
+
+def warmup(config: EngineConfig) -> Dict[str, Any]:
+    """
+    Carga el modelo (si hace falta) y ejecuta una inferencia sobre 1 s de silencio,
+    así el primer job no paga la carga ni la inicialización de CTranslate2.
+    """
+    import numpy as np
+
+    ya_cargado = model_loaded(config)
+    model = get_model(config)
+    t0 = time.perf_counter()
+    segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), **config.transcribe_kwargs())
+    list(segments)
+    return {
+        "model": config.model_size,
+        "already_loaded": ya_cargado,
+        "model_load_s": round(model_load_time(config) or 0.0, 3),
+        "inference_s": round(time.perf_counter() - t0, 3),
+    }
+
+
+# ---- CLI ----
+
+def add_cli_args(parser: argparse.ArgumentParser):
+    grupo = parser.add_argument_group("motor Whisper")
+    grupo.add_argument("--preset", choices=list(PRESETS), help="fast | balanced | accurate")
+    grupo.add_argument("--model-size", help="tiny, base, small, medium, large-v3...")
+    grupo.add_argument("--device", help="cpu | cuda | auto")
+    grupo.add_argument("--compute-type", help="int8, int8_float32, float16, float32...")
+    grupo.add_argument("--cpu-threads", type=int, help="Hilos de CTranslate2 por modelo (0 = automático)")
+    grupo.add_argument("--num-workers", type=int, help="Transcripciones concurrentes por modelo")
+    grupo.add_argument("--beam-size", type=int)
+    grupo.add_argument("--greedy", action="store_true", default=None, help="Decodificación greedy (beam_size=1)")
+    grupo.add_argument("--vad", dest="vad_filter", action="store_true", default=None, help="Filtrar silencios con VAD")
+    grupo.add_argument("--language", help="Forzar idioma (ej: es); por defecto se detecta")
+    grupo.add_argument("--chunk-workers", type=int,
+                       help="Dividir el audio en chunks de voz (VAD) y transcribirlos con N workers (0 = desactivado)")
+    grupo.add_argument("--chunk-seconds", type=int, help="Duración máxima de cada chunk (default: 120)")
+    grupo.add_argument("--chunk-backend", choices=["threads", "processes"],
+                       help="threads: un modelo compartido; processes: un modelo por proceso")
+    grupo.add_argument("--download-root", help="Carpeta de los pesos del modelo (WHISPER_CACHE_DIR)")
+
+
+def from_cli_args(args: argparse.Namespace) -> EngineConfig:
+    return EngineConfig.resolve(vars(args))
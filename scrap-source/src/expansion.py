@@ -0,0 +1,357 @@
+"""
+Controlador de expansión de comentarios.
+
+Reemplaza el tope fijo de `max_clicks` y el límite de 10 "Ver más" por label:
+
+- En cada ronda: scroll al final, click en "ver más comentarios" (ButtonFinder),
+  apertura en lote de los hilos de respuestas y espera por eventos.
+- Después de cada ronda se cuenta cuántos comentarios hay; si durante
+  `stall_rounds` rondas seguidas no aparece ninguno nuevo, se termina.
+- El límite es un presupuesto de tiempo (`time_budget`); `max_clicks` queda como
+  tope opcional.
+- Los comentarios truncados ("Ver más" dentro del comentario) se expanden todos
+  dentro de la página, en lotes, con un solo `page.evaluate` por pasada.
+- Para re-scrapes incrementales, `sort_newest` cambia el orden del post a "Más
+  recientes" y `stop_when` corta la expansión al llegar a comentarios ya vistos.
+
+`AsyncExpansionController` aplica las mismas rondas y criterios de parada a
+páginas de playwright.async_api (scraper-fb-batch.py).
+
+Variables de entorno:
+- SCRAPE_TIME_BUDGET: segundos máximos de expansión por post (default: 180)
+- SCRAPE_STALL_ROUNDS: rondas sin comentarios nuevos antes de parar (default: 2)
+"""
+
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from buttons import AsyncButtonFinder, ButtonFinder
+from extraction import COMMENT_SELECTORS
+from waits import AsyncPageWaiter, PageWaiter
+
+# Botones que cargan más comentarios en la lista del post
+SEE_MORE_LABELS = [
+    "See more comments", "View more comments", "Ver más comentarios",
+    "View previous comments", "Mostrar comentarios anteriores",
+    "Mostrar más comentarios", "Load more comments", "Cargar más comentarios"
+]
+
+# "Ver más" dentro de un comentario truncado
+COMMENT_EXPAND_LABELS = ["See more", "Ver más", "Show more", "Mostrar más"]
+
+# Botones que abren un hilo de respuestas ("View 3 replies", "Ver las 12 respuestas",
+# "1 respuesta"...). Se exige número o "ver/view" para no tocar el link "Responder".
+REPLY_PATTERNS = [
+    r"^(view|ver)\b.*\b(replies|reply|respuestas|respuesta)$",
+    r"^\d+\s+(replies|reply|respuestas|respuesta)$",
+    r"^(view more replies|ver más respuestas)$",
+]
+
+# Menú de orden de los comentarios y la opción "más recientes primero"
+SORT_MENU_LABELS = ["Most relevant", "Más relevantes", "Top comments", "Comentarios principales",
+                    "Most relevant comments", "Comentarios más relevantes"]
+NEWEST_LABELS = ["Newest", "Más recientes", "Newest first", "Most recent"]
+
+COUNT_JS = """
+(selectors) => {
+    for (const sel of selectors) {
+        try {
+            const n = document.querySelectorAll(sel).length;
+            if (n) return n;
+        } catch (e) {}
+    }
+    return 0;
+}
+"""
+
+# Click en lote sobre los elementos cuyo texto coincide exactamente con un label
+# o con un patrón. Cada elemento se marca para no volver a clickearlo.
+CLICK_ALL_JS = """
+({labels, patterns, mark, limit}) => {
+    const exact = new Set(labels.map((l) => l.toLowerCase()));
+    const regexes = patterns.map((p) => new RegExp(p, "i"));
+    const matches = (t) => exact.has(t) || regexes.some((r) => r.test(t));
+    const visible = (el) => {
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== "hidden";
+    };
+
+    let clicked = 0;
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    const targets = [];
+    for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+        const t = node.nodeValue.trim().toLowerCase();
+        if (!t || t.length > 40 || !matches(t)) continue;
+        const parent = node.parentElement;
+        const el = parent && (parent.closest('[role="button"]') || parent);
+        if (el && !el.hasAttribute(mark)) targets.push(el);
+    }
+    for (const el of targets) {
+        if (clicked >= limit) break;
+        if (el.hasAttribute(mark) || !visible(el)) continue;
+        el.setAttribute(mark, "1");
+        try { el.click(); clicked++; } catch (e) {}
+    }
+    return clicked;
+}
+"""
+
+
+def click_all(page, labels: List[str], patterns: List[str], limit: int = 50) -> int:
+    """Click en hasta `limit` elementos visibles con label exacto o patrón (sin repetir elementos)"""
+    try:
+        return page.evaluate(CLICK_ALL_JS, {
+            "labels": labels, "patterns": patterns, "mark": "data-scrap-expanded", "limit": limit
+        })
+    except Exception:
+        return 0
+
+
+def sort_newest(page, waiter: PageWaiter) -> bool:
+    """Abre el menú de orden y elige "más recientes"; False si no se encontró alguno de los dos"""
+    if not click_all(page, SORT_MENU_LABELS, [], limit=1):
+        return False
+    waiter.settle()
+    base = waiter.mark()
+    if not click_all(page, NEWEST_LABELS, [], limit=1):
+        return False
+    waiter.wait_for_growth(base)
+    return True
+
+
+class ExpansionController:
+    """Expande un post hasta que deja de aparecer contenido o se acaba el tiempo"""
+
+    def __init__(self, page, labels: List[str], truncated_labels: List[str],
+                 waiter: Optional[PageWaiter] = None, time_budget: Optional[float] = None,
+                 max_clicks: Optional[int] = None, stall_rounds: Optional[int] = None,
+                 replies: bool = True, extra_progress: Optional[Callable[[], int]] = None,
+                 batch_size: int = 50, stop_when: Optional[Callable[[], bool]] = None):
+        self.page = page
+        self.finder = ButtonFinder(page, labels)
+        self.truncated_labels = truncated_labels
+        self.waiter = waiter or PageWaiter(page)
+        self.time_budget = time_budget if time_budget is not None else float(os.environ.get("SCRAPE_TIME_BUDGET", "180"))
+        self.max_clicks = max_clicks
+        self.stall_rounds = stall_rounds if stall_rounds is not None else int(os.environ.get("SCRAPE_STALL_ROUNDS", "2"))
+        self.replies = replies
+        self.extra_progress = extra_progress
+        self.batch_size = batch_size
+        self.stop_when = stop_when
+        self.stats: Dict[str, Any] = {
+            "rounds": 0, "clicks": 0, "reply_threads": 0, "truncated": 0,
+            "comments": 0, "elapsed_s": 0.0, "stop_reason": None,
+        }
+        self._t0 = time.perf_counter()
+
+    # ---- medición ----
+
+    def _remaining(self) -> float:
+        return self.time_budget - (time.perf_counter() - self._t0)
+
+    def count(self) -> int:
+        """Comentarios visibles en el DOM (más los capturados por red, si se pasó `extra_progress`)"""
+        try:
+            total = self.page.evaluate(COUNT_JS, COMMENT_SELECTORS)
+        except Exception:
+            total = 0
+        if self.extra_progress is not None:
+            total += self.extra_progress()
+        return total
+
+    def _click_all(self, labels: List[str], patterns: List[str]) -> int:
+        return click_all(self.page, labels, patterns, limit=self.batch_size)
+
+    def _should_stop(self) -> bool:
+        try:
+            return self.stop_when is not None and bool(self.stop_when())
+        except Exception:
+            return False
+
+    def _wait(self, base: int):
+        self.waiter.wait_for_growth(base, max_wait=max(0.5, min(self.waiter.max_wait, self._remaining())))
+
+    # ---- acciones ----
+
+    def expand_replies(self) -> int:
+        """Abre en lote los hilos de respuestas visibles"""
+        base = self.waiter.mark()
+        clicked = self._click_all([], REPLY_PATTERNS)
+        if clicked:
+            self.stats["reply_threads"] += clicked
+            self._wait(base)
+        return clicked
+
+    def expand_truncated(self, max_passes: int = 10) -> int:
+        """Expande todos los comentarios truncados, en lotes, hasta que no quede ninguno"""
+        total = 0
+        for _ in range(max_passes):
+            if self._remaining() <= 0:
+                break
+            clicked = self._click_all(self.truncated_labels, [])
+            if not clicked:
+                break
+            total += clicked
+        if total:
+            self.waiter.settle(max_wait=max(0.5, min(self.waiter.max_wait, self._remaining())))
+        self.stats["truncated"] += total
+        return total
+
+    def run(self) -> Dict[str, Any]:
+        """Rondas de scroll + "ver más" + respuestas hasta que no haya progreso o se acabe el tiempo"""
+        self._t0 = time.perf_counter()
+        last = self.count()
+        stalled = 0
+
+        while True:
+            if self._should_stop():
+                self.stats["stop_reason"] = "known_comments"
+                break
+            if self._remaining() <= 0:
+                self.stats["stop_reason"] = "time_budget"
+                break
+            if self.max_clicks is not None and self.stats["clicks"] >= self.max_clicks:
+                self.stats["stop_reason"] = "max_clicks"
+                break
+
+            self.stats["rounds"] += 1
+            base = self.waiter.mark()
+            self.page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+
+            try:
+                button = self.finder.find()
+            except Exception:
+                button = None
+            if button is not None:
+                try:
+                    button.click(timeout=3000)
+                    self.stats["clicks"] += 1
+                except Exception:
+                    pass
+            self._wait(base)
+
+            if self.replies:
+                self.expand_replies()
+
+            current = self.count()
+            if current > last:
+                last, stalled = current, 0
+            else:
+                stalled += 1
+                if stalled >= self.stall_rounds:
+                    self.stats["stop_reason"] = "no_progress"
+                    break
+
+        self.stats["comments"] = last
+        self.stats["elapsed_s"] = round(time.perf_counter() - self._t0, 2)
+        return self.stats
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"{s['rounds']} rondas, {s['clicks']} clicks, {s['reply_threads']} hilos de respuestas, "
+                f"{s['truncated']} truncados, {s['comments']} comentarios en {s['elapsed_s']}s "
+                f"(fin: {s['stop_reason']})")
+
+
+async def click_all_async(page, labels: List[str], patterns: List[str], limit: int = 50) -> int:
+    try:
+        return await page.evaluate(CLICK_ALL_JS, {
+            "labels": labels, "patterns": patterns, "mark": "data-scrap-expanded", "limit": limit
+        })
+    except Exception:
+        return 0
+
+
+class AsyncExpansionController(ExpansionController):
+    """ExpansionController para páginas de playwright.async_api"""
+
+    def __init__(self, page, labels: List[str], truncated_labels: List[str],
+                 waiter: Optional[AsyncPageWaiter] = None, **kwargs):
+        super().__init__(page, labels, truncated_labels, waiter=waiter or AsyncPageWaiter(page), **kwargs)
+        self.finder = AsyncButtonFinder(page, labels)
+
+    async def count(self) -> int:
+        try:
+            total = await self.page.evaluate(COUNT_JS, COMMENT_SELECTORS)
+        except Exception:
+            total = 0
+        if self.extra_progress is not None:
+            total += self.extra_progress()
+        return total
+
+    async def _click_all(self, labels: List[str], patterns: List[str]) -> int:
+        return await click_all_async(self.page, labels, patterns, limit=self.batch_size)
+
+    async def _wait(self, base: int):
+        await self.waiter.wait_for_growth(base, max_wait=max(0.5, min(self.waiter.max_wait, self._remaining())))
+
+    async def expand_replies(self) -> int:
+        base = await self.waiter.mark()
+        clicked = await self._click_all([], REPLY_PATTERNS)
+        if clicked:
+            self.stats["reply_threads"] += clicked
+            await self._wait(base)
+        return clicked
+
+    async def expand_truncated(self, max_passes: int = 10) -> int:
+        total = 0
+        for _ in range(max_passes):
+            if self._remaining() <= 0:
+                break
+            clicked = await self._click_all(self.truncated_labels, [])
+            if not clicked:
+                break
+            total += clicked
+        if total:
+            await self.waiter.settle(max_wait=max(0.5, min(self.waiter.max_wait, self._remaining())))
+        self.stats["truncated"] += total
+        return total
+
+    async def run(self) -> Dict[str, Any]:
+        self._t0 = time.perf_counter()
+        last = await self.count()
+        stalled = 0
+
+        while True:
+            if self._should_stop():
+                self.stats["stop_reason"] = "known_comments"
+                break
+            if self._remaining() <= 0:
+                self.stats["stop_reason"] = "time_budget"
+                break
+            if self.max_clicks is not None and self.stats["clicks"] >= self.max_clicks:
+                self.stats["stop_reason"] = "max_clicks"
+                break
+
+            self.stats["rounds"] += 1
+            base = await self.waiter.mark()
+            await self.page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+
+            try:
+                button = await self.finder.find()
+            except Exception:
+                button = None
+            if button is not None:
+                try:
+                    await button.click(timeout=3000)
+                    self.stats["clicks"] += 1
+                except Exception:
+                    pass
+            await self._wait(base)
+
+            if self.replies:
+                await self.expand_replies()
+
+            current = await self.count()
+            if current > last:
+                last, stalled = current, 0
+            else:
+                stalled += 1
+                if stalled >= self.stall_rounds:
+                    self.stats["stop_reason"] = "no_progress"
+                    break
+
+        self.stats["comments"] = last
+        self.stats["elapsed_s"] = round(time.perf_counter() - self._t0, 2)
+        return self.stats
@@ -0,0 +1,149 @@
+"""
+Extracción de comentarios de Facebook en un solo round trip.
+
+El recorrido anterior hacía varias llamadas de Playwright por bloque (count(),
+inner_text(), all_inner_texts() por cada selector de autor y de texto), cada una
+un viaje de ida y vuelta al navegador. Aquí todo el DOM se recorre dentro de la
+página con un único `page.evaluate` que devuelve autor, texto e IDs de todos los
+comentarios, con la misma lista de selectores y el mismo orden de fallback.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from dedup import CommentIndex
+
+# Bloques de comentario, en orden de preferencia (se usa el primero que encuentre algo)
+COMMENT_SELECTORS = [
+    # Facebook Watch
+    '[data-testid="UFI2Comment/root_depth_0"]',
+    '[data-testid="comment"]',
+    # Posts regulares
+    'div[aria-label="Comment"]',
+    'div[role="article"]',
+    # Fallbacks genéricos
+    '[data-ad-preview="message"]',
+    'div:has(> div > span[dir="auto"]):has(strong)',
+    'div:has(> div > div > strong):has(span[dir="auto"])'
+]
+
+AUTHOR_SELECTORS = [
+    'strong',
+    'a[role="link"] strong',
+    'span[dir="auto"] strong',
+    'h3 a',
+    'a[href*="profile"]'
+]
+
+TEXT_SELECTORS = [
+    'span[dir="auto"]:not(:has(strong))',  # Texto sin el nombre
+    'div[data-ad-preview="message"]',
+    '[dir="auto"]',
+    'div > span'
+]
+
+EXTRACT_JS = """
+({blockSelectors, authorSelectors, textSelectors, debug}) => {
+    const queryAll = (root, sel) => {
+        try { return Array.from(root.querySelectorAll(sel)); } catch (e) { return []; }
+    };
+    const text = (el) => (el.innerText || el.textContent || "").trim();
+    const commentId = (block) => {
+        for (const a of queryAll(block, 'a[href*="comment_id="]')) {
+            try {
+                const params = new URL(a.href, location.href).searchParams;
+                const id = params.get("reply_comment_id") || params.get("comment_id");
+                if (id) return id;
+            } catch (e) {}
+        }
+        return null;
+    };
+
+    let blocks = [], used = null;
+    for (const sel of blockSelectors) {
+        blocks = queryAll(document, sel);
+        if (blocks.length) { used = sel; break; }
+    }
+
+    if (!used) {
+        const sample = debug
+            ? queryAll(document, "div").slice(0, 20).map(text).filter(Boolean).map(t => t.slice(0, 100))
+            : [];
+        return {selector: null, total: 0, comments: [], sample};
+    }
+
+    const comments = blocks.map((block) => {
+        let author = "";
+        for (const sel of authorSelectors) {
+            const el = queryAll(block, sel)[0];
+            if (el) {
+                author = text(el);
+                if (author) break;
+            }
+        }
+        const texts = [];
+        for (const sel of textSelectors) {
+            for (const el of queryAll(block, sel)) {
+                const t = text(el);
+                if (t && t !== author && t.length > 1) texts.push(t);
+            }
+        }
+        return {author, text: Array.from(new Set(texts)).join(" "), comment_id: commentId(block)};
+    });
+    return {selector: used, total: blocks.length, comments, sample: []};
+}
+"""
+
+
+def extract_comments_payload(page, debug: bool = False,
+                             selectors: Optional[List[str]] = None,
+                             author_selectors: Optional[List[str]] = None,
+                             text_selectors: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Resultado crudo del recorrido en la página:
+    {"selector": usado o None, "total": bloques, "comments": [...], "sample": textos de debug}
+    """
+    return page.evaluate(EXTRACT_JS, {
+        "blockSelectors": selectors or COMMENT_SELECTORS,
+        "authorSelectors": author_selectors or AUTHOR_SELECTORS,
+        "textSelectors": text_selectors or TEXT_SELECTORS,
+        "debug": debug,
+    })
+
+
+def extract_comments(page, verbose: bool = False) -> List[Dict]:
+    """Extrae los comentarios como [{"author", "text", "comment_id"}] con un solo page.evaluate"""
+    payload = extract_comments_payload(page, debug=verbose)
+
+    if not payload["selector"]:
+        if verbose:
+            print("❌ No se encontraron comentarios con ningún selector")
+            print("Elementos disponibles en la página:")
+            for i, text in enumerate(payload["sample"]):
+                print(f"  div[{i}]: {text}...")
+        return []
+
+    if verbose:
+        print(f"✅ Usando selector: {payload['selector']} ({payload['total']} elementos)")
+    return comments_from_payload(payload)
+
+
+async def extract_comments_async(page) -> List[Dict]:
+    """extract_comments para páginas de playwright.async_api"""
+    payload = await page.evaluate(EXTRACT_JS, {
+        "blockSelectors": COMMENT_SELECTORS,
+        "authorSelectors": AUTHOR_SELECTORS,
+        "textSelectors": TEXT_SELECTORS,
+        "debug": False,
+    })
+    return comments_from_payload(payload)
+
+
+def comments_from_payload(payload: Dict[str, Any]) -> List[Dict]:
+    """Filtra y de-duplica los comentarios devueltos por EXTRACT_JS"""
+    index = CommentIndex()
+    for comment in payload["comments"]:
+        author, body = comment["author"], comment["text"]
+        # Solo agregar si tenemos contenido útil
+        if (author and len(author) > 1) or (body and len(body) > 2):
+            index.add(comment)
+    return index.records
@@ -0,0 +1,245 @@
+"""
+Captura de comentarios desde las respuestas GraphQL de Facebook.
+
+En vez de esperar a que el DOM se renderice y parsearlo, se escuchan las
+respuestas de red (`page.on("response")`) de /api/graphql/ y /ajax/ y se
+recorren los JSON buscando nodos de comentario. Cada nodo trae ID, autor,
+texto completo (sin "Ver más"), fecha, comentario padre y reacciones.
+
+Las respuestas de Facebook pueden traer varios JSON seguidos (uno por línea,
+streaming) y el prefijo anti-JSON-hijacking `for (;;);`; ambos se manejan.
+
+Pruebas sin red: `comments_from_har()` lee un HAR grabado (por ejemplo con
+`scraper-fb-comments.py --record-har`) y aplica el mismo parser:
+
+    python src/graphql_capture.py datos-crudos/post.har
+"""
+
+import base64
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from dedup import CommentIndex
+
+# graphql: comentarios desde la red, con el DOM como fallback si no se captura nada
+# dom:     solo el DOM renderizado (comportamiento anterior)
+SCRAPE_MODES = ("graphql", "dom")
+SCRAPE_MODE = os.environ.get("SCRAPE_MODE", "graphql")
+
+GRAPHQL_URL_PARTS = ("/api/graphql", "/ajax/")
+ANTI_HIJACK_PREFIX = "for (;;);"
+
+
+def resolve_scrape_mode(mode: Optional[str] = None) -> str:
+    mode = (mode or SCRAPE_MODE).lower()
+    if mode not in SCRAPE_MODES:
+        raise ValueError(f"Modo de scrape inválido: {mode} (opciones: {', '.join(SCRAPE_MODES)})")
+    return mode
+
+
+def is_graphql_url(url: str) -> bool:
+    return any(part in url for part in GRAPHQL_URL_PARTS)
+
+
+def iter_json_documents(text: str) -> Iterator[Any]:
+    """Todos los JSON de una respuesta (uno o varios concatenados, con o sin prefijo)"""
+    text = text.strip()
+    if text.startswith(ANTI_HIJACK_PREFIX):
+        text = text[len(ANTI_HIJACK_PREFIX):]
+    decoder = json.JSONDecoder()
+    pos = 0
+    while pos < len(text):
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos >= len(text):
+            break
+        try:
+            doc, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            # Resto no parseable (HTML, respuesta truncada): se descarta
+            return
+        yield doc
+
+
+def _get(node: Any, *path) -> Any:
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+def _first(node: Dict, paths: Iterable[tuple]) -> Any:
+    for path in paths:
+        value = _get(node, *path)
+        if value is not None:
+            return value
+    return None
+
+
+def _is_comment(node: Dict) -> bool:
+    if node.get("__typename") == "Comment":
+        return True
+    # Algunas consultas no incluyen __typename: un comentario tiene autor, body e id
+    return "author" in node and "body" in node and ("id" in node or "legacy_fbid" in node)
+
+
+def _iso(timestamp: Any) -> Optional[str]:
+    if not isinstance(timestamp, (int, float)):
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+def comment_record(node: Dict, parent_id: Optional[str] = None) -> Dict[str, Any]:
+    """Nodo Comment de GraphQL → registro de comentario"""
+    comment_id = node.get("legacy_fbid") or _get(node, "feedback", "legacy_fbid") or node.get("id")
+    reactions = _first(node, [
+        ("feedback", "reactors", "count"),
+        ("feedback", "reaction_count", "count"),
+        ("comment_action_links_reactions_count",),
+        ("reactors", "count"),
+    ])
+    parent = parent_id or _first(node, [
+        ("comment_parent", "legacy_fbid"),
+        ("comment_parent", "id"),
+        ("parent_comment", "legacy_fbid"),
+        ("parent_comment", "id"),
+    ])
+    return {
+        "comment_id": str(comment_id) if comment_id is not None else None,
+        "author": _get(node, "author", "name") or "",
+        "author_id": _get(node, "author", "id"),
+        "text": _get(node, "body", "text") or "",
+        "created_time": _iso(node.get("created_time")),
+        "parent_id": str(parent) if parent is not None else None,
+        "reactions": reactions if isinstance(reactions, int) else 0,
+        "depth": node.get("depth"),
+    }
+
+
+def find_comments(doc: Any, parent_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Recorre un JSON y produce los comentarios (las respuestas llevan parent_id)"""
+    stack = [(doc, parent_id)]
+    while stack:
+        node, parent = stack.pop()
+        if isinstance(node, list):
+            stack.extend((item, parent) for item in reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+        if _is_comment(node):
+            record = comment_record(node, parent)
+            yield record
+            # Lo que cuelga del comentario son sus respuestas
+            hijos = [(value, record["comment_id"]) for key, value in node.items()
+                     if key not in ("author", "body", "comment_parent", "parent_comment")]
+            stack.extend(reversed(hijos))
+            continue
+        stack.extend((value, parent) for value in reversed(list(node.values())))
+
+
+def parse_payload(text: str) -> List[Dict[str, Any]]:
+    """Comentarios de una respuesta de red (texto crudo)"""
+    comments = []
+    for doc in iter_json_documents(text):
+        comments.extend(find_comments(doc))
+    return comments
+
+
+class CommentCollector:
+    """
+    Acumula los comentarios de las respuestas GraphQL de una página.
+    Un mismo comentario puede llegar varias veces (al paginar, al abrir respuestas);
+    se guarda una vez por ID (ver dedup.CommentIndex), completando los campos que falten.
+    """
+
+    def __init__(self):
+        self.index = CommentIndex()
+        self.responses = 0
+        self.errors = 0
+        self._handler = self.on_response
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def add_payload(self, text: str):
+        self.index.extend(parse_payload(text))
+
+    def on_response(self, response):
+        if not is_graphql_url(response.url):
+            return
+        try:
+            text = response.text()
+        except Exception:
+            # Respuestas de redirect o ya descartadas no tienen body
+            self.errors += 1
+            return
+        self.responses += 1
+        self.add_payload(text)
+
+    async def on_response_async(self, response):
+        if not is_graphql_url(response.url):
+            return
+        try:
+            text = await response.text()
+        except Exception:
+            self.errors += 1
+            return
+        self.responses += 1
+        self.add_payload(text)
+
+    def attach(self, page) -> "CommentCollector":
+        self._handler = self.on_response
+        page.on("response", self._handler)
+        return self
+
+    def attach_async(self, page) -> "CommentCollector":
+        """attach para páginas de playwright.async_api (el body se lee con await)"""
+        self._handler = self.on_response_async
+        page.on("response", self._handler)
+        return self
+
+    def detach(self, page):
+        page.remove_listener("response", self._handler)
+
+    @property
+    def comments(self) -> List[Dict[str, Any]]:
+        return self.index.records
+
+
+def har_entries(har_path: str) -> Iterator[Dict[str, Any]]:
+    with open(har_path, "r", encoding="utf-8") as f:
+        har = json.load(f)
+    yield from har.get("log", {}).get("entries", [])
+
+
+def comments_from_har(har_path: str) -> List[Dict[str, Any]]:
+    """Aplica el parser a las respuestas GraphQL de un HAR (sin navegador ni red)"""
+    collector = CommentCollector()
+    for entry in har_entries(har_path):
+        if not is_graphql_url(entry.get("request", {}).get("url", "")):
+            continue
+        content = entry.get("response", {}).get("content", {})
+        text = content.get("text")
+        if not text:
+            continue
+        if content.get("encoding") == "base64":
+            text = base64.b64decode(text).decode("utf-8", errors="replace")
+        collector.responses += 1
+        collector.add_payload(text)
+    return collector.comments
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python src/graphql_capture.py archivo.har [archivo2.har ...]")
+        sys.exit(1)
+    for ruta in sys.argv[1:]:
+        comentarios = comments_from_har(ruta)
+        respuestas = sum(1 for c in comentarios if c["parent_id"])
+        print(f"📦 {ruta}: {len(comentarios)} comentarios ({respuestas} respuestas)")
+        for c in comentarios[:10]:
+            print(f"  [{c['comment_id']}] {c['author'][:20]}: {c['text'][:60]} (👍 {c['reactions']})")
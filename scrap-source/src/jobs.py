@@ -0,0 +1,523 @@
+"""
+Cola durable de jobs (transcripción / scrape) para procesarlos fuera del request HTTP.
+
+Un job es un dict con:
+- id, action, payload (el body original), status, progress, result, error,
+  attempts, worker, created_at, started_at, finished_at, heartbeat_at
+- status: queued → running → done | failed
+
+Backends:
+- SqliteJobQueue: un archivo SQLite (local, runner.py, una instancia de la función)
+- AppwriteJobQueue: una colección de Appwrite Databases compartida entre instancias
+
+JobScheduler reparte los jobs de una cola entre N workers (hilos) con un
+`handler(job, progress) -> (resultado, status_code)`; lo usan la acción "work" de
+la función y `runner.py --queue`.
+
+Variables de entorno:
+- JOB_QUEUE_PATH: archivo SQLite (default: <tmp>/scrap-jobs.sqlite3)
+- JOB_QUEUE_DATABASE_ID y JOB_QUEUE_COLLECTION_ID: si están definidos se usa la
+  colección de Appwrite (atributos string: action, payload, status, progress,
+  result, error, worker; integer: attempts; float: created_at, started_at,
+  finished_at, heartbeat_at)
+- JOB_QUEUE_CLAIMS_COLLECTION_ID: colección (sin atributos) para los claims atómicos de
+  la cola de Appwrite; obligatoria junto con las dos anteriores
+- JOB_STALE_S: segundos sin heartbeat para devolver un job "running" a la cola (default: 900)
+- JOB_MAX_ATTEMPTS: intentos antes de marcarlo "failed" (default: 2)
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+JOB_STATUSES = (QUEUED, RUNNING, DONE, FAILED)
+
+# Campos que se guardan como JSON
+_JSON_FIELDS = ("payload", "progress", "result")
+
+
+def new_job_id() -> str:
+    return f"job-{uuid.uuid4().hex[:20]}"
+
+
+def keyed_job_id(action: str, key: str) -> str:
+    """ID determinístico para encolar una sola vez la misma acción sobre la misma clave"""
+    return f"job-{hashlib.sha1(f'{action}|{key}'.encode('utf-8')).hexdigest()[:20]}"
+
+
+def new_claim_token(worker: str) -> str:
+    """Identifica un claim concreto: dos claims del mismo worker nunca comparten token"""
+    return f"{worker}:{uuid.uuid4().hex[:8]}"
+
+
+def public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """El job sin el payload (puede llevar cookies) para la respuesta de "status" """
+    return {k: v for k, v in job.items() if k != "payload"}
+
+
+def _encode(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: (json.dumps(v, ensure_ascii=False) if k in _JSON_FIELDS and v is not None else v)
+            for k, v in job.items()}
+
+
+def _decode(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: (json.loads(v) if k in _JSON_FIELDS and v else v) for k, v in row.items()}
+
+
+class SqliteJobQueue:
+    """Cola en un archivo SQLite (WAL); `claim` es atómico entre hilos y procesos"""
+
+    _COLUMNS = ("id", "action", "payload", "status", "progress", "result", "error", "attempts",
+                "worker", "created_at", "started_at", "finished_at", "heartbeat_at")
+
+    def __init__(self, path: str, max_attempts: int = 2):
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._connect()
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY, action TEXT NOT NULL, payload TEXT, status TEXT NOT NULL,
+                    progress TEXT, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT, created_at REAL, started_at REAL, finished_at REAL, heartbeat_at REAL
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        finally:
+            db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Una conexión por operación: segura entre hilos; IMMEDIATE serializa los claims
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _write(self, sql: str, params: Tuple) -> int:
+        db = self._connect()
+        try:
+            return db.execute(sql, params).rowcount
+        finally:
+            db.close()
+
+    def enqueue(self, action: str, payload: Dict[str, Any], key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Agrega un job. Con `key` el ID es determinístico (`keyed_job_id`): si ya hay un job
+        "queued" o "running" con esa clave no se agrega otro y devuelve None; uno
+        terminado ("done" / "failed") se vuelve a encolar desde cero.
+        """
+        job = {"id": keyed_job_id(action, key) if key else new_job_id(), "action": action, "payload": payload, "status": QUEUED, "progress": None,
+               "result": None, "error": None, "attempts": 0, "worker": None, "created_at": time.time(),
+               "started_at": None, "finished_at": None, "heartbeat_at": None}
+        fila = _encode(job)
+        sql = f"INSERT INTO jobs ({', '.join(self._COLUMNS)}) VALUES ({', '.join('?' * len(self._COLUMNS))})"
+        if key:
+            reinicio = ", ".join(f"{c} = excluded.{c}" for c in self._COLUMNS if c != "id")
+            sql += f" ON CONFLICT(id) DO UPDATE SET {reinicio} WHERE jobs.status IN ('{DONE}', '{FAILED}')"
+        if not self._write(sql, tuple(fila[c] for c in self._COLUMNS)):
+            return None
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        db = self._connect()
+        try:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            db.close()
+        return _decode(dict(row)) if row else None
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Toma el job en cola más antiguo y lo marca "running"; `job["worker"]` queda con el
+        token del claim, que hay que pasar a update_progress / complete / fail.
+        """
+        token = new_claim_token(worker)
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            now = time.time()
+            db.execute("UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, "
+                       "heartbeat_at = ?, error = NULL WHERE id = ?", (RUNNING, token, now, now, row["id"]))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+        return self.get(row["id"])
+
+    def update_progress(self, job_id: str, progress: Dict[str, Any], worker: str) -> bool:
+        """False si el job ya no pertenece a este claim (re-encolado y tomado por otro worker)"""
+        return self._write("UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE id = ? AND status = ? AND worker = ?",
+                           (json.dumps(progress, ensure_ascii=False), time.time(), job_id, RUNNING, worker)) > 0
+
+    def complete(self, job_id: str, result: Dict[str, Any], worker: str, status: str = DONE,
+                 error: Optional[str] = None) -> bool:
+        """Guarda el resultado y borra el payload; False si el claim ya no es de `worker`"""
+        return self._write("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, payload = NULL "
+                           "WHERE id = ? AND status = ? AND worker = ?",
+                           (status, json.dumps(result, ensure_ascii=False), error, time.time(), job_id,
+                            RUNNING, worker)) > 0
+
+    def fail(self, job_id: str, error: str, worker: Optional[str] = None) -> bool:
+        """
+        Devuelve el job a la cola si le quedan intentos; si no, lo marca "failed" y borra el
+        payload. Con `worker`, solo si el claim sigue siendo suyo.
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] != RUNNING or (worker is not None and job["worker"] != worker):
+            return False
+        if job["attempts"] < self.max_attempts:
+            sql, params = "UPDATE jobs SET status = ?, error = ?, worker = NULL", [QUEUED, error]
+        else:
+            sql, params = ("UPDATE jobs SET status = ?, error = ?, worker = NULL, finished_at = ?, payload = NULL",
+                           [FAILED, error, time.time()])
+        return self._write(f"{sql} WHERE id = ? AND status = ? AND worker = ?",
+                           tuple(params + [job_id, RUNNING, job["worker"]])) > 0
+
+    def requeue_stale(self, max_age_s: float) -> int:
+        """Jobs "running" sin heartbeat reciente (worker caído o timeout de la función)"""
+        limite = time.time() - max_age_s
+        db = self._connect()
+        try:
+            rows = db.execute("SELECT id FROM jobs WHERE status = ? AND heartbeat_at < ?", (RUNNING, limite)).fetchall()
+        finally:
+            db.close()
+        return sum(self.fail(row["id"], "Sin heartbeat del worker") for row in rows)
+
+    def counts(self) -> Dict[str, int]:
+        db = self._connect()
+        try:
+            rows = db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        finally:
+            db.close()
+        return {status: 0 for status in JOB_STATUSES} | {row["status"]: row["n"] for row in rows}
+
+
+class AppwriteJobQueue:
+    """
+    Cola en una colección de Appwrite Databases (un documento por job).
+    Databases no tiene compare-and-set, pero la creación de un documento con ID fijo sí
+    es atómica: `claim` crea "<job_id>-<intento>" en la colección de claims y solo el
+    worker que lo logra (los demás reciben 409) toma el job.
+
+    Si el worker muere entre crear el claim y marcar el job "running", el job sigue
+    "queued" con el claim de ese intento ya creado: pasados `stale_s` segundos ese
+    claim se da por perdido y el siguiente worker reclama el intento siguiente (el
+    intento perdido cuenta para JOB_MAX_ATTEMPTS).
+
+    Las escrituras posteriores (heartbeat, complete, fail) leen el job y solo escriben
+    si `worker` sigue siendo el token del claim, pero lectura y escritura son dos
+    llamadas: si el job se re-encola y otro worker lo toma justo entre ambas, un worker
+    viejo todavía puede pisar el estado. Es una protección de mejor esfuerzo (la
+    ventana es de milisegundos contra JOB_STALE_S sin heartbeat), no un fencing;
+    SqliteJobQueue sí escribe de forma condicional.
+    """
+
+    def __init__(self, client, database_id: str, collection_id: str, claims_collection_id: str,
+                 max_attempts: int = 2, stale_s: float = 900.0):
+        from appwrite.services.databases import Databases
+
+        self.databases = Databases(client)
+        self.database_id = database_id
+        self.collection_id = collection_id
+        self.claims_collection_id = claims_collection_id
+        self.max_attempts = max_attempts
+        self.stale_s = stale_s
+
+    @staticmethod
+    def _from_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+        campos = {k: v for k, v in doc.items() if not k.startswith("$")}
+        return _decode({"id": doc["$id"], **campos})
+
+    def _update(self, job_id: str, data: Dict[str, Any]):
+        self.databases.update_document(self.database_id, self.collection_id, job_id, _encode(data))
+
+    def enqueue(self, action: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = new_job_id()
+        data = {"action": action, "payload": payload, "status": QUEUED, "attempts": 0, "created_at": time.time()}
+        self.databases.create_document(self.database_id, self.collection_id, job_id, _encode(data))
+        return {"id": job_id, "progress": None, "result": None, "error": None, "worker": None, **data}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        from appwrite.exception import AppwriteException
+
+        try:
+            return self._from_document(self.databases.get_document(self.database_id, self.collection_id, job_id))
+        except AppwriteException as e:
+            if getattr(e, "code", None) == 404:
+                return None
+            raise
+
+    def _list(self, *queries: str) -> List[Dict[str, Any]]:
+        return self.databases.list_documents(self.database_id, self.collection_id, list(queries))["documents"]
+
+    def _reclamar(self, job_id: str, intento: int) -> bool:
+        """Crea el documento de claim del intento; False si otro worker lo creó antes"""
+        from appwrite.exception import AppwriteException
+
+        try:
+            self.databases.create_document(self.database_id, self.claims_collection_id, f"{job_id}-{intento}",
+                                           {})
+            return True
+        except AppwriteException as e:
+            if getattr(e, "code", None) == 409:
+                return False
+            raise
+
+    def _claim_perdido(self, job_id: str, intento: int) -> bool:
+        """True si el claim del intento existe y es más viejo que `stale_s` (su worker murió antes del update)"""
+        from appwrite.exception import AppwriteException
+
+        try:
+            claim = self.databases.get_document(self.database_id, self.claims_collection_id, f"{job_id}-{intento}")
+        except AppwriteException as e:
+            if getattr(e, "code", None) == 404:
+                return False
+            raise
+        creado = datetime.fromisoformat(claim["$createdAt"].replace("Z", "+00:00")).timestamp()
+        return time.time() - creado > self.stale_s
+
+    def _soltar(self, job_id: str, intento: int):
+        """Borra el claim de un intento que no llegó a marcar el job (mejor esfuerzo)"""
+        try:
+            self.databases.delete_document(self.database_id, self.claims_collection_id, f"{job_id}-{intento}")
+        except Exception:
+            pass
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        from appwrite.query import Query
+
+        for doc in self._list(Query.equal("status", QUEUED), Query.order_asc("created_at"), Query.limit(5)):
+            intento = (doc.get("attempts") or 0) + 1
+            # Los claims perdidos se saltean: crear el del intento siguiente sigue siendo atómico
+            while not self._reclamar(doc["$id"], intento):
+                if not self._claim_perdido(doc["$id"], intento):
+                    intento = None
+                    break
+                intento += 1
+            if intento is None:
+                continue
+            token = new_claim_token(worker)
+            now = time.time()
+            try:
+                self._update(doc["$id"], {"status": RUNNING, "worker": token, "attempts": intento,
+                                          "started_at": now, "heartbeat_at": now, "error": None})
+            except Exception:
+                self._soltar(doc["$id"], intento)
+                raise
+            job = self.get(doc["$id"])
+            if job and job["worker"] == token and job["attempts"] == intento:
+                return job
+        return None
+
+    def _owned(self, job_id: str, worker: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        El job si sigue "running" con el claim `worker` (o con cualquiera si worker es None).
+        Es una lectura previa a la escritura, no parte de ella (ver el docstring de la clase).
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] != RUNNING or (worker is not None and job.get("worker") != worker):
+            return None
+        return job
+
+    def update_progress(self, job_id: str, progress: Dict[str, Any], worker: str) -> bool:
+        if self._owned(job_id, worker) is None:
+            return False
+        self._update(job_id, {"progress": progress, "heartbeat_at": time.time()})
+        return True
+
+    def complete(self, job_id: str, result: Dict[str, Any], worker: str, status: str = DONE,
+                 error: Optional[str] = None) -> bool:
+        if self._owned(job_id, worker) is None:
+            return False
+        self._update(job_id, {"status": status, "result": result, "error": error, "finished_at": time.time(),
+                              "payload": None})
+        return True
+
+    def fail(self, job_id: str, error: str, worker: Optional[str] = None) -> bool:
+        job = self._owned(job_id, worker)
+        if job is None:
+            return False
+        if (job.get("attempts") or 0) < self.max_attempts:
+            self._update(job_id, {"status": QUEUED, "error": error, "worker": None})
+        else:
+            self._update(job_id, {"status": FAILED, "error": error, "worker": None, "finished_at": time.time(),
+                                  "payload": None})
+        return True
+
+    def requeue_stale(self, max_age_s: float) -> int:
+        from appwrite.query import Query
+
+        docs = self._list(Query.equal("status", RUNNING), Query.less_than("heartbeat_at", time.time() - max_age_s),
+                          Query.limit(100))
+        return sum(self.fail(doc["$id"], "Sin heartbeat del worker") for doc in docs)
+
+    def counts(self) -> Dict[str, int]:
+        from appwrite.query import Query
+
+        return {status: self.databases.list_documents(self.database_id, self.collection_id,
+                                                      [Query.equal("status", status), Query.limit(1)])["total"]
+                for status in JOB_STATUSES}
+
+
+def queue_from_env(client=None, path: Optional[str] = None):
+    """Cola de Appwrite si JOB_QUEUE_DATABASE_ID/JOB_QUEUE_COLLECTION_ID están definidos, si no SQLite"""
+    max_attempts = int(os.environ.get("JOB_MAX_ATTEMPTS", "2"))
+    database_id = os.environ.get("JOB_QUEUE_DATABASE_ID")
+    collection_id = os.environ.get("JOB_QUEUE_COLLECTION_ID")
+    if database_id and collection_id and client is not None and path is None:
+        claims_id = os.environ.get("JOB_QUEUE_CLAIMS_COLLECTION_ID")
+        if not claims_id:
+            raise ValueError("La cola de Appwrite requiere JOB_QUEUE_CLAIMS_COLLECTION_ID (claims atómicos)")
+        return AppwriteJobQueue(client, database_id, collection_id, claims_id, max_attempts=max_attempts,
+                                stale_s=float(os.environ.get("JOB_STALE_S", "900")))
+    path = path or os.environ.get("JOB_QUEUE_PATH") or os.path.join(tempfile.gettempdir(), "scrap-jobs.sqlite3")
+    return SqliteJobQueue(path, max_attempts=max_attempts)
+
+
+Handler = Callable[[Dict[str, Any], Callable[..., None]], Tuple[Dict[str, Any], int]]
+
+
+class JobScheduler:
+    """
+    Procesa los jobs de una cola con `workers` hilos.
+    `handler(job, progress)` devuelve (resultado, status_code); un código >= 400 deja el
+    job "failed" con ese resultado, una excepción lo reintenta hasta JOB_MAX_ATTEMPTS.
+    `progress(etapa, **datos)` guarda el avance del job y renueva su heartbeat.
+    Si el job se re-encoló mientras corría (sin heartbeat) y lo tomó otro worker, la cola
+    rechaza las escrituras de este claim y el resultado se descarta ("lost").
+    """
+
+    def __init__(self, queue, handler: Handler, workers: int = 1, poll_interval: float = 1.0,
+                 worker_id: Optional[str] = None, stale_s: Optional[float] = None,
+                 log: Callable[[str], Any] = print):
+        self.queue = queue
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.stale_s = stale_s if stale_s is not None else float(os.environ.get("JOB_STALE_S", "900"))
+        self.log = log
+        self.stats = {"done": 0, "failed": 0, "retried": 0, "lost": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def run_one(self, worker: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Toma y procesa un job; None si la cola está vacía"""
+        job = self.queue.claim(worker or self.worker_id)
+        if job is None:
+            return None
+
+        token = job["worker"]
+        ultimo: Dict[str, Any] = {"stage": "started"}
+        terminado = threading.Event()
+
+        def progress(etapa: str, **datos):
+            ultimo.clear()
+            ultimo.update({"stage": etapa, **datos, "at": time.time()})
+            self.queue.update_progress(job["id"], dict(ultimo), token)
+
+        def heartbeat():
+            # Una etapa larga (una transcripción de una hora) no debe parecer un worker caído
+            while not terminado.wait(self.stale_s / 3):
+                try:
+                    if not self.queue.update_progress(job["id"], dict(ultimo), token):
+                        return
+                except Exception:
+                    pass
+
+        self.log(f"🧵 Job {job['id']} ({job['action']}, intento {job['attempts']})")
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            resultado, status_code = self.handler(job, progress)
+        except Exception as e:
+            self.log(f"❌ Job {job['id']}: {e}")
+            self._count("retried" if self.queue.fail(job["id"], str(e), token) else "lost")
+            return self.queue.get(job["id"])
+        finally:
+            terminado.set()
+
+        fallido = status_code >= 400
+        if self.queue.complete(job["id"], resultado, token, FAILED if fallido else DONE,
+                               resultado.get("error") if fallido else None):
+            self._count("failed" if fallido else "done")
+        else:
+            self.log(f"⚠️  Job {job['id']}: el claim pasó a otro worker, se descarta el resultado")
+            self._count("lost")
+        return self.queue.get(job["id"])
+
+    def drain(self, time_budget: Optional[float] = None) -> Dict[str, int]:
+        """
+        Procesa jobs hasta vaciar la cola o agotar `time_budget` (no se empieza un job
+        nuevo pasado el presupuesto). Devuelve las estadísticas.
+        """
+        self.queue.requeue_stale(self.stale_s)
+        deadline = time.monotonic() + time_budget if time_budget else None
+
+        def loop(worker: str):
+            while not self._stop.is_set() and (deadline is None or time.monotonic() < deadline):
+                if self.run_one(worker) is None:
+                    return
+
+        if self.workers == 1:
+            loop(self.worker_id)
+        else:
+            hilos = [threading.Thread(target=loop, args=(f"{self.worker_id}-{i}",), daemon=True)
+                     for i in range(self.workers)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        return dict(self.stats)
+
+    def start(self) -> "JobScheduler":
+        """Workers en segundo plano que esperan jobs nuevos hasta `stop()`"""
+        self.queue.requeue_stale(self.stale_s)
+
+        def loop(worker: str):
+            while not self._stop.is_set():
+                if self.run_one(worker) is None:
+                    self._stop.wait(self.poll_interval)
+
+        self._stop.clear()
+        self._threads = [threading.Thread(target=loop, args=(f"{self.worker_id}-{i}",), daemon=True)
+                         for i in range(self.workers)]
+        for hilo in self._threads:
+            hilo.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for hilo in self._threads:
+            hilo.join()
+        self._threads = []
+
+    def wait(self, job_ids: List[str], poll_interval: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Espera a que los jobs terminen (done o failed) y los devuelve en el mismo orden"""
+        while True:
+            jobs = [self.queue.get(job_id) for job_id in job_ids]
+            if all(job is None or job["status"] in (DONE, FAILED) for job in jobs):
+                return jobs
+            time.sleep(poll_interval or self.poll_interval)
@@ -0,0 +1,107 @@
+"""
+Stand-in local de Appwrite Storage.
+
+Implementa las llamadas de `appwrite.services.storage.Storage` que usa el
+proyecto (create_file, get_file, get_file_download, delete_file) sobre un
+directorio: un archivo por file_id dentro de <dir>/<bucket_id>/ y un .meta.json
+con nombre, tipo y tamaño. Los errores son AppwriteException con los mismos
+códigos (404, 409) que devuelve el servidor.
+
+Se activa con APPWRITE_STORAGE_DIR (ver uploads.get_storage) para correr la
+función, la caché o los benchmarks sin un servidor de Appwrite.
+"""
+
+import json
+import math
+import os
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Tamaño de chunk del SDK: los archivos más grandes se suben en varias peticiones
+CHUNK_SIZE = 5 * 1024 * 1024
+
+
+def _error(message: str, code: int):
+    from appwrite.exception import AppwriteException
+    return AppwriteException(message, code)
+
+
+class LocalStorage:
+    """Storage de Appwrite sobre el sistema de archivos"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.stats = {"files": 0, "bytes_written": 0, "chunks": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, bucket_id: str, file_id: str) -> str:
+        return os.path.join(self.directory, bucket_id, file_id)
+
+    def create_file(self, bucket_id: str, file_id: str, file, permissions: Optional[List[str]] = None,
+                    on_progress=None) -> Dict[str, Any]:
+        if file_id == "unique()":
+            file_id = uuid.uuid4().hex[:20]
+        path = self._path(bucket_id, file_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if getattr(file, "source_type", None) == "bytes" or getattr(file, "path", None) is None:
+            data = file.data
+        else:
+            with open(file.path, "rb") as f:
+                data = f.read()
+
+        with self._lock:
+            if os.path.exists(path):
+                raise _error(f"A file with the requested ID already exists: {file_id}", 409)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+            chunks = max(1, math.ceil(len(data) / CHUNK_SIZE))
+            meta = {
+                "$id": file_id,
+                "bucketId": bucket_id,
+                "$createdAt": datetime.now(timezone.utc).isoformat(),
+                "name": file.filename or file_id,
+                "mimeType": getattr(file, "mime_type", None) or "application/octet-stream",
+                "sizeOriginal": len(data),
+                "chunksTotal": chunks,
+                "chunksUploaded": chunks,
+            }
+            with open(f"{path}.meta.json", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            self.stats["files"] += 1
+            self.stats["bytes_written"] += len(data)
+            self.stats["chunks"] += chunks
+        return meta
+
+    def get_file(self, bucket_id: str, file_id: str) -> Dict[str, Any]:
+        try:
+            with open(f"{self._path(bucket_id, file_id)}.meta.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise _error(f"File not found: {file_id}", 404)
+
+    def get_file_download(self, bucket_id: str, file_id: str) -> bytes:
+        try:
+            with open(self._path(bucket_id, file_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise _error(f"File not found: {file_id}", 404)
+
+    def delete_file(self, bucket_id: str, file_id: str) -> Dict[str, Any]:
+        path = self._path(bucket_id, file_id)
+        with self._lock:
+            if not os.path.exists(path):
+                raise _error(f"File not found: {file_id}", 404)
+            os.remove(path)
+            try:
+                os.remove(f"{path}.meta.json")
+            except FileNotFoundError:
+                pass
+        return {}
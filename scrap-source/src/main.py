@@ -3,351 +3,300 @@ Appwrite Function: Video Transcriptor + Facebook Scraper
 - Descarga audio de videos (Facebook, TikTok, YouTube) y genera transcripciones
 - Extrae comentarios de posts de Facebook
 Guarda los resultados en Appwrite Storage.
+
+Las dependencias pesadas (Playwright, yt-dlp, faster-whisper, numpy y el SDK de
+Appwrite) se importan dentro de las funciones que las usan: el GET de info no
+carga ninguna y el scrape no carga las de transcripción. Ver bench-importtime.py.
 """
 
 import os
+import sys
 import json
-import base64
-import random
+import math
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, Any, List
-from appwrite.client import Client
-from appwrite.services.storage import Storage
-from appwrite.input_file import InputFile
-from appwrite.id import ID
-import yt_dlp
-from faster_whisper import WhisperModel
-from playwright.sync_api import sync_playwright
+from typing import TYPE_CHECKING, Callable, Optional, Dict, Any, List, Set, Tuple
+
+# Los módulos compartidos viven junto a este archivo
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from workspace import JobWorkspace
+from audio import descargar, extraer_info, resolver_modo
+from cache import TranscriptionCache, cache_from_env, hash_archivo
+from sinks import MIN_FLUSH_INTERVAL, BucketJsonlSink, JsonlSink, escribir_segmentos, leer_segmentos
+from transcriptor import transcribir_stream
+from engine import PRESETS, EngineConfig, model_load_stats, warmup
+from browser_pool import BrowserPool
+from uploads import get_storage, upload_json
+from cookies import CookieError, check_expiry, get_cookies, netscape_cookie_file
+from blocking import resolve_block_policy
+from extraction import extract_comments
+from graphql_capture import SCRAPE_MODES, CommentCollector, resolve_scrape_mode
+from waits import PageWaiter
+from buttons import button_stats
+from expansion import COMMENT_EXPAND_LABELS, SEE_MORE_LABELS, ExpansionController
+from scrape_state import NewestFirstProbe, known_keys, new_comments, state_store_from_env, update_state
+from jobs import AppwriteJobQueue, JobScheduler, public_view, queue_from_env
+
+if TYPE_CHECKING:
+    from appwrite.client import Client
 
 # Limpiar variables de proxy que pueden interferir con Playwright
 for proxy_var in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'NO_PROXY', 'no_proxy']:
     if proxy_var in os.environ:
         del os.environ[proxy_var]
 
-# Configuración del modelo Whisper
-MODEL_SIZE = os.environ.get("WHISPER_MODEL_SIZE", "small")
-model = None
-
-# Labels para expandir comentarios
-SEE_MORE_LABELS = [
-    "See more comments", "View more comments", "Ver más comentarios",
-    "View previous comments", "Mostrar comentarios anteriores",
-    "Mostrar más comentarios", "Load more comments", "Cargar más comentarios"
-]
-
-COMMENT_EXPAND_LABELS = ["See more", "Ver más", "Show more", "Mostrar más"]
 
+def carga_de_modelos(antes: Dict[str, float]) -> float:
+    """Segundos de carga de modelos pagados desde la foto `antes` de model_load_stats()"""
+    return round(sum(s for key, s in model_load_stats().items() if key not in antes), 3)
 
-def get_whisper_model():
-    """Carga el modelo Whisper (singleton para reutilizar entre ejecuciones)"""
-    global model
-    if model is None:
-        model = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8")
-    return model
 
+# ==================== TRANSCRIPTOR ====================
 
-def get_cookies(body: Dict[str, Any]) -> Optional[List[Dict]]:
+def descargar_audio(url: str, temp_path: str, cookies_path: Optional[str] = None,
+                    modo: Optional[str] = None, info: Optional[Dict[str, Any]] = None) -> Optional[str]:
     """
-    Obtiene las cookies de Facebook desde el body (base64) o desde ENV.
-    Retorna la lista de cookies o None.
+    Descarga solo el audio. En modo native/pcm se conserva el contenedor original
+    (sin re-encode); en modo mp3 se convierte a mp3 como antes.
     """
-    cookies_data = None
-    
-    # Prioridad 1: cookies en base64 desde el body
-    if body.get("cookies_base64"):
-        try:
-            cookies_data = base64.b64decode(body["cookies_base64"]).decode("utf-8")
-        except Exception:
-            pass
-    
-    # Prioridad 2: cookies en base64 desde ENV
-    if not cookies_data and os.environ.get("FACEBOOK_COOKIES_BASE64"):
-        try:
-            cookies_data = base64.b64decode(os.environ["FACEBOOK_COOKIES_BASE64"]).decode("utf-8")
-        except Exception:
-            pass
-    
-    # Prioridad 3: cookies como JSON directo desde ENV
-    if not cookies_data and os.environ.get("FACEBOOK_COOKIES_JSON"):
-        cookies_data = os.environ["FACEBOOK_COOKIES_JSON"]
-    
-    if not cookies_data:
-        return None
-    
-    try:
-        raw_cookies = json.loads(cookies_data)
-        return sanitize_cookies(raw_cookies)
-    except json.JSONDecodeError:
-        return None
-
-
-def sanitize_cookies(raw_cookies: List[Dict]) -> List[Dict]:
-    """Sanitiza cookies para Playwright"""
-    clean_cookies = []
-    for cookie in raw_cookies:
-        clean_cookie = {
-            "name": cookie.get("name", ""),
-            "value": cookie.get("value", ""),
-            "domain": cookie.get("domain", ""),
-            "path": cookie.get("path", "/"),
-        }
-        
-        same_site = cookie.get("sameSite") or ""
-        if isinstance(same_site, str):
-            same_site = same_site.lower()
-            if same_site in ["strict", "lax", "none"]:
-                clean_cookie["sameSite"] = same_site.capitalize()
-            else:
-                clean_cookie["sameSite"] = "Lax"
-        else:
-            clean_cookie["sameSite"] = "Lax"
-        
-        if "httpOnly" in cookie:
-            clean_cookie["httpOnly"] = bool(cookie["httpOnly"])
-        if "secure" in cookie:
-            clean_cookie["secure"] = bool(cookie["secure"])
-        if "expires" in cookie:
-            clean_cookie["expires"] = cookie["expires"]
-            
-        clean_cookies.append(clean_cookie)
-    
-    return clean_cookies
-
-
-def save_cookies_to_file(cookies: List[Dict]) -> str:
-    """Guarda cookies en archivo temporal para yt-dlp"""
-    cookies_path = "/tmp/facebook_cookies.json"
-    with open(cookies_path, "w", encoding="utf-8") as f:
-        json.dump(cookies, f)
-    return cookies_path
-
-
-# ==================== TRANSCRIPTOR ====================
-
-def descargar_audio(url: str, cookies_path: Optional[str] = None, temp_path: str = "/tmp/temp_audio") -> Optional[str]:
-    """Descarga solo el audio y lo guarda como archivo mp3"""
-    opciones = {
-        'format': 'bestaudio/best',
-        'outtmpl': f'{temp_path}.%(ext)s',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'quiet': True,
-        'no_warnings': True
-    }
-    
-    if cookies_path and os.path.exists(cookies_path):
-        opciones['cookiefile'] = cookies_path
-
     try:
-        with yt_dlp.YoutubeDL(opciones) as ydl:
-            ydl.download([url])
-        return f"{temp_path}.mp3"
+        return descargar(url, temp_path, modo, cookies_path, info=info)
     except Exception as e:
         print(f"❌ Error descargando: {e}")
         return None
 
 
-def transcribir(archivo: str) -> Dict[str, Any]:
+def transcribir(archivo: str, modo: Optional[str] = None, config: Optional[EngineConfig] = None) -> Dict[str, Any]:
     """Usa Whisper para convertir audio a texto"""
     if not os.path.exists(archivo):
         return {"error": "No se encontró el archivo de audio.", "texto": "", "idioma": ""}
 
-    whisper = get_whisper_model()
-    segments, info = whisper.transcribe(archivo, beam_size=5)
-
-    texto_completo = ""
-    segmentos_lista: List[Dict[str, Any]] = []
-
-    for segment in segments:
-        segmentos_lista.append({
-            "start": segment.start,
-            "end": segment.end,
-            "text": segment.text
-        })
-        texto_completo += segment.text + " "
+    info, segmentos = transcribir_stream(archivo, modo, config)
+    segmentos_lista = list(segmentos)
 
     return {
-        "texto": texto_completo.strip(),
+        "texto": " ".join(seg["text"] for seg in segmentos_lista).strip(),
         "idioma": info.language,
         "probabilidad_idioma": info.language_probability,
-        "segmentos": segmentos_lista
+        "segmentos": segmentos_lista,
+        "duracion": info.duration
     }
 
 
+def preparar_audio(url: str, ws: JobWorkspace, cookies_path: Optional[str], modo: Optional[str],
+                   cache: Optional[TranscriptionCache], log=print) -> Dict[str, Any]:
+    """
+    Consulta la caché y, si no hay acierto, descarga el audio.
+    Devuelve {"cache": resultado} si ya estaba transcrito (primero por extractor+ID,
+    sin descargar; después por hash del audio), o {"archivo", "keys"} para transcribir.
+    """
+    info = None
+    media_key = None
+    if cache:
+        try:
+            info = extraer_info(url, cookies_path)
+        except Exception as e:
+            log(f"⚠️ No se pudieron leer los metadatos: {e}")
+        media_key = cache.media_key(info)
+        resultado = cache.get(media_key)
+        if resultado is not None:
+            log("⚡ Transcripción encontrada en caché")
+            return {"cache": resultado}
+
+    log(f"⬇️ Descargando audio de: {url}")
+    archivo_audio = descargar_audio(url, ws.path("audio"), cookies_path, modo, info=info)
+    if not archivo_audio:
+        return {"error": "No se pudo descargar el audio", "status": 400}
+
+    audio_key = cache.audio_key(hash_archivo(archivo_audio)) if cache else None
+    resultado = cache.get(audio_key) if cache else None
+    if resultado is not None:
+        log("⚡ Audio ya transcrito (caché por hash)")
+        cache.put([media_key], resultado)
+        return {"cache": resultado}
+
+    return {"archivo": archivo_audio, "keys": [media_key, audio_key]}
+
+
+def obtener_transcripcion(url: str, ws: JobWorkspace, cookies_path: Optional[str], modo: Optional[str],
+                          cache: Optional[TranscriptionCache], config: Optional[EngineConfig] = None,
+                          log=print) -> Dict[str, Any]:
+    """Transcribe pasando por la caché. `resultado["cache"]` indica si hubo acierto."""
+    audio = preparar_audio(url, ws, cookies_path, modo, cache, log)
+    if "error" in audio:
+        return audio
+    if "cache" in audio:
+        return {**audio["cache"], "cache": True}
+
+    log("🎙️ Transcribiendo audio...")
+    resultado = transcribir(audio["archivo"], modo, config)
+    if "error" in resultado:
+        return {**resultado, "status": 500}
+    if cache:
+        cache.put(audio["keys"], resultado)
+    return {**resultado, "cache": False}
+
+
+def transcribir_a_jsonl(url: str, ws: JobWorkspace, cookies_path: Optional[str], modo: Optional[str],
+                        cache: Optional[TranscriptionCache], sink: JsonlSink,
+                        config: Optional[EngineConfig] = None, log=print) -> Dict[str, Any]:
+    """
+    Variante en streaming: escribe cada segmento al sink apenas sale de Whisper,
+    sin acumular la lista completa. Devuelve métricas (incluida la latencia al primer segmento).
+    """
+    audio = preparar_audio(url, ws, cookies_path, modo, cache, log)
+    if "error" in audio:
+        return audio
+
+    t_inicio = time.perf_counter()
+    if "cache" in audio:
+        resultado = audio["cache"]
+        idioma, probabilidad, segmentos = resultado["idioma"], resultado["probabilidad_idioma"], resultado["segmentos"]
+    else:
+        log("🎙️ Transcribiendo audio (streaming)...")
+        info, segmentos = transcribir_stream(audio["archivo"], modo, config)
+        idioma, probabilidad = info.language, info.language_probability
+
+    sink.write({
+        "tipo": "meta",
+        "url_origen": url,
+        "fecha_transcripcion": datetime.now().isoformat(),
+        "idioma": idioma,
+        "probabilidad_idioma": probabilidad
+    })
+    stats = escribir_segmentos(segmentos, sink, t_inicio)
+    sink.write({"tipo": "fin", **stats})
+
+    if cache and "archivo" in audio:
+        # La entrada de caché se arma desde el spool, una vez terminada la transcripción
+        segmentos_guardados = list(leer_segmentos(sink.path))
+        cache.put(audio["keys"], {
+            "texto": " ".join(seg["text"] for seg in segmentos_guardados).strip(),
+            "idioma": idioma,
+            "probabilidad_idioma": probabilidad,
+            "segmentos": segmentos_guardados
+        })
+    return {**stats, "idioma": idioma, "cache": "cache" in audio}
+
+
 # ==================== SCRAPER FACEBOOK ====================
 
-def expand_comments(page, max_clicks: int = 30) -> int:
-    """Expande la lista de comentarios haciendo click en 'ver más'"""
-    clicks = 0
-    
-    for _ in range(3):
-        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        time.sleep(2)
-    
-    for _ in range(max_clicks):
-        button = None
-        selectors = [f'span:has-text("{label}")' for label in SEE_MORE_LABELS] + \
-                   [f'div:has-text("{label}")' for label in SEE_MORE_LABELS] + \
-                   ['[aria-label*="comments"]', '[role="button"]:has-text("más")', '[role="button"]:has-text("more")']
-        
-        for selector in selectors:
-            try:
-                locator = page.locator(selector).first
-                if locator.is_visible(timeout=1000):
-                    button = locator
-                    break
-            except:
-                continue
-                
-        if button:
-            try:
-                button.click(timeout=3000)
-                clicks += 1
-                time.sleep(random.uniform(1.5, 3))
-            except:
-                break
-        else:
-            page.evaluate("window.scrollBy(0, 500)")
-            time.sleep(1)
-            break
-    
-    return clicks
+def expand_comments(page, max_clicks: Optional[int] = None, waiter: Optional[PageWaiter] = None,
+                    time_budget: Optional[float] = None, extra_progress=None, stop_when=None) -> int:
+    """
+    Expande la lista de comentarios (y los hilos de respuestas) hasta que dejan de
+    aparecer comentarios nuevos o se acaba `time_budget`. `max_clicks` es un tope opcional
+    y `stop_when` corta antes (p. ej. al llegar a comentarios ya scrapeados).
+    """
+    controller = ExpansionController(page, SEE_MORE_LABELS, COMMENT_EXPAND_LABELS, waiter=waiter,
+                                     time_budget=time_budget, max_clicks=max_clicks,
+                                     extra_progress=extra_progress, stop_when=stop_when)
+    stats = controller.run()
+    print(f"🔽 {controller.summary()}")
+    return stats["clicks"]
 
 
-def expand_long_comments(page) -> int:
-    """Expande 'See more' dentro de cada comentario"""
-    expanded = 0
-    for label in COMMENT_EXPAND_LABELS:
-        try:
-            buttons = page.locator(f'span:has-text("{label}")').all()
-            for button in buttons[:10]:
-                try:
-                    if button.is_visible():
-                        button.click(timeout=1000)
-                        expanded += 1
-                        time.sleep(0.3)
-                except:
-                    continue
-        except:
-            continue
-    return expanded
-
-
-def extract_comments(page) -> List[Dict]:
-    """Extrae comentarios de la página"""
-    results = []
-    selectors = [
-        '[data-testid="UFI2Comment/root_depth_0"]',
-        '[data-testid="comment"]',
-        'div[aria-label="Comment"]',
-        'div[role="article"]',
-        '[data-ad-preview="message"]',
-    ]
-    
-    comment_blocks = None
-    for selector in selectors:
-        blocks = page.locator(selector)
-        if blocks.count() > 0:
-            comment_blocks = blocks
-            break
-    
-    if not comment_blocks:
-        return results
-        
-    total = comment_blocks.count()
-    
-    for i in range(total):
-        try:
-            block = comment_blocks.nth(i)
-            
-            author = ""
-            for auth_sel in ['strong', 'a[role="link"] strong', 'h3 a']:
-                try:
-                    auth_elem = block.locator(auth_sel).first
-                    if auth_elem.count() > 0:
-                        author = auth_elem.inner_text(timeout=1000).strip()
-                        if author:
-                            break
-                except:
-                    continue
-            
-            texts = []
-            for text_sel in ['span[dir="auto"]:not(:has(strong))', '[dir="auto"]']:
-                try:
-                    spans = block.locator(text_sel)
-                    if spans.count() > 0:
-                        span_texts = spans.all_inner_texts()
-                        for text in span_texts:
-                            text = text.strip()
-                            if text and text != author and len(text) > 1:
-                                texts.append(text)
-                except:
-                    continue
-            
-            unique_texts = list(dict.fromkeys(texts))
-            body = " ".join(unique_texts) if unique_texts else ""
-            
-            if (author and len(author) > 1) or (body and len(body) > 2):
-                comment = {"author": author, "text": body}
-                if comment not in results:
-                    results.append(comment)
-                    
-        except:
-            continue
-    
-    return results
+def expand_long_comments(page, waiter: Optional[PageWaiter] = None) -> int:
+    """Expande todos los 'See more' dentro de los comentarios, en lotes dentro de la página"""
+    return ExpansionController(page, SEE_MORE_LABELS, COMMENT_EXPAND_LABELS, waiter=waiter).expand_truncated()
 
 
-def scrape_facebook_comments(url: str, cookies: List[Dict], max_clicks: int = 30) -> List[Dict]:
-    """Ejecuta el scraper de comentarios de Facebook"""
-    comments = []
-    
-    with sync_playwright() as p:
-        # Lanzar sin proxy y con argumentos para evitar problemas de conexión
-        browser = p.chromium.launch(
-            headless=True,
-            args=[
-                '--no-proxy-server',
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-gpu'
-            ]
-        )
-        context = browser.new_context(
-            bypass_csp=True,
-            ignore_https_errors=True
-        )
-        context.add_cookies(cookies)
-        page = context.new_page()
+_browser_pool: Optional[BrowserPool] = None
+_browser_pool_lock = threading.Lock()
 
-        page.goto(url, wait_until="domcontentloaded", timeout=60000)
-        time.sleep(random.uniform(3, 6))
 
-        expand_comments(page, max_clicks=max_clicks)
-        expand_long_comments(page)
-        comments = extract_comments(page)
+def get_browser_pool() -> BrowserPool:
+    """
+    Pool de navegadores del proceso: Chromium se lanza en el primer scrape y queda
+    abierto para los siguientes mientras la instancia siga caliente.
+    SCRAPE_BROWSERS: navegadores en paralelo (default: 1)
+    BROWSER_MAX_PAGES: páginas por navegador antes de relanzarlo (default: 50)
+    SCRAPE_BLOCK: recursos que no se descargan (ver blocking.py, default: aggressive)
+    """
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is None:
+            _browser_pool = BrowserPool(
+                workers=int(os.environ.get("SCRAPE_BROWSERS", "1")),
+                max_pages=int(os.environ.get("BROWSER_MAX_PAGES", "50")),
+                block_policy=resolve_block_policy()
+            )
+        return _browser_pool
+
+
+def scrape_post(page, url: str, max_clicks: Optional[int] = None, mode: Optional[str] = None,
+                time_budget: Optional[float] = None, known: Optional[Set[str]] = None) -> List[Dict]:
+    """
+    Scrapea un post en una página ya abierta (con las cookies cargadas en su contexto).
+    En modo "graphql" los comentarios salen de las respuestas de red que disparan la
+    carga y los clicks en "ver más"; si no se captura ninguno se parsea el DOM.
+    Con `known` (claves del scrape anterior) se ordena por "más recientes" y la
+    expansión se corta al llegar a comentarios ya vistos.
+    """
+    collector = CommentCollector().attach(page) if resolve_scrape_mode(mode) == "graphql" else None
+    waiter = PageWaiter(page)
+    probe = NewestFirstProbe(page, waiter, known, graphql=collector is not None) if known else None
 
-        context.close()
-        browser.close()
-    
-    return comments
+    try:
+        page.goto(url, wait_until="domcontentloaded", timeout=60000)
+        waiter.settle()
+
+        if probe is not None and not probe.start():
+            print("⚠️  No se encontró el orden 'más recientes': expansión completa")
+
+        expand_comments(page, max_clicks=max_clicks, waiter=waiter, time_budget=time_budget,
+                        extra_progress=(lambda: len(collector)) if collector is not None else None,
+                        stop_when=probe.reached if probe is not None and probe.sorted else None)
+
+        if collector is not None:
+            collector.detach(page)
+            if collector.comments:
+                print(f"📡 {len(collector.comments)} comentarios de {collector.responses} respuestas GraphQL")
+                return collector.comments
+            print("⚠️  Sin comentarios en las respuestas GraphQL, usando el DOM")
+
+        expand_long_comments(page, waiter=waiter)
+        return extract_comments(page)
+    finally:
+        if probe is not None:
+            probe.close()
+        print(f"⏱️  {waiter.summary()}")
+        waiter.close()
+
+
+def scrape_facebook_comments(url: str, cookies: List[Dict], max_clicks: Optional[int] = None,
+                             mode: Optional[str] = None, time_budget: Optional[float] = None,
+                             known: Optional[Set[str]] = None) -> List[Dict]:
+    """Ejecuta el scraper de comentarios de Facebook"""
+    return get_browser_pool().run(scrape_post, url, max_clicks, mode, time_budget, known, cookies=cookies)
 
 
-# ==================== UTILS ====================
+def scrape_facebook_posts(urls: List[str], cookies: List[Dict], max_clicks: Optional[int] = None,
+                          mode: Optional[str] = None, time_budget: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Scrapea varios posts en paralelo con los navegadores del pool.
+    Devuelve [{"url", "comentarios"} o {"url", "error"}] en el orden de `urls`.
+    """
+    pool = get_browser_pool()
+    futures = [(url, pool.submit(scrape_post, url, max_clicks, mode, time_budget, cookies=cookies)) for url in urls]
+    resultados = []
+    for url, future in futures:
+        try:
+            resultados.append({"url": url, "comentarios": future.result()})
+        except Exception as e:
+            resultados.append({"url": url, "error": str(e)})
+    return resultados
 
-def limpiar(archivo: Optional[str]):
-    """Borra el archivo temporal"""
-    if archivo and os.path.exists(archivo):
-        os.remove(archivo)
 
+# ==================== UTILS ====================
 
-def get_appwrite_client() -> Client:
+def get_appwrite_client() -> "Client":
     """Inicializa el cliente de Appwrite"""
+    from appwrite.client import Client
+
     client = Client()
     client.set_endpoint(os.environ.get("APPWRITE_ENDPOINT"))
     client.set_project(os.environ.get("APPWRITE_PROJECT_ID"))
@@ -355,23 +304,69 @@ def get_appwrite_client() -> Client:
     return client
 
 
-def upload_to_bucket(client: Client, data: Any, filename: str) -> Dict:
-    """Sube datos a Appwrite Storage"""
-    storage = Storage(client)
-    bucket_id = os.environ.get("APPWRITE_BUCKET_ID")
-    
-    filepath = f"/tmp/{filename}"
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    
-    result = storage.create_file(
-        bucket_id=bucket_id,
-        file_id=ID.unique(),
-        file=InputFile.from_path(filepath)
-    )
-    
-    limpiar(filepath)
-    return result
+def upload_to_bucket(client: "Client", data: Any, filename: str, compress: Optional[bool] = None) -> Dict:
+    """
+    Sube datos a Appwrite Storage como JSON compacto desde memoria (sin archivo temporal).
+    Con `compress` (o UPLOAD_GZIP=1) se sube gzip y el nombre termina en .gz.
+    """
+    return upload_json(get_storage(client), os.environ.get("APPWRITE_BUCKET_ID"), data, filename, compress)
+
+
+# ==================== JOBS ====================
+
+# Acciones que se pueden encolar con "async": true
+JOB_ACTIONS = ("transcribe", "scrape")
+# Campos del body que nunca se guardan en la cola (sesión de Facebook)
+JOB_SECRET_FIELDS = ("cookies_base64",)
+
+_job_queue = None
+_job_scheduler: Optional[JobScheduler] = None
+_jobs_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Cola de jobs del proceso: colección de Appwrite o SQLite local (ver jobs.queue_from_env)"""
+    global _job_queue
+    with _jobs_lock:
+        if _job_queue is None:
+            client = get_appwrite_client() if os.environ.get("JOB_QUEUE_DATABASE_ID") else None
+            _job_queue = queue_from_env(client)
+        return _job_queue
+
+
+def run_queued_job(job: Dict[str, Any], progress: Callable[..., None]) -> Tuple[Dict[str, Any], int]:
+    """Handler de JobScheduler: el mismo camino que un request síncrono"""
+    return handle_job(job["action"], job["payload"], progress=progress)
+
+
+def start_worker(log: Callable[[str], Any] = print) -> str:
+    """
+    Pone a procesar la cola después de encolar un job:
+    - dentro de Appwrite (APPWRITE_FUNCTION_ID), lanza una ejecución asíncrona de la
+      función con {"action": "work"}; si falla, el job queda en la colección para la
+      próxima ejecución de "work" (un CRON, por ejemplo),
+    - fuera de Appwrite (desarrollo local), workers en hilos de este proceso
+      (JOB_WORKERS, default: 1).
+    Devuelve "execution", "pending" o "thread".
+    """
+    global _job_scheduler
+    queue = get_job_queue()
+    function_id = os.environ.get("APPWRITE_FUNCTION_ID")
+    if function_id:
+        # Un hilo no sobrevive al reciclado de la instancia: nunca como fallback en Appwrite
+        from appwrite.services.functions import Functions
+        try:
+            Functions(get_appwrite_client()).create_execution(function_id, body=json.dumps({"action": "work"}),
+                                                              xasync=True)
+            return "execution"
+        except Exception as e:
+            log(f"⚠️  No se pudo lanzar la ejecución del worker; el job espera al próximo 'work': {e}")
+            return "pending"
+    with _jobs_lock:
+        if _job_scheduler is None:
+            _job_scheduler = JobScheduler(queue, run_queued_job,
+                                          workers=int(os.environ.get("JOB_WORKERS", "1"))).start()
+    return "thread"
 
 
 # ==================== MAIN FUNCTION ====================
@@ -382,13 +377,23 @@ def main(context):
     
     Modos de operación:
     1. Transcriptor: {"action": "transcribe", "url": "...", "filename": "..."}
-    2. Scraper FB:   {"action": "scrape", "url": "...", "max_clicks": 30}
+    2. Scraper FB:   {"action": "scrape", "url": "...", "time_budget": 180, "incremental": false}
+    3. Warm-up:      {"action": "warmup", "preset": "fast"} (carga el modelo antes del primer job)
+    4. Async:        {"action": "transcribe" | "scrape", ..., "async": true} → 202 con "job_id"
+    5. Estado:       {"action": "status", "job_id": "..."} (status, progress y result del job)
+    6. Worker:       {"action": "work", "time_budget": 600} (procesa la cola; ver jobs.py)
+    7. Batch:        {"action": "transcribe" | "scrape", "urls": [...], "concurrency": 2} → un manifest
     
     Variables de entorno requeridas:
     - APPWRITE_ENDPOINT, APPWRITE_PROJECT_ID, APPWRITE_API_KEY, APPWRITE_BUCKET_ID
     
     Variables de entorno opcionales:
     - WHISPER_MODEL_SIZE: tiny, base, small, medium, large (default: small)
+    - WHISPER_PRESET, WHISPER_DEVICE, WHISPER_COMPUTE_TYPE, WHISPER_CPU_THREADS, WHISPER_NUM_WORKERS,
+      WHISPER_BEAM_SIZE, WHISPER_GREEDY, WHISPER_VAD, WHISPER_LANGUAGE (ver engine.py)
+    - WHISPER_CACHE_DIR: carpeta de los pesos (pre-descargados en el build con src/warmup.py)
+    - WHISPER_ALLOWED_MODELS: modelos que se pueden pedir en "engine" (default: solo WHISPER_MODEL_SIZE)
+    - WHISPER_MAX_MODELS: modelos cargados a la vez, 1 o 2 (default: 1)
     - FACEBOOK_COOKIES_BASE64 o FACEBOOK_COOKIES_JSON
     """
     
@@ -400,13 +405,50 @@ def main(context):
             "actions": {
                 "transcribe": {
                     "description": "Transcribe audio de un video",
-                    "params": {"url": "required", "filename": "optional", "cookies_base64": "optional"}
+                    "params": {"url": "required (o 'urls')", "filename": "optional", "cookies_base64": "optional",
+                               "audio_mode": "optional (native | pcm | mp3)",
+                               "cache": "optional (default: true, false fuerza re-transcribir)",
+                               "stream": "optional (true: JSONL incremental en el bucket)",
+                               "flush_interval": f"optional (segundos entre subidas parciales, default: 30, "
+                                                 f"mínimo: {MIN_FLUSH_INTERVAL:g})",
+                               "compress": "optional (true: JSON con gzip, nombre .gz; default: UPLOAD_GZIP)",
+                               "async": "optional (true: encola el job y responde 202 con job_id)",
+                               "urls": "optional (lista en vez de 'url': batch con manifest en el bucket)",
+                               "concurrency": "optional (URLs en paralelo del batch, default: BATCH_CONCURRENCY o 2)",
+                               "preset": f"optional ({' | '.join(PRESETS)})",
+                               "engine": "optional ({model_size, device, compute_type, cpu_threads, num_workers, "
+                                         "beam_size, best_of, greedy, vad_filter, language})"}
                 },
                 "scrape": {
                     "description": "Extrae comentarios de un post de Facebook",
-                    "params": {"url": "required", "max_clicks": "optional (default: 30)", "cookies_base64": "required"}
+                    "params": {"url": "required (o 'urls')", "cookies_base64": "required",
+                               "time_budget": "optional (segundos de expansión, default: SCRAPE_TIME_BUDGET o 180)",
+                               "max_clicks": "optional (tope de clicks; por defecto sin tope, se para al no haber progreso)",
+                               "mode": f"optional ({' | '.join(SCRAPE_MODES)}, default: graphql con fallback al DOM)",
+                               "compress": "optional (true: JSON con gzip, nombre .gz; default: UPLOAD_GZIP)",
+                               "incremental": "optional (true: solo los comentarios nuevos desde el último scrape "
+                                              "del post, con puntero al snapshot anterior)",
+                               "async": "optional (true: encola el job y responde 202 con job_id)",
+                               "urls": "optional (lista en vez de 'url': batch con manifest en el bucket)",
+                               "concurrency": "optional (posts en paralelo del batch, default: SCRAPE_BROWSERS)"}
+                },
+                "warmup": {
+                    "description": "Carga el modelo y hace una inferencia mínima (llamar después del deploy)",
+                    "params": {"preset": "optional", "engine": "optional"}
+                },
+                "status": {
+                    "description": "Estado de un job encolado con \"async\": true",
+                    "params": {"job_id": "required"}
+                },
+                "work": {
+                    "description": "Procesa jobs de la cola hasta vaciarla o agotar el presupuesto",
+                    "params": {"time_budget": "optional (segundos, default: JOB_WORK_BUDGET o 600)",
+                               "workers": "optional (hilos, default: 1, tope: JOB_WORKERS)"}
                 }
-            }
+            },
+            "engine": EngineConfig.from_env().as_dict(),
+            "models_loaded": model_load_stats(),
+            "button_stats": button_stats(SEE_MORE_LABELS)
         })
 
     if context.req.method != "POST":
@@ -420,87 +462,404 @@ def main(context):
 
     action = body.get("action", "transcribe")
     url = body.get("url")
+
+    # ============ WARMUP ============
+    if action == "warmup":
+        try:
+            engine_config = EngineConfig.resolve_job({"preset": body.get("preset"), **(body.get("engine") or {})})
+        except ValueError as e:
+            return context.res.json({"ok": False, "error": str(e)}, 400)
+        try:
+            resultado = warmup(engine_config)
+        except Exception as e:
+            context.error(f"❌ Error en warm-up: {str(e)}")
+            return context.res.json({"ok": False, "error": str(e)}, 500)
+        context.log(f"🔥 Modelo '{engine_config.model_size}' listo (carga: {resultado['model_load_s']}s, "
+                    f"inferencia: {resultado['inference_s']}s)")
+        return context.res.json({"ok": True, "message": "Modelo cargado", **resultado})
     
-    if not url:
-        return context.res.json({"ok": False, "error": "Se requiere el campo 'url'"}, 400)
+
+    # ============ STATUS ============
+    if action == "status":
+        job_id = body.get("job_id")
+        if not job_id:
+            return context.res.json({"ok": False, "error": "Se requiere el campo 'job_id'"}, 400)
+        try:
+            queue = get_job_queue()
+        except ValueError as e:
+            return context.res.json({"ok": False, "error": str(e)}, 500)
+        job = queue.get(job_id)
+        if job is None:
+            return context.res.json({"ok": False, "error": f"No existe el job: {job_id}"}, 404)
+        return context.res.json({"ok": True, "job": public_view(job)})
+
+    if not url and not body.get("urls") and action != "work":
+        return context.res.json({"ok": False, "error": "Se requiere el campo 'url' (o 'urls')"}, 400)
 
     # Validar env vars
     required_env = ["APPWRITE_ENDPOINT", "APPWRITE_PROJECT_ID", "APPWRITE_API_KEY", "APPWRITE_BUCKET_ID"]
+    if os.environ.get("APPWRITE_STORAGE_DIR"):
+        # Storage local (uploads.get_storage): no hace falta el servidor
+        required_env = ["APPWRITE_BUCKET_ID"]
     missing_env = [env for env in required_env if not os.environ.get(env)]
     if missing_env:
         return context.res.json({"ok": False, "error": f"Faltan variables de entorno: {', '.join(missing_env)}"}, 500)
 
+
+    # ============ WORK ============
+    if action == "work":
+        try:
+            time_budget = float(body.get("time_budget") or os.environ.get("JOB_WORK_BUDGET", "600"))
+            workers = int(body.get("workers", 1))
+        except (TypeError, ValueError):
+            return context.res.json({"ok": False, "error": "'time_budget' y 'workers' deben ser números"}, 400)
+        # Cada hilo hace una descarga y una transcripción completas: tope JOB_WORKERS
+        workers = max(1, min(workers, int(os.environ.get("JOB_WORKERS", "1"))))
+        try:
+            queue = get_job_queue()
+        except ValueError as e:
+            return context.res.json({"ok": False, "error": str(e)}, 500)
+        scheduler = JobScheduler(queue, run_queued_job, workers=workers, log=context.log)
+        stats = scheduler.drain(time_budget if time_budget > 0 else None)
+        context.log(f"🧵 Jobs: {stats['done']} completados, {stats['failed']} fallidos, {stats['retried']} a reintentar")
+        return context.res.json({"ok": True, "message": "Cola procesada", **stats, "queue": scheduler.queue.counts()})
+
+    # ============ ASYNC ============
+    if body.get("async"):
+        if action not in JOB_ACTIONS:
+            return context.res.json({"ok": False, "error": f"'async' no aplica a la acción '{action}'"}, 400)
+        if any(body.get(campo) for campo in JOB_SECRET_FIELDS) and not get_cookies({}):
+            # Las cookies del body no se persisten: el worker solo puede usar las del entorno
+            return context.res.json({
+                "ok": False,
+                "error": "Con 'async' las cookies no se guardan en la cola: configura FACEBOOK_COOKIES_BASE64 "
+                         "o FACEBOOK_COOKIES_JSON en la función y no las mandes en el body"
+            }, 400)
+        try:
+            queue = get_job_queue()
+        except ValueError as e:
+            return context.res.json({"ok": False, "error": str(e)}, 500)
+        if os.environ.get("APPWRITE_FUNCTION_ID") and not isinstance(queue, AppwriteJobQueue):
+            # SQLite en el tmp del contenedor se pierde con la instancia
+            return context.res.json({
+                "ok": False,
+                "error": "'async' requiere la cola durable: configura JOB_QUEUE_DATABASE_ID, "
+                         "JOB_QUEUE_COLLECTION_ID y JOB_QUEUE_CLAIMS_COLLECTION_ID"
+            }, 500)
+        payload = {k: v for k, v in body.items() if k != "async" and k not in JOB_SECRET_FIELDS}
+        job = queue.enqueue(action, payload)
+        worker = start_worker(context.log)
+        context.log(f"📥 Job {job['id']} en cola ({action}); worker: {worker}")
+        return context.res.json({"ok": True, "message": "Job en cola", "job_id": job["id"], "status": job["status"],
+                                 "worker": worker}, 202)
+
+    resultado, status_code = handle_job(action, body, log=context.log, error=context.error)
+    return context.res.json(resultado, status_code)
+
+
+def scrape_limits(body: Dict[str, Any]) -> Tuple[Optional[int], Optional[float]]:
+    """max_clicks (entero > 0) y time_budget (segundos > 0) del body; None si no vienen"""
+    max_clicks = body.get("max_clicks")
+    time_budget = body.get("time_budget")
+    if max_clicks is not None:
+        try:
+            valido = not isinstance(max_clicks, bool) and float(max_clicks) == int(max_clicks) >= 1
+        except (TypeError, ValueError):
+            valido = False
+        if not valido:
+            raise ValueError("'max_clicks' debe ser un entero mayor que 0")
+        max_clicks = int(max_clicks)
+    if time_budget is not None:
+        try:
+            time_budget = float(time_budget)
+        except (TypeError, ValueError):
+            time_budget = math.nan
+        if not math.isfinite(time_budget) or time_budget <= 0:
+            raise ValueError("'time_budget' debe ser un número de segundos mayor que 0")
+    return max_clicks, time_budget
+
+
+def batch_concurrency(action: str, body: Dict[str, Any]) -> int:
+    """
+    URLs en paralelo de un batch: body.concurrency, BATCH_CONCURRENCY o, por defecto,
+    los navegadores del pool (scrape) o 2 (transcribe: la descarga de una URL se solapa
+    con la transcripción de otra sobre el mismo modelo).
+    """
+    default = os.environ.get("SCRAPE_BROWSERS", "1") if action == "scrape" else "2"
+    valor = body.get("concurrency") or os.environ.get("BATCH_CONCURRENCY") or default
+    return max(1, min(int(valor), int(os.environ.get("BATCH_MAX_CONCURRENCY", "8"))))
+
+
+def handle_batch(action: str, body: Dict[str, Any], log: Callable[[str], Any] = print,
+                 error: Callable[[str], Any] = print,
+                 progress: Optional[Callable[..., None]] = None) -> Tuple[Dict[str, Any], int]:
+    """
+    Procesa `body.urls` con los recursos del proceso compartidos (un cliente de Appwrite,
+    el modelo de get_model y el pool de navegadores) y concurrencia acotada.
+    Devuelve el resultado de cada URL y sube un manifest con todos al bucket.
+    """
+    progress = progress or (lambda etapa, **datos: None)
+    urls = body.get("urls")
+    if not isinstance(urls, list) or not urls or not all(isinstance(u, str) and u for u in urls):
+        return {"ok": False, "error": "'urls' debe ser una lista de URLs no vacía"}, 400
+    max_urls = int(os.environ.get("BATCH_MAX_URLS", "100"))
+    if len(urls) > max_urls:
+        return {"ok": False, "error": f"Máximo {max_urls} URLs por batch (BATCH_MAX_URLS)"}, 400
+
+    try:
+        concurrency = batch_concurrency(action, body)
+    except (TypeError, ValueError):
+        return {"ok": False, "error": "'concurrency' debe ser un entero"}, 400
+
+    client = get_appwrite_client()
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    prefijo = "comments" if action == "scrape" else "transcripcion"
+    extension = "jsonl" if action != "scrape" and body.get("stream") else "json"
+    base = {k: v for k, v in body.items() if k not in ("urls", "url", "filename", "concurrency")}
+    hechos = {"n": 0}
+    lock = threading.Lock()
+
+    def procesar(i: int, url: str) -> Dict[str, Any]:
+        item = {**base, "url": url, "filename": f"{prefijo}_{stamp}_{i:03d}.{extension}"}
+        t0 = time.perf_counter()
+        resultado, status_code = handle_job(action, item, log=log, error=error, client=client)
+        with lock:
+            hechos["n"] += 1
+            progress("batch", done=hechos["n"], total=len(urls), last_url=url)
+        resumen = {k: v for k, v in resultado.items() if k not in ("preview", "texto_preview")}
+        return {"url": url, "status": status_code, "elapsed_s": round(time.perf_counter() - t0, 2), **resumen}
+
+    log(f"📦 Batch de {len(urls)} URLs ({action}, concurrencia {concurrency})")
+    progress("batch", done=0, total=len(urls))
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        resultados = list(pool.map(procesar, range(len(urls)), urls))
+    completados = sum(1 for r in resultados if r.get("ok"))
+
+    manifest = {
+        "action": action,
+        "fecha": datetime.now().isoformat(),
+        "total": len(urls),
+        "completados": completados,
+        "fallidos": len(urls) - completados,
+        "elapsed_s": round(time.perf_counter() - t0, 2),
+        "resultados": resultados
+    }
+    progress("uploading", total=len(urls))
+    try:
+        result = upload_to_bucket(client, manifest, body.get("filename", f"manifest_{stamp}.json"), body.get("compress"))
+    except Exception as e:
+        error(f"❌ Error subiendo el manifest: {str(e)}")
+        return {"ok": False, "error": str(e), "resultados": resultados}, 500
+    log(f"✅ Batch: {completados}/{len(urls)} URLs en {manifest['elapsed_s']}s; manifest con ID: {result['$id']}")
+
+    # 207 si falló una parte (el detalle está en `resultados`), 502 si fallaron todas
+    if completados == len(urls):
+        estado, status_code, mensaje = "completed", 200, "Batch completado"
+    elif completados:
+        estado, status_code, mensaje = "partial", 207, f"Batch con {manifest['fallidos']} URLs fallidas"
+    else:
+        estado, status_code, mensaje = "failed", 502, "Fallaron todas las URLs del batch"
+    return {
+        "ok": completados == len(urls),
+        "status": estado,
+        "message": mensaje,
+        "manifest_file_id": result["$id"],
+        "manifest_filename": result.get("name"),
+        "total": len(urls),
+        "completados": completados,
+        "fallidos": manifest["fallidos"],
+        "elapsed_s": manifest["elapsed_s"],
+        "resultados": resultados
+    }, status_code
+
+
+def handle_job(action: str, body: Dict[str, Any], log: Callable[[str], Any] = print,
+               error: Callable[[str], Any] = print,
+               progress: Optional[Callable[..., None]] = None,
+               client: Optional["Client"] = None) -> Tuple[Dict[str, Any], int]:
+    """
+    Ejecuta una transcripción o un scrape y devuelve (respuesta, status_code).
+    Lo usan main() en modo síncrono y los workers de la cola (run_queued_job).
+    Con `urls` en el body delega en handle_batch.
+    `progress(etapa, **datos)` informa el avance del job.
+    """
+    if body.get("urls") is not None:
+        return handle_batch(action, body, log=log, error=error, progress=progress)
+    progress = progress or (lambda etapa, **datos: None)
+    url = body.get("url")
+
     try:
         cookies = get_cookies(body)
-        client = get_appwrite_client()
+        client = client or get_appwrite_client()
         stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
 
         # ============ SCRAPE FACEBOOK ============
         if action == "scrape":
             if not cookies:
-                return context.res.json({
+                return {
                     "ok": False,
                     "error": "Se requieren cookies de Facebook para el scraping"
-                }, 400)
+                }, 400
+
+            # Sesión vencida: fallar antes de lanzar el navegador
+            try:
+                check_expiry(cookies)
+            except CookieError as e:
+                return {"ok": False, "error": str(e)}, 401
 
-            context.log(f"🔍 Scrapeando comentarios de: {url}")
-            max_clicks = body.get("max_clicks", 30)
+            try:
+                scrape_mode = resolve_scrape_mode(body.get("mode"))
+            except ValueError as e:
+                return {"ok": False, "error": str(e)}, 400
+
+            log(f"🔍 Scrapeando comentarios de: {url} (modo {scrape_mode})")
+            try:
+                max_clicks, time_budget = scrape_limits(body)
+            except ValueError as e:
+                return {"ok": False, "error": str(e)}, 400
+
+            incremental = bool(body.get("incremental"))
+            state_store = state_store_from_env(client) if incremental else None
+            state = state_store.get(url) if state_store else None
+            known = known_keys(state)
+            if state:
+                log(f"📌 Scrape incremental: {state['comment_count']} comentarios conocidos "
+                            f"(último snapshot: {(state.get('snapshot') or {}).get('filename')})")
             
-            comments = scrape_facebook_comments(url, cookies, max_clicks)
+            progress("scraping", url=url, mode=scrape_mode)
+            comments = scrape_facebook_comments(url, cookies, max_clicks, scrape_mode, time_budget,
+                                                known=known or None)
             
             if not comments:
-                return context.res.json({
+                # Con estado previo el post tenía comentarios: no ver ninguno (login, selectores)
+                # es un scrape fallido, y el estado no se adelanta
+                if state:
+                    log(f"⚠️  No se vio ningún comentario ({state['comment_count']} conocidos); "
+                        f"el estado no se actualiza")
+                return {
                     "ok": False,
                     "error": "No se encontraron comentarios"
-                }, 404)
+                }, 404
+
+            snapshot_anterior = state.get("snapshot") if state else None
+            if incremental:
+                comments = new_comments(comments, known)
+                if not comments:
+                    # Se vieron comentarios y todos eran conocidos: el scrape llegó hasta el estado anterior
+                    state_store.put(url, update_state(state, url, [], None))
+                    log("✅ Sin comentarios nuevos desde el último scrape")
+                    return {
+                        "ok": True,
+                        "message": "Sin comentarios nuevos",
+                        "total_comentarios": 0,
+                        "total_acumulado": state["comment_count"],
+                        "snapshot_anterior": snapshot_anterior
+                    }, 200
 
             filename = body.get("filename", f"comments_{stamp}.json")
             data = {
                 "url_origen": url,
                 "fecha_scraping": datetime.now().isoformat(),
-                "total_comentarios": len(comments),
-                "comentarios": comments
+                "total_comentarios": len(comments)
             }
+            if incremental:
+                # Solo el delta; el resto está en la cadena de snapshots anteriores
+                data.update({
+                    "incremental": True,
+                    "snapshot_anterior": snapshot_anterior,
+                    "total_acumulado": (state["comment_count"] if state else 0) + len(comments)
+                })
+            data["comentarios"] = comments
+
+            progress("uploading", total_comentarios=len(comments))
+            result = upload_to_bucket(client, data, filename, body.get("compress"))
+            filename = result.get("name", filename)
             
-            result = upload_to_bucket(client, data, filename)
-            
-            context.log(f"✅ {len(comments)} comentarios guardados con ID: {result['$id']}")
-            
-            return context.res.json({
+            log(f"✅ {len(comments)} comentarios guardados con ID: {result['$id']}")
+
+            respuesta = {
                 "ok": True,
                 "message": "Scraping completado",
                 "file_id": result["$id"],
                 "filename": filename,
                 "total_comentarios": len(comments),
                 "preview": comments[:5]
-            })
+            }
+            if incremental:
+                nuevo_estado = update_state(state, url, comments, {
+                    "file_id": result["$id"], "filename": filename, "fecha": data["fecha_scraping"]
+                })
+                state_store.put(url, nuevo_estado)
+                respuesta.update({"total_acumulado": nuevo_estado["comment_count"],
+                                  "snapshot_anterior": snapshot_anterior})
+            
+            return respuesta, 200
 
         # ============ TRANSCRIBE ============
         else:
-            archivo_audio = None
-            cookies_path = None
-            
             try:
+                modo_audio = resolver_modo(body.get("audio_mode"))
+                engine_config = EngineConfig.resolve_job({"preset": body.get("preset"), **(body.get("engine") or {})})
+            except ValueError as e:
+                return {"ok": False, "error": str(e)}, 400
+
+            cache = cache_from_env(engine_config, client=client) if body.get("cache", True) else None
+            modelos_antes = model_load_stats()
+
+            with JobWorkspace("transcribe") as ws:
+                cookies_path = None
                 if cookies:
-                    cookies_path = save_cookies_to_file(cookies)
-                    context.log("🍪 Cookies cargadas")
-                
-                context.log(f"⬇️ Descargando audio de: {url}")
-                archivo_audio = descargar_audio(url, cookies_path)
+                    try:
+                        check_expiry(cookies)
+                    except CookieError as e:
+                        # Los videos públicos se descargan igual sin sesión
+                        log(f"⚠️  {e}")
+                    cookies_path = netscape_cookie_file(cookies, ws)
+                    log("🍪 Cookies cargadas")
                 
-                if not archivo_audio:
-                    return context.res.json({
-                        "ok": False,
-                        "error": "No se pudo descargar el audio"
-                    }, 400)
-
-                context.log("🎙️ Transcribiendo audio...")
-                resultado = transcribir(archivo_audio)
+                progress("transcribing", url=url, stream=bool(body.get("stream")))
+                if body.get("stream"):
+                    try:
+                        flush_interval = float(body.get("flush_interval", 30))
+                    except (TypeError, ValueError):
+                        return {"ok": False, "error": "'flush_interval' debe ser un número de segundos"}, 400
+                    if not math.isfinite(flush_interval) or flush_interval <= 0:
+                        return {"ok": False, "error": "'flush_interval' debe ser un número de segundos"}, 400
+                    filename = body.get("filename", f"transcripcion_{stamp}.jsonl")
+                    sink = BucketJsonlSink(client, os.environ.get("APPWRITE_BUCKET_ID"), filename, ws.path(filename),
+                                           flush_interval=flush_interval,
+                                           on_upload=lambda file_id: progress("transcribing", url=url, stream=True,
+                                                                              file_id=file_id))
+                    with sink:
+                        resultado = transcribir_a_jsonl(url, ws, cookies_path, modo_audio, cache, sink,
+                                                        config=engine_config, log=log)
+
+                    if "error" in resultado:
+                        return {"ok": False, "error": resultado["error"]}, resultado["status"]
+
+                    log(f"✅ {resultado['total_segmentos']} segmentos guardados con ID: {sink.file_id} "
+                                f"(primer segmento a los {resultado['first_segment_latency_s'] or 0:.1f}s)")
+                    return {
+                        "ok": True,
+                        "message": "Transcripción completada",
+                        "file_id": sink.file_id,
+                        "filename": filename,
+                        "idioma": resultado["idioma"],
+                        "cache": resultado["cache"],
+                        "total_segmentos": resultado["total_segmentos"],
+                        "first_segment_latency_s": resultado["first_segment_latency_s"],
+                        "model_load_s": carga_de_modelos(modelos_antes),
+                        "texto_preview": resultado["texto_preview"]
+                    }, 200
+
+                resultado = obtener_transcripcion(url, ws, cookies_path, modo_audio, cache,
+                                                  config=engine_config, log=log)
                 
                 if "error" in resultado:
-                    return context.res.json({"ok": False, "error": resultado["error"]}, 500)
+                    return {"ok": False, "error": resultado["error"]}, resultado["status"]
 
-                context.log(f"🌍 Idioma detectado: {resultado['idioma'].upper()}")
+                log(f"🌍 Idioma detectado: {resultado['idioma'].upper()}")
 
                 filename = body.get("filename", f"transcripcion_{stamp}.json")
                 data = {
@@ -512,26 +871,26 @@ def main(context):
                     "segmentos": resultado["segmentos"]
                 }
                 
-                result = upload_to_bucket(client, data, filename)
-                context.log(f"✅ Transcripción guardada con ID: {result['$id']}")
+                progress("uploading", total_segmentos=len(resultado["segmentos"]))
+                result = upload_to_bucket(client, data, filename, body.get("compress"))
+                filename = result.get("name", filename)
+                log(f"✅ Transcripción guardada con ID: {result['$id']}")
 
                 texto_preview = resultado["texto"][:500] + "..." if len(resultado["texto"]) > 500 else resultado["texto"]
                 
-                return context.res.json({
+                return {
                     "ok": True,
                     "message": "Transcripción completada",
                     "file_id": result["$id"],
                     "filename": filename,
                     "idioma": resultado["idioma"],
+                    "cache": resultado["cache"],
+                    "model_load_s": carga_de_modelos(modelos_antes),
                     "texto_preview": texto_preview
-                })
-                
-            finally:
-                limpiar(archivo_audio)
-                limpiar(cookies_path)
+                }, 200
 
     except Exception as e:
-        context.error(f"❌ Error: {str(e)}")
-        return context.res.json({"ok": False, "error": str(e)}, 500)
+        error(f"❌ Error: {str(e)}")
+        return {"ok": False, "error": str(e)}, 500
 
 
@@ -0,0 +1,115 @@
+"""
+Manifest de una corrida de runner.py para poder retomarla.
+
+Un JSONL de solo-append: cada cambio de estado de una URL agrega una línea con el
+registro completo, y al cargar gana la última línea de cada URL. Una corrida
+interrumpida (crash, kill) pierde a lo sumo la URL en curso.
+
+Estados: pending → downloaded → transcribed | failed
+
+Cada registro lleva url, state, media_id (extractor-id de yt-dlp), output, tiempos
+(descarga_s, transcripcion_s, duracion_audio), error y updated_at.
+
+Los nombres de salida salen del media_id (`transcripcion_<extractor>-<id>.txt`), o de
+un hash de la URL si no hay metadatos: repetir una corrida sobrescribe los mismos
+archivos en vez de sumar copias con otro timestamp.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+PENDING = "pending"
+DOWNLOADED = "downloaded"
+TRANSCRIBED = "transcribed"
+FAILED = "failed"
+RUN_STATES = (PENDING, DOWNLOADED, TRANSCRIBED, FAILED)
+
+
+def media_id(info: Optional[Dict[str, Any]]) -> Optional[str]:
+    """extractor-id del info de yt-dlp, apto para nombre de archivo"""
+    if not info or not info.get("id"):
+        return None
+    extractor = info.get("extractor_key") or info.get("extractor") or "generic"
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{extractor}-{info['id']}").lower()
+
+
+def output_name(url: str, info: Optional[Dict[str, Any]] = None, extension: str = "txt") -> str:
+    """Nombre determinístico de la salida de una URL"""
+    ident = media_id(info) or f"url-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}"
+    return f"transcripcion_{ident}.{extension}"
+
+
+class RunManifest:
+    """Estado por URL de una corrida, persistido en un JSONL"""
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if resume:
+            self._load()
+        else:
+            open(path, "w", encoding="utf-8").close()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        linea = ""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    # Última línea a medio escribir si el proceso murió escribiéndola
+                    continue
+                self.records[registro["url"]] = registro
+        if linea and not linea.endswith("\n"):
+            # Que el próximo registro no quede pegado a la línea cortada
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    def record(self, url: str, state: str, **campos) -> Dict[str, Any]:
+        """Actualiza el registro de `url` y lo agrega al JSONL (flush + fsync)"""
+        with self._lock:
+            registro = {**self.records.get(url, {"url": url}), **campos, "state": state, "updated_at": time.time()}
+            self.records[url] = registro
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            return registro
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return self.records.get(url)
+
+    def is_done(self, url: str, outdir: str) -> bool:
+        """Transcrita y con la salida todavía en disco"""
+        registro = self.records.get(url)
+        return bool(registro and registro["state"] == TRANSCRIBED and registro.get("output")
+                    and os.path.exists(os.path.join(outdir, registro["output"])))
+
+    def done_media(self, mid: Optional[str], outdir: str) -> Optional[Dict[str, Any]]:
+        """Un registro ya transcrito del mismo video (otra URL del mismo media_id)"""
+        if not mid:
+            return None
+        with self._lock:
+            candidatos = [r for r in self.records.values() if r.get("media_id") == mid and r["state"] == TRANSCRIBED]
+        for registro in candidatos:
+            if self.is_done(registro["url"], outdir):
+                return registro
+        return None
+
+    def remaining(self, urls: Iterable[str], outdir: str) -> List[str]:
+        """URLs sin terminar (para --resume); las fallidas se reintentan"""
+        return [url for url in urls if not self.is_done(url, outdir)]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            estados = [r["state"] for r in self.records.values()]
+        return {state: estados.count(state) for state in RUN_STATES}
@@ -1,44 +1,417 @@
 import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
-from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from transcriptor import descargar_audio, transcribir, limpiar
+from transcriptor import descargar_audio, transcribir_detalle, limpiar, get_model
+from audio import AUDIO_MODES, extraer_info, resolver_modo
+from cache import TranscriptionCache, cache_from_env, hash_archivo
+from engine import EngineConfig, add_cli_args, from_cli_args, warmup
+from jobs import JobScheduler, queue_from_env
+from run_manifest import DOWNLOADED, FAILED, PENDING, TRANSCRIBED, RunManifest, media_id, output_name
+from spool import DownloadSpool, estimate_pcm, estimate_size
+from workspace import JobWorkspace
 
 
-def process_url(url: str, outdir: Path):
+def _buscar_en_cache(url: str, cache: Optional[TranscriptionCache]):
+    """
+    Lee los metadatos (dan el nombre de salida y se reusan en la descarga) y consulta la
+    caché por extractor+ID antes de descargar. Devuelve (info, media_key, detalle)
+    """
     try:
-        archivo = descargar_audio(url)
-        if not archivo:
-            print(f"❌ Falló descarga para: {url}")
-            return
-        texto = transcribir(archivo)
-        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        outpath = outdir / f"transcripcion_{stamp}.txt"
+        info = extraer_info(url)
+    except Exception as e:
+        print(f"⚠️  No se pudieron leer los metadatos de {url}: {e}")
+        return None, None, None
+    if not cache:
+        return info, None, None
+    media_key = cache.media_key(info)
+    return info, media_key, cache.get(media_key)
+
+
+def _guardar_en_cache(cache: Optional[TranscriptionCache], keys: List[Optional[str]], detalle: Dict[str, Any]):
+    if cache and "error" not in detalle:
+        cache.put(keys, {k: v for k, v in detalle.items() if k != "transcripcion_s"})
+
+
+def _ya_transcrita(url: str, mid: Optional[str], outdir: Path, manifest: Optional[RunManifest],
+                   resultado: Dict[str, Any]) -> bool:
+    """Otra URL del mismo video ya se transcribió en esta corrida (o en la que se retoma)"""
+    previo = manifest.done_media(mid, str(outdir)) if manifest else None
+    if previo is None or previo["url"] == url:
+        return False
+    manifest.record(url, TRANSCRIBED, media_id=mid, output=previo["output"],
+                    duracion_audio=previo.get("duracion_audio", 0.0), mismo_que=previo["url"])
+    resultado.update({"ok": True, "duracion_audio": previo.get("duracion_audio", 0.0)})
+    print(f"⏭️  Mismo video que {previo['url']}: {outdir / previo['output']}")
+    return True
+
+
+def _registrar(manifest: Optional[RunManifest], resultado: Dict[str, Any], state: str, **campos):
+    if manifest:
+        manifest.record(resultado["url"], state, descarga_s=round(resultado["descarga_s"], 2),
+                        transcripcion_s=round(resultado["transcripcion_s"], 2),
+                        duracion_audio=resultado["duracion_audio"], **campos)
+
+
+def process_url(url: str, outdir: Path, ram: Optional[bool] = None, modo: Optional[str] = None,
+                cache: Optional[TranscriptionCache] = None, config: Optional[EngineConfig] = None,
+                manifest: Optional[RunManifest] = None) -> Dict[str, Any]:
+    resultado = {"url": url, "ok": False, "descarga_s": 0.0, "transcripcion_s": 0.0, "duracion_audio": 0.0}
+    with JobWorkspace("runner", ram=ram) as ws:
+        info, media_key, detalle = _buscar_en_cache(url, cache)
+        mid = media_id(info)
+        if _ya_transcrita(url, mid, outdir, manifest, resultado):
+            return resultado
+        nombre = output_name(url, info)
+        _registrar(manifest, resultado, PENDING, media_id=mid, output=nombre, error=None)
+        if detalle is not None:
+            print("⚡ Encontrada en caché")
+        else:
+            t0 = time.perf_counter()
+            archivo = descargar_audio(url, ws.path("audio"), modo, info=info)
+            resultado["descarga_s"] = time.perf_counter() - t0
+            if not archivo:
+                print(f"❌ Falló descarga para: {url}")
+                _registrar(manifest, resultado, FAILED, error="Falló la descarga")
+                return resultado
+            _registrar(manifest, resultado, DOWNLOADED)
+            audio_key = cache.audio_key(hash_archivo(archivo)) if cache else None
+            detalle = cache.get(audio_key) if cache else None
+            if detalle is not None:
+                print("⚡ Audio ya transcrito (caché por hash)")
+                _guardar_en_cache(cache, [media_key], detalle)
+            else:
+                t0 = time.perf_counter()
+                detalle = transcribir_detalle(archivo, modo=modo, config=config)
+                resultado["transcripcion_s"] = time.perf_counter() - t0
+                _guardar_en_cache(cache, [media_key, audio_key], detalle)
+        resultado["duracion_audio"] = detalle.get("duracion", 0.0)
+        if "error" in detalle:
+            # El nombre es determinístico: no pisar la transcripción de una corrida anterior
+            print(f"❌ {detalle['error']} ({url})")
+            _registrar(manifest, resultado, FAILED, error=detalle["error"])
+            return resultado
+        outpath = outdir / nombre
         with open(outpath, "w", encoding="utf-8") as f:
-            f.write(texto)
+            f.write(detalle["texto"])
+        resultado["ok"] = True
+        _registrar(manifest, resultado, TRANSCRIBED, error=None)
         print(f"✅ Guardado: {outpath}")
-    finally:
-        limpiar()
+        return resultado
+
+
+# ==================== MODO PARALELO ====================
+
+def _init_worker(config: EngineConfig):
+    """Inicializa cada proceso de transcripción con su propia copia del modelo, ya en caliente"""
+    get_model(config)
+    warmup(config)
+
+
+def _transcribir_job(archivo: str, modo: Optional[str] = None, config: Optional[EngineConfig] = None) -> Dict[str, Any]:
+    """Se ejecuta dentro del pool de procesos"""
+    t0 = time.perf_counter()
+    detalle = transcribir_detalle(archivo, verbose=False, modo=modo, config=config)
+    detalle["transcripcion_s"] = time.perf_counter() - t0
+    return detalle
+
+
+def _descargar_job(url: str, destino: str, spool: DownloadSpool, modo: Optional[str] = None,
+                   cache: Optional[TranscriptionCache] = None, manifest: Optional[RunManifest] = None,
+                   outdir: Optional[Path] = None, pcm: bool = False) -> Dict[str, Any]:
+    """
+    Etapa de prefetch, en el pool de I/O. La descarga ocupa lugar en el spool hasta que
+    la transcripción termina, así no se acumulan más audios (o bytes) en disco de los
+    que los workers pueden consumir. Con `pcm` la reserva incluye el `.pcm` que la
+    transcripción va a escribir junto al audio.
+    Los aciertos de caché no ocupan lugar ni pasan por el pool de procesos, y un video
+    que el manifest ya tiene transcrito bajo otra URL no se descarga.
+    """
+    info, media_key, detalle = _buscar_en_cache(url, cache)
+    previo = manifest.done_media(media_id(info), str(outdir)) if manifest else None
+    if previo and previo["url"] != url:
+        return {"archivo": None, "descarga_s": 0.0, "cache": None, "info": info, "repetido": True}
+    if detalle is not None:
+        return {"archivo": None, "descarga_s": 0.0, "cache": detalle, "info": info}
+
+    ticket = spool.acquire(estimate_size(info) + (estimate_pcm(info) if pcm else 0))
+    t0 = time.perf_counter()
+    archivo = None
+    audio_key = None
+    try:
+        archivo = descargar_audio(url, destino, modo, info=info)
+        audio_key = cache.audio_key(hash_archivo(archivo)) if cache and archivo else None
+        detalle = cache.get(audio_key) if cache else None
+        if detalle is not None:
+            _guardar_en_cache(cache, [media_key], detalle)
+            limpiar(archivo)
+            archivo = None
+    except Exception:
+        # Nadie va a transcribir este audio: liberar su lugar antes de propagar el error
+        limpiar(archivo)
+        spool.release(ticket)
+        raise
+    if archivo:
+        spool.settle(ticket, archivo, estimate_pcm(info, archivo) if pcm else 0)
+    else:
+        spool.release(ticket)
+    return {"archivo": archivo, "descarga_s": time.perf_counter() - t0, "cache": detalle, "info": info,
+            "keys": [media_key, audio_key], "ticket": ticket}
+
+
+def _guardar_salida(outpath: Path, resultado: Dict[str, Any], detalle: Dict[str, Any],
+                    manifest: Optional[RunManifest] = None):
+    with open(outpath, "w", encoding="utf-8") as f:
+        f.write(detalle["texto"])
+    resultado["ok"] = True
+    _registrar(manifest, resultado, TRANSCRIBED, error=None)
+    print(f"✅ Guardado: {outpath} "
+          f"(descarga {resultado['descarga_s']:.1f}s, transcripción {resultado['transcripcion_s']:.1f}s, "
+          f"audio {resultado['duracion_audio']:.0f}s) ← {resultado['url']}")
+
+
+def process_parallel(urls: List[str], outdir: Path, workers: int, download_workers: Optional[int] = None,
+                     ram: Optional[bool] = None, modo: Optional[str] = None,
+                     cache: Optional[TranscriptionCache] = None,
+                     config: Optional[EngineConfig] = None,
+                     manifest: Optional[RunManifest] = None, spool_dir: Optional[str] = None,
+                     spool_bytes: Optional[int] = None, spool_items: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Descarga por adelantado en un pool de hilos a un spool (spool.py) mientras un pool
+    acotado de procesos ejecuta faster-whisper sobre lo ya descargado. El spool tiene
+    tope de audios (default: 2 × workers) y opcionalmente de bytes.
+    Devuelve los tiempos de cada URL.
+    """
+    download_workers = download_workers or workers * 2
+    config = config or EngineConfig.from_env()
+    # El PCM decodificado (modo pcm o chunks) se escribe en el spool junto al audio
+    pcm = resolver_modo(modo) == "pcm" or bool(config.chunk_workers)
+    if not config.cpu_threads:
+        # Repartir los núcleos entre los modelos para no sobre-suscribir la CPU
+        config = config.with_values({"cpu_threads": max(1, (os.cpu_count() or 1) // workers)})
+    resultados: List[Dict[str, Any]] = [
+        {"url": url, "ok": False, "descarga_s": 0.0, "transcripcion_s": 0.0, "duracion_audio": 0.0}
+        for url in urls
+    ]
+
+    with JobWorkspace("runner", ram=ram) as ws, \
+            ThreadPoolExecutor(max_workers=download_workers) as io_pool, \
+            ProcessPoolExecutor(max_workers=workers,
+                                mp_context=multiprocessing.get_context("spawn"),
+                                initializer=_init_worker,
+                                initargs=(config,)) as cpu_pool:
+        spool = DownloadSpool(spool_dir or ws.path("spool"), max_bytes=spool_bytes,
+                              max_items=spool_items or workers * 2)
+        pendientes = {}
+        for i, url in enumerate(urls):
+            destino = spool.path(f"audio_{i:05d}")
+            pendientes[io_pool.submit(_descargar_job, url, destino, spool, modo, cache, manifest, outdir, pcm)] = ("descarga", i)
+
+        while pendientes:
+            hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for fut in hechos:
+                etapa, i = pendientes.pop(fut)
+                resultado = resultados[i]
+                url = resultado["url"]
+
+                if etapa == "descarga":
+                    try:
+                        descarga = fut.result()
+                    except Exception as e:
+                        # Un error de caché, hash o manifest falla solo esta URL, no la corrida
+                        print(f"❌ Error descargando {url}: {e}")
+                        _registrar(manifest, resultado, FAILED, error=str(e))
+                        continue
+                    resultado["descarga_s"] = descarga["descarga_s"]
+                    mid = media_id(descarga["info"])
+                    if descarga.get("repetido") and _ya_transcrita(url, mid, outdir, manifest, resultado):
+                        continue
+                    resultado["salida"] = outdir / output_name(url, descarga["info"])
+                    _registrar(manifest, resultado, PENDING, media_id=mid, output=resultado["salida"].name)
+                    if descarga["cache"] is not None:
+                        resultado["duracion_audio"] = descarga["cache"].get("duracion", 0.0)
+                        _guardar_salida(resultado.pop("salida"), resultado, descarga["cache"], manifest)
+                        continue
+                    if not descarga["archivo"]:
+                        print(f"❌ Falló descarga para: {url}")
+                        _registrar(manifest, resultado, FAILED, error="Falló la descarga")
+                        resultado.pop("salida")
+                        continue
+                    _registrar(manifest, resultado, DOWNLOADED)
+                    resultado["ticket"] = descarga["ticket"]
+                    resultado["archivo"] = descarga["archivo"]
+                    resultado["keys"] = descarga["keys"]
+                    pendientes[cpu_pool.submit(_transcribir_job, descarga["archivo"], modo, config)] = ("transcripcion", i)
+                    continue
+
+                try:
+                    detalle = fut.result()
+                    resultado["transcripcion_s"] = detalle["transcripcion_s"]
+                    resultado["duracion_audio"] = detalle["duracion"]
+                    if "error" in detalle:
+                        print(f"❌ {detalle['error']} ({url})")
+                        _registrar(manifest, resultado, FAILED, error=detalle["error"])
+                        continue
+                    _guardar_en_cache(cache, resultado["keys"], detalle)
+                    _guardar_salida(resultado["salida"], resultado, detalle, manifest)
+                except Exception as e:
+                    print(f"❌ Error transcribiendo {url}: {e}")
+                    _registrar(manifest, resultado, FAILED, error=str(e))
+                finally:
+                    limpiar(resultado.pop("archivo", None))
+                    resultado.pop("keys", None)
+                    resultado.pop("salida", None)
+                    spool.release(resultado.pop("ticket"))
+
+        print(f"\n📦 {spool.summary()}")
+    return resultados
+
+
+# ==================== MODO COLA ====================
+
+def process_queue(urls: List[str], queue_path: str, outdir: Path, workers: int, ram: Optional[bool] = None,
+                  modo: Optional[str] = None, cache: Optional[TranscriptionCache] = None,
+                  config: Optional[EngineConfig] = None,
+                  manifest: Optional[RunManifest] = None) -> List[Dict[str, Any]]:
+    """
+    Encola las URLs en una cola SQLite (jobs.py) y la procesa con JobScheduler, el mismo
+    scheduler que la acción "work" de la función. También se procesan los jobs que
+    quedaron pendientes en esa cola (corridas interrumpidas u otros procesos encolando).
+
+    Cada URL se encola con su propia clave: repetir la corrida no duplica los jobs que
+    siguen en la cola. Los que quedaron "running" de una corrida caída vuelven a la cola
+    pasados JOB_STALE_S sin heartbeat. Otra URL del mismo video (mismo media_id) se
+    resuelve en el handler con el manifest, sin transcribirla de nuevo.
+    """
+    queue = queue_from_env(path=queue_path)
+    ya_encoladas = [url for url in urls if queue.enqueue("transcribe", {"url": url}, key=url) is None]
+    if ya_encoladas:
+        print(f"⏭️  {len(ya_encoladas)} URLs ya tenían un job pendiente o en curso en la cola; no se duplican")
+    print(f"📥 Cola {queue_path}: {queue.counts()}")
+
+    config = config or EngineConfig.from_env()
+    if workers > 1 and not config.cpu_threads:
+        config = config.with_values({"cpu_threads": max(1, (os.cpu_count() or 1) // workers)})
+    resultados: List[Dict[str, Any]] = [
+        {"url": url, "ok": False, "skipped": True, "descarga_s": 0.0, "transcripcion_s": 0.0, "duracion_audio": 0.0}
+        for url in ya_encoladas
+    ]
+
+    def handler(job: Dict[str, Any], progress) -> Tuple[Dict[str, Any], int]:
+        url = job["payload"]["url"]
+        progress("transcribing", url=url)
+        print(f"\n➡️  URL: {url} ({job['id']})")
+        if manifest and manifest.is_done(url, str(outdir)):
+            # Job repetido en la cola de una corrida interrumpida
+            print(f"⏭️  Ya transcrita: {url}")
+            previo = manifest.get(url)
+            resultados.append({"url": url, "ok": True, "skipped": True, "descarga_s": 0.0, "transcripcion_s": 0.0,
+                               "duracion_audio": previo.get("duracion_audio", 0.0)})
+            return {"url": url, "ok": True, "salida": previo["output"]}, 200
+        resultado = process_url(url, outdir, ram=ram, modo=modo, cache=cache, config=config, manifest=manifest)
+        resultados.append(resultado)
+        return resultado, 200 if resultado["ok"] else 500
+
+    JobScheduler(queue, handler, workers=workers).drain()
+    print(f"📥 Cola {queue_path}: {queue.counts()}")
+    return resultados
+
+
+def print_summary(resultados: List[Dict[str, Any]], wall: float):
+    """Imprime tiempos por URL y el throughput global"""
+    salteadas = [r for r in resultados if r.get("skipped")]
+    ok = [r for r in resultados if r["ok"] and not r.get("skipped")]
+    audio_total = sum(r["duracion_audio"] for r in ok)
+    print("\n📊 Resumen")
+    for r in resultados:
+        estado = "⏭️ " if r.get("skipped") else "✅" if r["ok"] else "❌"
+        print(f"  {estado} descarga {r['descarga_s']:7.1f}s | transcripción {r['transcripcion_s']:7.1f}s | "
+              f"audio {r['duracion_audio']:7.0f}s | {r['url']}")
+    print(f"  Completadas: {len(ok)}/{len(resultados) - len(salteadas)} en {wall:.1f}s"
+          + (f" ({len(salteadas)} salteadas: ya transcritas o con un job en curso)" if salteadas else ""))
+    if wall > 0:
+        print(f"  Throughput: {len(ok) * 3600 / wall:.1f} videos/hora, "
+              f"{audio_total / wall:.2f} segundos de audio por segundo")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Procesa múltiples URLs y transcribe audio")
-    parser.add_argument("--list", required=True, help="Archivo de texto con una URL por línea")
+    parser.add_argument("--list", default=None, help="Archivo de texto con una URL por línea")
     parser.add_argument("--outdir", default="datos-crudos", help="Carpeta de salida")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos de transcripción en paralelo (1 = modo secuencial; con --queue, hilos)")
+    parser.add_argument("--download-workers", type=int, default=None,
+                        help="Hilos de descarga (default: 2 × workers)")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="Descargar por adelantado al spool también con --workers 1")
+    parser.add_argument("--spool-dir", default=None,
+                        help="Carpeta de los audios descargados a la espera de transcripción (default: temporal)")
+    parser.add_argument("--spool-mb", type=float, default=None,
+                        help="Tope en MB del spool; las descargas esperan si se llena. Cuenta también el PCM "
+                             "decodificado (--audio-mode pcm o --chunk-workers), ~64 KB por segundo de audio")
+    parser.add_argument("--spool-items", type=int, default=None,
+                        help="Tope de audios en el spool (default: 2 × workers)")
+    parser.add_argument("--fragments", type=int, default=None,
+                        help="Fragmentos HLS/DASH en paralelo por descarga (YTDLP_CONCURRENT_FRAGMENTS, default: 4)")
+    parser.add_argument("--ram", action="store_true", help="Usar un tmpfs en RAM para los audios temporales")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Activa la caché de transcripciones en esta carpeta (reusa resultados por video/audio)")
+    parser.add_argument("--audio-mode", choices=AUDIO_MODES, default=None,
+                        help="native (sin re-encode, default), pcm (16 kHz en memoria) o mp3 (re-encode)")
+    parser.add_argument("--queue", default=None,
+                        help="Cola SQLite de jobs (jobs.py): encola --list y procesa todo lo pendiente en ella")
+    parser.add_argument("--manifest", default=None,
+                        help="JSONL con el estado de cada URL (default: <outdir>/run-manifest.jsonl)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Retomar con el manifest: salta las URLs ya transcritas (las fallidas se reintentan)")
+    add_cli_args(parser)
     args = parser.parse_args()
+    if not args.list and not args.queue:
+        parser.error("Se requiere --list (o --queue para procesar una cola existente)")
+    config = from_cli_args(args)
+    if args.fragments:
+        # audio.opciones_red lo lee al armar las opciones de cada descarga
+        os.environ["YTDLP_CONCURRENT_FRAGMENTS"] = str(args.fragments)
 
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    list_path = Path(args.list)
-    if not list_path.exists():
-        raise FileNotFoundError(f"No existe el archivo de lista: {list_path}")
+    urls: List[str] = []
+    if args.list:
+        list_path = Path(args.list)
+        if not list_path.exists():
+            raise FileNotFoundError(f"No existe el archivo de lista: {list_path}")
+        urls = [line.strip() for line in list_path.read_text(encoding="utf-8").splitlines() if line.strip()]
 
-    urls = [line.strip() for line in list_path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    manifest = RunManifest(args.manifest or str(outdir / "run-manifest.jsonl"), resume=args.resume)
+    if args.resume:
+        restantes = manifest.remaining(urls, str(outdir))
+        print(f"♻️  Retomando {manifest.path}: {len(urls) - len(restantes)} URLs ya transcritas se saltan")
+        urls = restantes
     print(f"🔎 Procesando {len(urls)} URLs...")
-    for url in urls:
-        print(f"\n➡️  URL: {url}")
-        process_url(url, outdir)
+    cache = cache_from_env(config, directory=args.cache_dir) if args.cache_dir else None
+    t0 = time.perf_counter()
+    if args.queue:
+        resultados = process_queue(urls, args.queue, outdir, args.workers, ram=args.ram or None,
+                                   modo=args.audio_mode, cache=cache, config=config, manifest=manifest)
+    elif args.workers > 1 or args.prefetch or args.spool_mb or args.spool_items:
+        resultados = process_parallel(urls, outdir, args.workers, args.download_workers,
+                                      ram=args.ram or None, modo=args.audio_mode, cache=cache, config=config,
+                                      manifest=manifest, spool_dir=args.spool_dir,
+                                      spool_bytes=int(args.spool_mb * 1e6) if args.spool_mb else None,
+                                      spool_items=args.spool_items)
+    else:
+        resultados = []
+        for url in urls:
+            print(f"\n➡️  URL: {url}")
+            resultados.append(process_url(url, outdir, ram=args.ram or None, modo=args.audio_mode, cache=cache,
+                                          config=config, manifest=manifest))
+    print_summary(resultados, time.perf_counter() - t0)
+    print(f"  Manifest: {manifest.path} {manifest.counts()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+"""
+Estado por post para re-scrapes incrementales.
+
+Por cada post (clave: URL normalizada) se guarda qué comentarios ya se vieron
+(claves de dedup.comment_key), cuántos hay, la fecha del más reciente y un
+puntero al último snapshot subido. En modo incremental:
+
+1. el post se ordena por "más recientes" (expansion.sort_newest),
+2. la expansión se corta en cuanto aparece un comentario ya conocido
+   (`NewestFirstProbe`),
+3. solo se sube el delta, con un puntero al snapshot anterior
+   (`snapshot_anterior`), y se actualiza el estado.
+
+Si el menú de orden no aparece, el post se expande completo como siempre y
+igualmente se sube solo el delta. Las respuestas nuevas dentro de hilos viejos no
+cortan la expansión: quedan en el delta solo si su hilo se llegó a abrir.
+
+Backends (los mismos de cache.py):
+- bucket: SCRAPE_STATE_BUCKET_ID, compartido entre instancias (se sobrescribe);
+  es la fuente de verdad cuando está configurado
+- local: un JSON por post en SCRAPE_STATE_DIR (default: <tmp>/scrape-state), que
+  hace de caché del bucket o de único backend sin él
+
+Al leer se consultan todos y gana el estado con `updated_at` más reciente: una
+instancia caliente con un JSON local viejo no pisa lo que otra ya subió al bucket.
+Los backends que quedaron atrás se actualizan con el ganador.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from cache import BucketCacheBackend, LocalCacheBackend
+from dedup import comment_key, content_hash
+from expansion import sort_newest
+from extraction import extract_comments
+from graphql_capture import CommentCollector
+from waits import PageWaiter
+
+STATE_VERSION = 1
+
+# Parámetros de la URL que no cambian el post (tracking de Facebook)
+TRACKING_PARAMS = {"fbclid", "__cft__", "__tn__", "mibextid", "rdid", "share_url", "ref", "refsrc", "_rdr"}
+
+
+def normalize_post_url(url: str) -> str:
+    """Misma URL para el mismo post: sin fragmento, sin tracking y con el host sin www./m./web."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for prefix in ("www.", "m.", "web.", "mbasic."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k not in TRACKING_PARAMS and not k.startswith("__"))
+    return urlunsplit(("https", host, parts.path.rstrip("/"), urlencode(query), ""))
+
+
+def post_key(url: str) -> str:
+    return "post-" + hashlib.sha256(normalize_post_url(url).encode("utf-8")).hexdigest()[:27]
+
+
+def comment_keys(comment: Dict[str, Any]) -> List[str]:
+    """
+    Claves que se guardan en el estado por comentario: la de dedup y, si tiene ID,
+    también la del contenido, para reconocerlo en un re-scrape que no ve IDs
+    (p. ej. GraphQL primero y después DOM sin link al comentario).
+    """
+    keys = [comment_key(comment)]
+    if comment.get("comment_id"):
+        keys.append(f"h:{content_hash(comment.get('author'), comment.get('text'))}")
+    return keys
+
+
+def is_known(comment: Dict[str, Any], known: Set[str]) -> bool:
+    """
+    Un comentario con ID se reconoce solo por su ID: el mismo autor puede repetir el
+    mismo texto en otro comentario. El hash del contenido solo sirve para los que no
+    tienen ID.
+    """
+    return comment_key(comment) in known
+
+
+def new_comments(comments: Iterable[Dict[str, Any]], known: Optional[Set[str]]) -> List[Dict[str, Any]]:
+    """Los comentarios que no estaban en el estado anterior"""
+    if not known:
+        return list(comments)
+    return [c for c in comments if not is_known(c, known)]
+
+
+def known_keys(state: Optional[Dict[str, Any]]) -> Set[str]:
+    return set(state.get("keys", [])) if state else set()
+
+
+def update_state(previo: Optional[Dict[str, Any]], url: str, nuevos: List[Dict[str, Any]],
+                 snapshot: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Estado siguiente después de un scrape: suma las claves nuevas y apunta al último snapshot"""
+    previo = previo or {}
+    keys = list(previo.get("keys", []))
+    vistos = set(keys)
+    for comment in nuevos:
+        for key in comment_keys(comment):
+            if key not in vistos:
+                vistos.add(key)
+                keys.append(key)
+
+    fechas = [c["created_time"] for c in nuevos if c.get("created_time")]
+    if previo.get("last_created_time"):
+        fechas.append(previo["last_created_time"])
+
+    return {
+        "version": STATE_VERSION,
+        "url": url,
+        "post_key": post_key(url),
+        "updated_at": datetime.now().isoformat(),
+        "comment_count": previo.get("comment_count", 0) + len(nuevos),
+        "last_created_time": max(fechas) if fechas else None,
+        "snapshot": snapshot or previo.get("snapshot"),
+        "snapshot_count": previo.get("snapshot_count", 0) + (1 if snapshot else 0),
+        "keys": keys,
+    }
+
+
+class ScrapeStateStore:
+    """Estado por post en uno o varios backends (gana el más reciente de todos)"""
+
+    def __init__(self, backends: List[Any]):
+        self.backends = backends
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        key = post_key(url)
+        leidos = []
+        for backend in self.backends:
+            try:
+                data = backend.get(key)
+            except Exception as e:
+                print(f"⚠️  Error leyendo estado ({type(backend).__name__}): {e}")
+                continue
+            state = json.loads(data) if data is not None else None
+            leidos.append((backend, state if state and state.get("version") == STATE_VERSION else None))
+
+        vigentes = [state for _, state in leidos if state is not None]
+        if not vigentes:
+            return None
+        # ISO 8601 ordena como texto; ante empate gana el primer backend (el bucket)
+        mejor = max(vigentes, key=lambda s: s.get("updated_at") or "")
+        data = json.dumps(mejor, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for backend, state in leidos:
+            if state is None or (state.get("updated_at") or "") < (mejor.get("updated_at") or ""):
+                try:
+                    backend.put(key, data)
+                except Exception as e:
+                    print(f"⚠️  Error actualizando estado ({type(backend).__name__}): {e}")
+        return mejor
+
+    def put(self, url: str, state: Dict[str, Any]):
+        data = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for backend in self.backends:
+            try:
+                backend.put(post_key(url), data)
+            except Exception as e:
+                print(f"⚠️  Error escribiendo estado ({type(backend).__name__}): {e}")
+
+
+def state_store_from_env(client=None, directory: Optional[str] = None) -> ScrapeStateStore:
+    directory = directory or os.environ.get("SCRAPE_STATE_DIR") or os.path.join(tempfile.gettempdir(), "scrape-state")
+    backends: List[Any] = []
+
+    bucket_id = os.environ.get("SCRAPE_STATE_BUCKET_ID")
+    if bucket_id and client is not None:
+        backends.append(BucketCacheBackend(client, bucket_id, overwrite=True))
+    backends.append(LocalCacheBackend(directory))
+    return ScrapeStateStore(backends)
+
+
+class NewestFirstProbe:
+    """
+    Ordena el post por "más recientes" y avisa cuando aparece un comentario conocido.
+    En modo graphql escucha solo las respuestas posteriores al cambio de orden (las de
+    la carga inicial vienen por relevancia y traerían comentarios viejos).
+    """
+
+    def __init__(self, page, waiter: PageWaiter, known: Set[str], graphql: bool):
+        self.page = page
+        self.waiter = waiter
+        self.known = known
+        self.collector = CommentCollector() if graphql else None
+        self.sorted = False
+
+    def start(self) -> bool:
+        """True si se pudo ordenar; solo entonces sirve `reached` para cortar la expansión"""
+        if self.collector is not None:
+            self.collector.attach(self.page)
+        self.sorted = sort_newest(self.page, self.waiter)
+        if not self.sorted:
+            self.close()
+        return self.sorted
+
+    def reached(self) -> bool:
+        if not self.sorted or not self.known:
+            return False
+        comments = self.collector.comments if self.collector is not None else extract_comments(self.page)
+        return any(is_known(c, self.known) for c in comments)
+
+    def close(self):
+        if self.collector is not None:
+            try:
+                self.collector.detach(self.page)
+            except Exception:
+                pass
@@ -0,0 +1,203 @@
+"""
+Scraper de comentarios de varios posts con playwright.async_api.
+
+Un solo Chromium y un contexto (con las cookies) por post; los posts corren en
+paralelo dentro del mismo event loop con:
+- un límite global de posts simultáneos (--concurrency),
+- un intervalo mínimo entre navegaciones al mismo dominio (--domain-interval).
+
+La expansión y la extracción son las mismas del scraper síncrono (mismos labels,
+selectores, esperas por eventos y captura GraphQL), en sus variantes async.
+
+Salida: un JSONL por post (comments_<stamp>_<i>.jsonl) o, con --merged, un solo
+JSONL con el campo "url" en cada comentario. Al final se reportan posts/minuto y
+comentarios/segundo.
+
+Uso:
+    python src/scraper-fb-batch.py --list posts.txt --concurrency 4 --headless
+    python src/scraper-fb-batch.py --list posts.txt --merged --domain-interval 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from blocking import BLOCK_PRESETS, BlockPolicy, resolve_block_policy
+from browser_pool import CONTEXT_OPTIONS, LAUNCH_ARGS
+from cookies import check_expiry, load_cookies
+from expansion import COMMENT_EXPAND_LABELS, SEE_MORE_LABELS, AsyncExpansionController
+from extraction import extract_comments_async
+from graphql_capture import SCRAPE_MODES, CommentCollector, resolve_scrape_mode
+from waits import AsyncPageWaiter
+
+
+def domain_of(url: str) -> str:
+    """Dominio registrable aproximado: www.facebook.com y m.facebook.com cuentan como uno"""
+    host = urlsplit(url).netloc.lower().split(":")[0]
+    return ".".join(host.split(".")[-2:])
+
+
+class DomainRateLimiter:
+    """Separa al menos `interval` segundos las navegaciones a un mismo dominio"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last: Dict[str, float] = {}
+
+    async def wait(self, url: str):
+        domain = domain_of(url)
+        lock = self._locks.setdefault(domain, asyncio.Lock())
+        async with lock:
+            last = self._last.get(domain)
+            if last is not None:
+                delay = last + self.interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self._last[domain] = time.monotonic()
+
+
+async def scrape_post(browser, url: str, cookies: List[Dict], mode: str, max_clicks: Optional[int],
+                      time_budget: Optional[float], replies: bool,
+                      block_policy: Optional[BlockPolicy] = None) -> Dict[str, Any]:
+    """Scrapea un post en un contexto nuevo; devuelve los comentarios y las estadísticas de expansión"""
+    context = await browser.new_context(**CONTEXT_OPTIONS)
+    try:
+        if block_policy is not None:
+            await block_policy.apply_async(context)
+        await context.add_cookies(cookies)
+        page = await context.new_page()
+        collector = CommentCollector().attach_async(page) if mode == "graphql" else None
+        waiter = AsyncPageWaiter(page)
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+            await waiter.settle()
+
+            controller = AsyncExpansionController(
+                page, SEE_MORE_LABELS, COMMENT_EXPAND_LABELS, waiter=waiter, time_budget=time_budget,
+                max_clicks=max_clicks, replies=replies,
+                extra_progress=(lambda: len(collector)) if collector is not None else None)
+            stats = await controller.run()
+
+            comments = []
+            if collector is not None:
+                collector.detach(page)
+                comments = collector.comments
+            if not comments:
+                await controller.expand_truncated()
+                comments = await extract_comments_async(page)
+            return {"comments": comments, "expansion": stats}
+        finally:
+            waiter.close()
+    finally:
+        await context.close()
+
+
+def write_comments(out: TextIO, comments: List[Dict], url: Optional[str] = None):
+    for c in comments:
+        out.write(json.dumps({"url": url, **c} if url else c, ensure_ascii=False) + "\n")
+
+
+async def run(urls: List[str], cookies: List[Dict], outdir: Path, concurrency: int = 4,
+              domain_interval: float = 2.0, merged: bool = False, headless: bool = True,
+              mode: Optional[str] = None, max_clicks: Optional[int] = None,
+              time_budget: Optional[float] = None, replies: bool = True,
+              block: Optional[str] = None) -> Dict[str, Any]:
+    from playwright.async_api import async_playwright
+
+    mode = resolve_scrape_mode(mode)
+    outdir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = DomainRateLimiter(domain_interval)
+    block_policy = resolve_block_policy(block)
+    merged_out = open(outdir / f"comments_{stamp}.jsonl", "w", encoding="utf-8") if merged else None
+    totals = {"posts": len(urls), "ok": 0, "errors": 0, "comments": 0}
+
+    async def job(i: int, url: str, browser):
+        async with semaphore:
+            await limiter.wait(url)
+            t0 = time.perf_counter()
+            try:
+                result = await scrape_post(browser, url, cookies, mode, max_clicks, time_budget, replies,
+                                           block_policy)
+            except Exception as e:
+                totals["errors"] += 1
+                print(f"❌ [{i}] {url}: {e}")
+                return
+        comments = result["comments"]
+        if merged_out is not None:
+            write_comments(merged_out, comments, url)
+        else:
+            with open(outdir / f"comments_{stamp}_{i:04d}.jsonl", "w", encoding="utf-8") as f:
+                write_comments(f, comments)
+        totals["ok"] += 1
+        totals["comments"] += len(comments)
+        print(f"✅ [{i}] {len(comments)} comentarios en {time.perf_counter() - t0:.1f}s "
+              f"(fin: {result['expansion']['stop_reason']}) {url}")
+
+    t0 = time.perf_counter()
+    try:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=headless, args=LAUNCH_ARGS)
+            try:
+                await asyncio.gather(*(job(i, url, browser) for i, url in enumerate(urls)))
+            finally:
+                await browser.close()
+    finally:
+        if merged_out is not None:
+            merged_out.close()
+
+    elapsed = time.perf_counter() - t0
+    totals["elapsed_s"] = round(elapsed, 1)
+    totals["posts_per_min"] = round(totals["ok"] / elapsed * 60, 2) if elapsed else 0.0
+    totals["comments_per_s"] = round(totals["comments"] / elapsed, 2) if elapsed else 0.0
+    totals["blocking"] = block_policy.summary()
+    print(f"🏁 {totals['ok']}/{totals['posts']} posts, {totals['comments']} comentarios en {totals['elapsed_s']}s: "
+          f"{totals['posts_per_min']} posts/min, {totals['comments_per_s']} comentarios/s")
+    print(f"🚫 Bloqueo '{totals['blocking']['preset']}': {totals['blocking']['blocked']} peticiones bloqueadas "
+          f"{totals['blocking']['by_type']}")
+    return totals
+
+
+def read_urls(list_path: str) -> List[str]:
+    with open(list_path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraper de comentarios de varios posts de Facebook (async)")
+    parser.add_argument("--list", required=True, help="Archivo con una URL de post por línea")
+    parser.add_argument("--cookies", default="facebook-cookies.json", help="Ruta al JSON de cookies")
+    parser.add_argument("--outdir", default="datos-crudos", help="Carpeta de salida para JSONL")
+    parser.add_argument("--concurrency", type=int, default=4, help="Posts simultáneos (default: 4)")
+    parser.add_argument("--domain-interval", type=float, default=2.0,
+                        help="Segundos mínimos entre navegaciones al mismo dominio (default: 2)")
+    parser.add_argument("--merged", action="store_true", help="Un solo JSONL con la URL en cada comentario")
+    parser.add_argument("--headless", action="store_true", help="Ejecutar en modo headless")
+    parser.add_argument("--mode", choices=SCRAPE_MODES, default=None,
+                        help="graphql: comentarios desde las respuestas de red (default, fallback al DOM); dom: solo DOM")
+    parser.add_argument("--max-clicks", type=int, default=None, help="Tope de clicks en 'ver más comentarios'")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Segundos máximos de expansión por post (default: SCRAPE_TIME_BUDGET o 180)")
+    parser.add_argument("--no-replies", action="store_true", help="No abrir los hilos de respuestas")
+    parser.add_argument("--block", choices=list(BLOCK_PRESETS), default=None,
+                        help="Recursos que no se descargan: off, media o aggressive (default: SCRAPE_BLOCK o aggressive)")
+    args = parser.parse_args()
+
+    cookies = load_cookies(args.cookies)
+    check_expiry(cookies)
+
+    asyncio.run(run(read_urls(args.list), cookies, Path(args.outdir), concurrency=args.concurrency,
+                    domain_interval=args.domain_interval, merged=args.merged, headless=args.headless,
+                    mode=args.mode, max_clicks=args.max_clicks, time_budget=args.time_budget,
+                    replies=not args.no_replies, block=args.block))
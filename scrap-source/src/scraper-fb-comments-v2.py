@@ -1,55 +1,17 @@
 import argparse
 import json
-import random
-import time
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict
 
 from playwright.sync_api import sync_playwright
 
-
-def load_cookies(cookies_path: Path):
-    if not cookies_path.exists():
-        raise FileNotFoundError(f"No se encontró el archivo de cookies: {cookies_path}")
-    with open(cookies_path, "r", encoding="utf-8") as f:
-        raw_cookies = json.load(f)
-    
-    # Sanitize cookies for Playwright
-    clean_cookies = []
-    for cookie in raw_cookies:
-        clean_cookie = {
-            "name": cookie.get("name", ""),
-            "value": cookie.get("value", ""),
-            "domain": cookie.get("domain", ""),
-            "path": cookie.get("path", "/"),
-        }
-        
-        # Handle sameSite - normalize to valid values
-        same_site = cookie.get("sameSite") or ""
-        if isinstance(same_site, str):
-            same_site = same_site.lower()
-            if same_site in ["strict", "lax", "none"]:
-                clean_cookie["sameSite"] = same_site.capitalize()
-            else:
-                clean_cookie["sameSite"] = "Lax"  # Default safe value
-        else:
-            clean_cookie["sameSite"] = "Lax"  # Default safe value
-        
-        # Optional fields
-        if "httpOnly" in cookie:
-            clean_cookie["httpOnly"] = bool(cookie["httpOnly"])
-        if "secure" in cookie:
-            clean_cookie["secure"] = bool(cookie["secure"])
-        if "expires" in cookie:
-            clean_cookie["expires"] = cookie["expires"]
-            
-        clean_cookies.append(clean_cookie)
-    
-    return clean_cookies
+from cookies import check_expiry, load_cookies
+from dedup import CommentIndex, normalize_text
+from waits import PageWaiter
 
 
-def navigate_to_comments(page):
+def navigate_to_comments(page, waiter: PageWaiter):
     """Navegar específicamente a la sección de comentarios"""
     print("🔍 Buscando sección de comentarios...")
     
@@ -77,14 +39,15 @@ def navigate_to_comments(page):
                     print(f"  ✅ Encontrado indicador: {indicator} ({elements.count()} elementos)")
                     # Hacer scroll al primer elemento encontrado
                     elements.first.scroll_into_view_if_needed(timeout=2000)
-                    time.sleep(2)
+                    waiter.settle()
                     return True
             except:
                 continue
         
         # Scroll general hacia abajo
+        base = waiter.mark()
         page.evaluate("window.scrollBy(0, 800)")
-        time.sleep(2)
+        waiter.wait_for_growth(base)
     
     print("  ❌ No se encontraron indicadores de comentarios")
     return False
@@ -92,7 +55,10 @@ def navigate_to_comments(page):
 
 def extract_comments_aggressive(page) -> List[Dict]:
     """Extracción agresiva usando múltiples estrategias"""
-    results = []
+    index = CommentIndex()
+    # La estrategia de estructura ve el mismo comentario en divs anidados con
+    # distinto final de texto: también se descarta por (autor, primeros 50 caracteres)
+    prefijos = set()
     
     print("🎯 Buscando comentarios con estrategia agresiva...")
     
@@ -143,9 +109,9 @@ def extract_comments_aggressive(page) -> List[Dict]:
                                         }
                                         
                                         # Evitar duplicados
-                                        if not any(c["author"] == comment["author"] and c["text"] == comment["text"] 
-                                                 for c in results):
-                                            results.append(comment)
+                                        prefijo = (normalize_text(potential_author), normalize_text(potential_text)[:50])
+                                        if index.add(comment):
+                                            prefijos.add(prefijo)
                                             print(f"    ✓ Comentario: {potential_author[:20]}... | {potential_text[:40]}...")
                         except:
                             continue
@@ -190,20 +156,21 @@ def extract_comments_aggressive(page) -> List[Dict]:
                             }
                             
                             # Evitar duplicados
-                            if not any(c["author"] == comment["author"] and c["text"][:50] == comment["text"][:50] 
-                                     for c in results):
-                                results.append(comment)
+                            prefijo = (normalize_text(author), normalize_text(comment["text"])[:50])
+                            if prefijo not in prefijos and index.add(comment):
+                                prefijos.add(prefijo)
                                 print(f"    ✓ Estructura: {author[:20]}... | {text[:40]}...")
             except:
                 continue
     except Exception as e:
         print(f"  ❌ Error en estrategia de estructura: {e}")
     
-    return results
+    return index.records
 
 
 def run_v2(url: str, cookies_path: Path, outdir: Path, headless: bool = True):
     cookies = load_cookies(cookies_path)
+    check_expiry(cookies)
     outdir.mkdir(parents=True, exist_ok=True)
     stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
     outfile = outdir / f"comments_{stamp}.jsonl"
@@ -213,19 +180,21 @@ def run_v2(url: str, cookies_path: Path, outdir: Path, headless: bool = True):
         context = browser.new_context()
         context.add_cookies(cookies)
         page = context.new_page()
+        waiter = PageWaiter(page)
 
         print("🚀 Navegando al post...")
         page.goto(url, wait_until="domcontentloaded")
         print(f"URL final: {page.url}")
         
-        # Espera inicial más larga
-        time.sleep(5)
+        # Espera inicial: hasta que el DOM y la red se queden quietos
+        waiter.settle()
         
         # Navegar específicamente a comentarios
-        navigate_to_comments(page)
+        navigate_to_comments(page, waiter)
         
-        # Esperar más tiempo para cargar comentarios
-        time.sleep(3)
+        # Esperar a que terminen de cargar los comentarios
+        waiter.settle()
+        print(f"⏱️  {waiter.summary()}")
         
         # Extraer con estrategia agresiva
         comments = extract_comments_aggressive(page)
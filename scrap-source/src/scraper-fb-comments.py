@@ -1,303 +1,231 @@
 import argparse
 import json
-import random
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict
-
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-
-
-SEE_MORE_LABELS = [
-    "See more comments",
-    "View more comments", 
-    "Ver más comentarios",
-    "View previous comments",
-    "Mostrar comentarios anteriores",
-    "Mostrar más comentarios",
-    "Load more comments",
-    "Cargar más comentarios"
-]
-
-COMMENT_EXPAND_LABELS = [
-    "See more",
-    "Ver más", 
-    "Show more",
-    "Mostrar más"
-]
-
+from typing import List, Dict, Optional, Set
+
+from blocking import BLOCK_PRESETS, resolve_block_policy
+from cookies import check_expiry, load_cookies
+from browser_pool import BrowserPool
+from extraction import extract_comments
+from graphql_capture import SCRAPE_MODES, CommentCollector, resolve_scrape_mode
+from waits import PageWaiter
+from buttons import button_stats
+from expansion import COMMENT_EXPAND_LABELS, SEE_MORE_LABELS, ExpansionController
+from scrape_state import NewestFirstProbe, known_keys, new_comments, state_store_from_env, update_state
+
+
+def expand_comments(page, max_clicks: Optional[int] = None, waiter: Optional[PageWaiter] = None,
+                    time_budget: Optional[float] = None, replies: bool = True, extra_progress=None,
+                    stop_when=None):
+    # Rondas de scroll + "ver más comentarios" + hilos de respuestas hasta que no aparecen
+    # comentarios nuevos, se acaba el presupuesto de tiempo o `stop_when` lo indica
+    controller = ExpansionController(page, SEE_MORE_LABELS, COMMENT_EXPAND_LABELS, waiter=waiter,
+                                     time_budget=time_budget, max_clicks=max_clicks, replies=replies,
+                                     extra_progress=extra_progress, stop_when=stop_when)
+    stats = controller.run()
+    print(f"Expansión: {controller.summary()}")
+    return stats["clicks"]
+
+
+def expand_long_comments(page, waiter: Optional[PageWaiter] = None):
+    # Expande todos los "See more" dentro de los comentarios, en lotes dentro de la página
+    return ExpansionController(page, SEE_MORE_LABELS, COMMENT_EXPAND_LABELS, waiter=waiter).expand_truncated()
+
+
+def scrape_post(page, url: str, max_clicks: Optional[int] = None, save_html: Optional[Path] = None,
+                mode: Optional[str] = None, record_har: Optional[Path] = None,
+                replay_har: Optional[Path] = None, time_budget: Optional[float] = None,
+                replies: bool = True, known: Optional[Set[str]] = None) -> List[Dict]:
+    if replay_har:
+        # Sin red: todas las respuestas salen del HAR grabado
+        page.route_from_har(str(replay_har), not_found="abort")
+    elif record_har:
+        page.route_from_har(str(record_har), update=True, update_content="embed")
+    collector = CommentCollector().attach(page) if resolve_scrape_mode(mode) == "graphql" else None
+    waiter = PageWaiter(page)
+    probe = NewestFirstProbe(page, waiter, known, graphql=collector is not None) if known else None
+
+    try:
+        print(f"Navegando al post: {url}")
+        page.goto(url, wait_until="domcontentloaded")
+        print(f"URL final después de redirección: {page.url}")
+        waiter.settle()
 
-def load_cookies(cookies_path: Path):
-    if not cookies_path.exists():
-        raise FileNotFoundError(f"No se encontró el archivo de cookies: {cookies_path}")
-    with open(cookies_path, "r", encoding="utf-8") as f:
-        raw_cookies = json.load(f)
-    
-    # Sanitize cookies for Playwright
-    clean_cookies = []
-    for cookie in raw_cookies:
-        clean_cookie = {
-            "name": cookie.get("name", ""),
-            "value": cookie.get("value", ""),
-            "domain": cookie.get("domain", ""),
-            "path": cookie.get("path", "/"),
-        }
-        
-        # Handle sameSite - normalize to valid values
-        same_site = cookie.get("sameSite") or ""
-        if isinstance(same_site, str):
-            same_site = same_site.lower()
-            if same_site in ["strict", "lax", "none"]:
-                clean_cookie["sameSite"] = same_site.capitalize()
+        if probe is not None:
+            if probe.start():
+                print(f"Ordenado por más recientes: se para al llegar a uno de los {len(known)} comentarios conocidos")
             else:
-                clean_cookie["sameSite"] = "Lax"  # Default safe value
-        else:
-            clean_cookie["sameSite"] = "Lax"  # Default safe value
-        
-        # Optional fields
-        if "httpOnly" in cookie:
-            clean_cookie["httpOnly"] = bool(cookie["httpOnly"])
-        if "secure" in cookie:
-            clean_cookie["secure"] = bool(cookie["secure"])
-        if "expires" in cookie:
-            clean_cookie["expires"] = cookie["expires"]
-            
-        clean_cookies.append(clean_cookie)
-    
-    return clean_cookies
+                print("⚠️  No se encontró el orden 'más recientes': expansión completa")
 
+        print("Expandiendo lista de comentarios...")
+        clicks = expand_comments(page, max_clicks=max_clicks, waiter=waiter, time_budget=time_budget, replies=replies,
+                                 extra_progress=(lambda: len(collector)) if collector is not None else None,
+                                 stop_when=probe.reached if probe is not None and probe.sorted else None)
+        print(f"Clicks en 'ver más comentarios': {clicks}")
 
-def expand_comments(page, max_clicks: int = 30):
-    clicks = 0
-    
-    # Primero intentar hacer scroll hacia abajo para cargar contenido
-    print("Haciendo scroll para cargar comentarios...")
-    for _ in range(3):
-        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        time.sleep(2)
-    
-    # Luego buscar botones de "ver más comentarios"
-    for _ in range(max_clicks):
-        button = None
-        # Intentar múltiples selectores para botones de más comentarios
-        selectors = [
-            f'span:has-text("{label}")' for label in SEE_MORE_LABELS
-        ] + [
-            f'div:has-text("{label}")' for label in SEE_MORE_LABELS  
-        ] + [
-            '[aria-label*="comments"]',
-            '[role="button"]:has-text("más")',
-            '[role="button"]:has-text("more")'
+        comments = []
+        if collector is not None:
+            collector.detach(page)
+            comments = collector.comments
+            if comments:
+                print(f"📡 {len(comments)} comentarios de {collector.responses} respuestas GraphQL")
+            else:
+                print("⚠️  Sin comentarios en las respuestas GraphQL, usando el DOM")
+
+        if not comments:
+            print("Expandiendo comentarios largos...")
+            expanded = expand_long_comments(page, waiter=waiter)
+            print(f"Comentarios expandidos: {expanded}")
+
+            print("Extrayendo comentarios...")
+            comments = extract_comments(page, verbose=True)
+
+        if save_html:
+            save_html.write_text(page.content(), encoding="utf-8")
+            print(f"💾 HTML guardado para benchmarks: {save_html}")
+        return comments
+    finally:
+        if probe is not None:
+            probe.close()
+        print(f"⏱️  {waiter.summary()}")
+        waiter.close()
+
+
+def save_comments(comments: List[Dict], outfile: Path):
+    with open(outfile, "w", encoding="utf-8") as f:
+        for c in comments:
+            f.write(json.dumps(c, ensure_ascii=False) + "\n")
+    print(f"✅ Guardado: {outfile} ({len(comments)} comentarios)")
+
+
+def run(urls: List[str], cookies_path: Path, outdir: Path, headless: bool = True, max_clicks: Optional[int] = None,
+        workers: int = 1, max_pages: int = 50, save_html: bool = False, mode: Optional[str] = None,
+        record_har: bool = False, replay_har: Optional[Path] = None, time_budget: Optional[float] = None,
+        replies: bool = True, incremental: bool = False, state_dir: Optional[Path] = None,
+        block: Optional[str] = None):
+    """
+    Scrapea los posts con un pool de navegadores persistentes: Chromium se lanza una
+    vez por worker y las cookies se cargan una vez por contexto.
+    Con `incremental` solo se guardan los comentarios nuevos desde el último scrape de
+    cada post (estado en `state_dir`) y un .meta.json con el puntero al snapshot anterior.
+    """
+    if not urls:
+        print("⚠️  No hay URLs para scrapear")
+        return
+    cookies = load_cookies(cookies_path)
+    check_expiry(cookies)
+    outdir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    t0 = time.perf_counter()
+
+    store = state_store_from_env(directory=str(state_dir or outdir / ".scrape-state")) if incremental else None
+    states = [store.get(url) for url in urls] if store else [None] * len(urls)
+
+    block_policy = resolve_block_policy(block)
+    with BrowserPool(workers=min(workers, len(urls)), headless=headless, max_pages=max_pages,
+                     launch_args=[], context_options={}, block_policy=block_policy) as pool:
+        futures = [
+            pool.submit(scrape_post, url, max_clicks, outdir / f"page_{stamp}_{i:04d}.html" if save_html else None,
+                        mode, outdir / f"post_{stamp}_{i:04d}.har" if record_har else None, replay_har,
+                        time_budget=time_budget, replies=replies, known=known_keys(state) or None, cookies=cookies)
+            for i, (url, state) in enumerate(zip(urls, states))
         ]
-        
-        for selector in selectors:
-            try:
-                locator = page.locator(selector).first
-                if locator.is_visible(timeout=1000):
-                    button = locator
-                    print(f"Encontrado botón con selector: {selector}")
-                    break
-            except:
-                continue
-                
-        if button:
+        total = 0
+        for i, (url, state, future) in enumerate(zip(urls, states, futures)):
+            if len(urls) == 1:
+                outfile = outdir / f"comments_{stamp}.jsonl"
+            else:
+                outfile = outdir / f"comments_{stamp}_{i:04d}.jsonl"
             try:
-                button.click(timeout=3000)
-                clicks += 1
-                print(f"Click #{clicks} en 'ver más comentarios'")
-                time.sleep(random.uniform(1.5, 3))
-                continue
+                comments = future.result()
             except Exception as e:
-                print(f"Error haciendo click: {e}")
-                break
-        else:
-            # Si no encontramos botón, intentar scroll adicional
-            page.evaluate("window.scrollBy(0, 500)")
-            time.sleep(1)
-            break
-    
-    return clicks
-
-
-def expand_long_comments(page):
-    # Expande "See more" dentro de cada comentario
-    expanded = 0
-    for label in COMMENT_EXPAND_LABELS:
-        try:
-            buttons = page.locator(f'span:has-text("{label}")').all()
-            for button in buttons[:10]:  # Limitar para evitar loops infinitos
-                try:
-                    if button.is_visible():
-                        button.click(timeout=1000)
-                        expanded += 1
-                        time.sleep(0.3)
-                except:
-                    continue
-        except:
-            continue
-    return expanded
-
-
-def extract_comments(page) -> List[Dict]:
-    results = []
-    # Selectores específicos para Facebook Watch y posts regulares
-    selectors = [
-        # Facebook Watch
-        '[data-testid="UFI2Comment/root_depth_0"]',
-        '[data-testid="comment"]', 
-        # Posts regulares
-        'div[aria-label="Comment"]',
-        'div[role="article"]',
-        # Fallbacks genéricos
-        '[data-ad-preview="message"]',
-        'div:has(> div > span[dir="auto"]):has(strong)',
-        # Para la estructura que viste en la imagen
-        'div:has(> div > div > strong):has(span[dir="auto"])'
-    ]
-    
-    comment_blocks = None
-    used_selector = None
-    for selector in selectors:
-        blocks = page.locator(selector)
-        count = blocks.count()
-        if count > 0:
-            comment_blocks = blocks
-            used_selector = selector
-            print(f"✅ Usando selector: {selector} ({count} elementos)")
-            break
-    
-    if not comment_blocks:
-        print("❌ No se encontraron comentarios con ningún selector")
-        # Debug: mostrar algunos elementos de la página
-        print("Elementos disponibles en la página:")
-        try:
-            all_divs = page.locator('div').all()[:20]  # Primeros 20 divs
-            for i, div in enumerate(all_divs):
-                try:
-                    text = div.inner_text()[:100]  # Primeros 100 chars
-                    if text.strip():
-                        print(f"  div[{i}]: {text}...")
-                except:
-                    pass
-        except:
-            pass
-        return results
-        
-    total = comment_blocks.count()
-    print(f"Procesando {total} elementos encontrados...")
-    
-    for i in range(total):
-        try:
-            block = comment_blocks.nth(i)
-            
-            # Buscar autor con múltiples estrategias
-            author = ""
-            author_selectors = [
-                'strong',
-                'a[role="link"] strong', 
-                'span[dir="auto"] strong',
-                'h3 a',
-                'a[href*="profile"]'
-            ]
-            
-            for auth_sel in author_selectors:
-                try:
-                    auth_elem = block.locator(auth_sel).first
-                    if auth_elem.count() > 0:
-                        author = auth_elem.inner_text(timeout=1000).strip()
-                        if author:
-                            break
-                except:
+                print(f"❌ Error scrapeando {url}: {e}")
+                continue
+            if store is not None:
+                if state and not comments:
+                    # El post tenía comentarios: no ver ninguno es un scrape fallido (login, selectores)
+                    print(f"⚠️  Sin comentarios en {url} ({state['comment_count']} conocidos); el estado no se actualiza")
                     continue
-            
-            # Buscar texto del comentario con múltiples estrategias
-            text_selectors = [
-                'span[dir="auto"]:not(:has(strong))',  # Texto sin el nombre
-                'div[data-ad-preview="message"]',
-                '[dir="auto"]',
-                'div > span'
-            ]
-            
-            texts = []
-            for text_sel in text_selectors:
-                try:
-                    spans = block.locator(text_sel)
-                    if spans.count() > 0:
-                        span_texts = spans.all_inner_texts()
-                        for text in span_texts:
-                            text = text.strip()
-                            # Filtrar texto que no sea el nombre del autor
-                            if text and text != author and len(text) > 1:
-                                texts.append(text)
-                except:
+                comments = new_comments(comments, known_keys(state))
+                if state and not comments:
+                    print(f"✅ Sin comentarios nuevos en {url} ({state['comment_count']} conocidos)")
+                    store.put(url, update_state(state, url, [], None))
                     continue
-            
-            # Limpiar textos duplicados y concatenar
-            unique_texts = []
-            for text in texts:
-                if text not in unique_texts:
-                    unique_texts.append(text)
-            
-            body = " ".join(unique_texts) if unique_texts else ""
-            
-            # Solo agregar si tenemos contenido útil
-            if (author and len(author) > 1) or (body and len(body) > 2):
-                comment = {"author": author, "text": body}
-                if comment not in results:  # Evitar duplicados
-                    results.append(comment)
-                    print(f"  ✓ Comentario {len(results)}: {author[:20]}... | {body[:50]}...")
-                    
-        except Exception as e:
-            print(f"❌ Error procesando comentario {i}: {e}")
-            continue
-    
-    return results
-
-
-def run(url: str, cookies_path: Path, outdir: Path, headless: bool = True, max_clicks: int = 30):
-    cookies = load_cookies(cookies_path)
-    outdir.mkdir(parents=True, exist_ok=True)
-    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    outfile = outdir / f"comments_{stamp}.jsonl"
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=headless)
-        context = browser.new_context()
-        context.add_cookies(cookies)
-        page = context.new_page()
-
-        print("Navegando al post...")
-        page.goto(url, wait_until="domcontentloaded")
-        print(f"URL final después de redirección: {page.url}")
-        time.sleep(random.uniform(3, 6))
-
-        print("Expandiendo lista de comentarios...")
-        clicks = expand_comments(page, max_clicks=max_clicks)
-        print(f"Clicks en 'ver más comentarios': {clicks}")
-
-        print("Expandiendo comentarios largos...")
-        expanded = expand_long_comments(page)
-        print(f"Comentarios expandidos: {expanded}")
-
-        print("Extrayendo comentarios...")
-        comments = extract_comments(page)
-        with open(outfile, "w", encoding="utf-8") as f:
-            for c in comments:
-                f.write(json.dumps(c, ensure_ascii=False) + "\n")
-        print(f"✅ Guardado: {outfile} ({len(comments)} comentarios)")
-
-        context.close()
-        browser.close()
+            save_comments(comments, outfile)
+            total += len(comments)
+            if store is not None:
+                save_snapshot_meta(url, state, comments, outfile)
+                store.put(url, update_state(state, url, comments, {
+                    "filename": str(outfile), "fecha": datetime.now().isoformat()
+                }))
+
+    print(f"🏁 {len(urls)} posts, {total} comentarios en {time.perf_counter() - t0:.1f}s "
+          f"(navegadores lanzados: {pool.stats['launches']}, reciclados: {pool.stats['recycles']})")
+    bloqueo = block_policy.summary()
+    print(f"🚫 Bloqueo '{bloqueo['preset']}': {bloqueo['blocked']} peticiones bloqueadas {bloqueo['by_type']}")
+
+    stats = button_stats(SEE_MORE_LABELS)
+    print(f"🔘 Botón 'ver más': {stats['found']}/{stats['searches']} búsquedas con resultado, "
+          f"selector cacheado acertó {stats['cached_hit_rate']:.0%}")
+    for key, hits in stats["hits"].items():
+        print(f"   {hits:>4}  {key}")
+    if stats["dead"]:
+        print(f"   sin aciertos: {len(stats['dead'])} selectores")
+
+
+def save_snapshot_meta(url: str, state: Optional[Dict], comments: List[Dict], outfile: Path):
+    # Puntero al snapshot anterior del mismo post (el JSONL solo tiene el delta)
+    meta = {
+        "url_origen": url,
+        "incremental": True,
+        "snapshot_anterior": state.get("snapshot") if state else None,
+        "total_comentarios": len(comments),
+        "total_acumulado": (state["comment_count"] if state else 0) + len(comments),
+    }
+    outfile.with_suffix(".meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def read_urls(url: Optional[str], list_path: Optional[str]) -> List[str]:
+    if list_path:
+        with open(list_path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [url]
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Scraper de comentarios de un post de Facebook usando Playwright")
-    parser.add_argument("--url", required=True, help="URL del post público del candidato")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--url", help="URL del post público del candidato")
+    grupo.add_argument("--list", help="Archivo con una URL de post por línea")
     parser.add_argument("--cookies", default="facebook-cookies.json", help="Ruta al JSON de cookies")
     parser.add_argument("--outdir", default="datos-crudos", help="Carpeta de salida para JSONL")
     parser.add_argument("--headless", action="store_true", help="Ejecutar en modo headless")
-    parser.add_argument("--max-clicks", type=int, default=30, help="Clicks máximos en 'ver más comentarios'")
+    parser.add_argument("--max-clicks", type=int, default=None,
+                        help="Tope de clicks en 'ver más comentarios' (por defecto sin tope: se para al no haber progreso)")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Segundos máximos de expansión por post (default: SCRAPE_TIME_BUDGET o 180)")
+    parser.add_argument("--no-replies", action="store_true", help="No abrir los hilos de respuestas")
+    parser.add_argument("--workers", type=int, default=1, help="Navegadores en paralelo (un post por navegador a la vez)")
+    parser.add_argument("--max-pages", type=int, default=50, help="Páginas por navegador antes de relanzarlo")
+    parser.add_argument("--save-html", action="store_true",
+                        help="Guardar el HTML expandido de cada post (fixtures para bench-extraction.py)")
+    parser.add_argument("--mode", choices=SCRAPE_MODES, default=None,
+                        help="graphql: comentarios desde las respuestas de red (default, fallback al DOM); dom: solo DOM")
+    parser.add_argument("--record-har", action="store_true",
+                        help="Grabar la red de cada post en un HAR (para pruebas offline)")
+    parser.add_argument("--replay-har", help="Reproducir un HAR grabado en vez de ir a la red")
+    parser.add_argument("--block", choices=list(BLOCK_PRESETS), default=None,
+                        help="Recursos que no se descargan: off, media o aggressive (default: SCRAPE_BLOCK o aggressive)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Solo los comentarios nuevos desde el último scrape de cada post")
+    parser.add_argument("--state-dir", default=None,
+                        help="Carpeta del estado por post para --incremental (default: OUTDIR/.scrape-state)")
     args = parser.parse_args()
 
-    run(args.url, Path(args.cookies), Path(args.outdir), headless=args.headless, max_clicks=args.max_clicks)
+    run(read_urls(args.url, args.list), Path(args.cookies), Path(args.outdir), headless=args.headless,
+        max_clicks=args.max_clicks, workers=args.workers, max_pages=args.max_pages, save_html=args.save_html,
+        mode=args.mode, record_har=args.record_har, replay_har=Path(args.replay_har) if args.replay_har else None,
+        time_budget=args.time_budget, replies=not args.no_replies, incremental=args.incremental,
+        state_dir=Path(args.state_dir) if args.state_dir else None, block=args.block)
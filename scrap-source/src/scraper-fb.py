@@ -1,17 +1,14 @@
-import json
 import random
 import time
 import argparse
-from pathlib import Path
 from playwright.sync_api import sync_playwright
 
+from cookies import check_expiry, load_cookies
+
 def run(url: str, cookies_path: str, headless: bool = True):
     # 1. Cargar cookies exportadas del navegador (JSON de Playwright o similar)
-    cp = Path(cookies_path)
-    if not cp.exists():
-        raise FileNotFoundError(f"No se encontró el archivo de cookies: {cp}")
-    with open(cp, 'r', encoding='utf-8') as f:
-        cookies = json.load(f)
+    cookies = load_cookies(cookies_path)
+    check_expiry(cookies)
 
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=headless)
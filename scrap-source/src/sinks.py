@@ -0,0 +1,198 @@
+"""
+Sinks JSONL para escribir segmentos a medida que faster-whisper los entrega.
+
+Formato (una línea JSON por registro):
+    {"tipo": "meta", "url_origen": ..., "idioma": ..., ...}
+    {"tipo": "segmento", "start": 0.0, "end": 2.5, "text": "..."}
+    ...
+    {"tipo": "fin", "total_segmentos": N, "first_segment_latency_s": ...}
+
+Cada línea se escribe y se hace flush al momento, así una caída deja en disco
+todos los segmentos ya transcritos. La ausencia de la línea "fin" indica que el
+resultado es parcial.
+
+BucketJsonlSink sube el spool desde un hilo propio, así la transcripción nunca
+espera a la red. Cada subida crea la versión nueva antes de borrar la anterior,
+alternando entre dos file_id (`<base>a` / `<base>b`): el bucket siempre tiene una
+copia completa, y `file_id` apunta a la última.
+"""
+
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# Mínimo entre subidas parciales (cada una sube el spool completo)
+MIN_FLUSH_INTERVAL = 5.0
+
+
+class JsonlSink:
+    """Escribe registros JSONL en un archivo local con flush por línea"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.records += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class BucketJsonlSink(JsonlSink):
+    """
+    Igual que JsonlSink sobre un archivo de spool local, y además un hilo sube el
+    archivo a Appwrite Storage cada `flush_interval` segundos (mínimo
+    MIN_FLUSH_INTERVAL) si hubo líneas nuevas, y una última vez al cerrar.
+    `on_upload(file_id)` avisa cada versión subida.
+    """
+
+    def __init__(self, client, bucket_id: str, filename: str, spool_path: str, flush_interval: float = 30.0,
+                 on_upload: Optional[Callable[[str], Any]] = None):
+        from appwrite.id import ID
+        from uploads import get_storage
+        super().__init__(spool_path)
+        self.storage = get_storage(client)
+        self.bucket_id = bucket_id
+        self.filename = filename
+        base = ID.unique()
+        self._slots = (f"{base}a", f"{base}b")
+        self.file_id: Optional[str] = None
+        self.flush_interval = max(MIN_FLUSH_INTERVAL, flush_interval)
+        self.on_upload = on_upload
+        self.uploads = 0
+        self.result: Optional[Dict[str, Any]] = None
+        # Bytes del spool hasta la última línea completa, y los de la última subida
+        self._flushed = 0
+        self._uploaded = 0
+        self._write_lock = threading.Lock()
+        self._upload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._subir_periodicamente, name="jsonl-upload", daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any]):
+        with self._write_lock:
+            super().write(record)
+            self._flushed = self._file.tell()
+
+    def _subir_periodicamente(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.upload()
+            except Exception as e:
+                # La próxima subida (o la de close) lo vuelve a intentar
+                print(f"⚠️  Error en la subida parcial de {self.filename}: {e}")
+
+    def upload(self) -> Optional[Dict[str, Any]]:
+        """Sube el spool como versión nueva y recién entonces borra la anterior"""
+        from appwrite.exception import AppwriteException
+        with self._upload_lock:
+            with self._write_lock:
+                size = self._flushed
+            if size == self._uploaded:
+                return self.result
+            with open(self.path, "rb") as f:
+                data = f.read(size)
+
+            previo = self.file_id
+            nuevo = self._slots[self.uploads % 2]
+            self.result = self._crear(nuevo, data)
+            self.file_id = nuevo
+            self.uploads += 1
+            self._uploaded = size
+            if previo:
+                try:
+                    self.storage.delete_file(bucket_id=self.bucket_id, file_id=previo)
+                except AppwriteException as e:
+                    if e.code != 404:
+                        print(f"⚠️  No se pudo borrar la versión anterior de {self.filename}: {e}")
+            if self.on_upload is not None:
+                self.on_upload(nuevo)
+            return self.result
+
+    def _crear(self, file_id: str, data: bytes) -> Dict[str, Any]:
+        from appwrite.exception import AppwriteException
+        from appwrite.input_file import InputFile
+
+        def crear():
+            return self.storage.create_file(
+                bucket_id=self.bucket_id,
+                file_id=file_id,
+                file=InputFile.from_bytes(data, filename=self.filename, mime_type="application/x-ndjson")
+            )
+        try:
+            return crear()
+        except AppwriteException as e:
+            if e.code != 409:
+                raise
+            # Quedó una versión vieja en este slot (falló su borrado): se reemplaza
+            self.storage.delete_file(bucket_id=self.bucket_id, file_id=file_id)
+            return crear()
+
+    def close(self):
+        closed = self._file.closed
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+        with self._write_lock:
+            super().close()
+        # Si no se escribió nada (p. ej. falló la descarga) no se crea el archivo
+        if not closed and self.records:
+            self.upload()
+
+
+def escribir_segmentos(segmentos: Iterable[Dict[str, Any]], sink: JsonlSink, t_inicio: float,
+                       preview_chars: int = 500) -> Dict[str, Any]:
+    """
+    Consume el generador de segmentos escribiendo cada uno al sink.
+    Devuelve métricas: total, latencia al primer segmento (desde `t_inicio`) y un preview del texto.
+    """
+    total = 0
+    latencia = None
+    preview = []
+    preview_len = 0
+    for segmento in segmentos:
+        if latencia is None:
+            latencia = time.perf_counter() - t_inicio
+        sink.write({"tipo": "segmento", **segmento})
+        total += 1
+        if preview_len <= preview_chars:
+            preview.append(segmento["text"].strip())
+            preview_len += len(preview[-1]) + 1
+
+    texto = " ".join(preview)
+    return {
+        "total_segmentos": total,
+        "first_segment_latency_s": latencia,
+        "duracion_s": time.perf_counter() - t_inicio,
+        "texto_preview": texto[:preview_chars] + "..." if len(texto) > preview_chars else texto
+    }
+
+
+def leer_segmentos(path: str) -> Iterable[Dict[str, Any]]:
+    """Lee los segmentos de un JSONL (también de uno parcial)"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # última línea truncada por una caída
+                break
+            if record.get("tipo") == "segmento":
+                yield {k: v for k, v in record.items() if k != "tipo"}
@@ -0,0 +1,122 @@
+"""
+Spool de descargas para el pipeline de runner.py.
+
+La etapa de prefetch descarga el audio de las próximas URLs a un directorio y los
+workers de transcripción lo consumen. El spool acota lo que se acumula en disco:
+- max_items: audios descargados (o descargándose) que todavía no se transcribieron
+- max_bytes: bytes de esos audios; antes de descargar se reserva una estimación
+  (tamaño del formato o duración × bitrate) y al terminar se ajusta al real. Si la
+  transcripción decodifica a PCM (modo pcm o chunks), el `<audio>.pcm` también se
+  escribe en el spool: float32 a 16 kHz, unos 64 KB por segundo de audio, y se
+  reserva junto con la descarga (`estimate_pcm`)
+
+Cuando se llega al tope, `acquire` bloquea la descarga siguiente hasta que un worker
+libera un audio (backpressure): un CDN lento no frena la CPU mientras haya audios
+en el spool, y una transcripción lenta no llena el disco.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from audio import SAMPLE_RATE
+
+# Estimación cuando yt-dlp no informa el tamaño: ~128 kbps
+BYTES_POR_SEGUNDO = 16000
+# PCM float32 mono que escribe audio.decodificar_pcm
+PCM_BYTES_POR_SEGUNDO = SAMPLE_RATE * 4
+
+
+def estimate_size(info: Optional[Dict[str, Any]]) -> int:
+    """Bytes esperados del audio según el info de yt-dlp (0 si no hay datos)"""
+    if not info:
+        return 0
+    size = info.get("filesize") or info.get("filesize_approx")
+    if size:
+        return int(size)
+    return int((info.get("duration") or 0) * BYTES_POR_SEGUNDO)
+
+
+def estimate_pcm(info: Optional[Dict[str, Any]], path: Optional[str] = None) -> int:
+    """Bytes del PCM decodificado: por la duración, o por el tamaño del audio si no se conoce"""
+    duracion = (info or {}).get("duration")
+    if not duracion:
+        duracion = (_tamano(path) if path else estimate_size(info)) / BYTES_POR_SEGUNDO
+    return int(duracion * PCM_BYTES_POR_SEGUNDO)
+
+
+def _tamano(path: Optional[str]) -> int:
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+class DownloadSpool:
+    """Presupuesto de items y bytes para los audios entre la descarga y la transcripción"""
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None, max_items: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.reservas: Dict[int, int] = {}
+        self.stats = {"esperas": 0, "espera_s": 0.0, "pico_bytes": 0, "pico_items": 0}
+        self._next = 0
+        self._cond = threading.Condition()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(self.reservas.values())
+
+    def _hay_lugar(self, estimate: int) -> bool:
+        if not self.reservas:
+            # Un audio más grande que todo el presupuesto igual tiene que poder pasar
+            return True
+        if self.max_items is not None and len(self.reservas) >= self.max_items:
+            return False
+        return self.max_bytes is None or self.used_bytes + estimate <= self.max_bytes
+
+    def acquire(self, estimate: int = 0) -> int:
+        """Reserva lugar para una descarga (bloquea mientras el spool esté lleno); devuelve el ticket"""
+        with self._cond:
+            if not self._hay_lugar(estimate):
+                t0 = time.perf_counter()
+                self._cond.wait_for(lambda: self._hay_lugar(estimate))
+                self.stats["esperas"] += 1
+                self.stats["espera_s"] += time.perf_counter() - t0
+            ticket = self._next
+            self._next += 1
+            self.reservas[ticket] = estimate
+            self._actualizar_picos()
+            return ticket
+
+    def settle(self, ticket: int, path: Optional[str], extra: int = 0):
+        """Ajusta la reserva al tamaño real del archivo descargado (más `extra`, p. ej. su PCM)"""
+        with self._cond:
+            if ticket in self.reservas:
+                self.reservas[ticket] = _tamano(path) + extra
+                self._actualizar_picos()
+                self._cond.notify_all()
+
+    def release(self, ticket: int):
+        """Libera el lugar (audio transcrito, de caché o descarga fallida)"""
+        with self._cond:
+            self.reservas.pop(ticket, None)
+            self._cond.notify_all()
+
+    def _actualizar_picos(self):
+        self.stats["pico_bytes"] = max(self.stats["pico_bytes"], self.used_bytes)
+        self.stats["pico_items"] = max(self.stats["pico_items"], len(self.reservas))
+
+    def summary(self) -> str:
+        tope = " / ".join(filter(None, [
+            f"{self.max_items} items" if self.max_items is not None else "",
+            f"{self.max_bytes / 1e6:.0f} MB" if self.max_bytes is not None else "",
+        ])) or "sin tope"
+        return (f"spool ({tope}): pico {self.stats['pico_items']} audios, {self.stats['pico_bytes'] / 1e6:.1f} MB; "
+                f"{self.stats['esperas']} descargas esperaron {self.stats['espera_s']:.1f}s por lugar")
@@ -1,86 +1,152 @@
 import os
 import argparse
+import time
 from datetime import datetime
 from pathlib import Path
-import yt_dlp
-from faster_whisper import WhisperModel
+from typing import Any, Dict, List, Optional
 
-# Usamos "small" porque es rápido y preciso. 
-# Si quieres más precisión (pero más lento), cambia a "medium".
-MODEL_SIZE = "small"
-print(f"⚙️  Cargando modelo '{MODEL_SIZE}' (esto descarga unos 500MB la primera vez)...")
+from audio import AUDIO_MODES, descargar, preparar_entrada
+from engine import EngineConfig, add_cli_args, from_cli_args
+from engine import get_model as get_engine_model, model_load_time, model_loaded
+from sinks import JsonlSink, escribir_segmentos
+from workspace import JobWorkspace
 
-model = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8")
+# Por defecto "small" (WHISPER_MODEL_SIZE), rápido y preciso.
+# Si quieres más precisión (pero más lento), usa --model-size medium o --preset accurate.
 
-def descargar_audio(url):
-    """Descarga solo el audio y lo guarda como temp_audio.mp3"""
+
+def get_model(config: Optional[EngineConfig] = None):
+    """Carga el modelo Whisper la primera vez que se necesita (uno por configuración y proceso)"""
+    config = config or EngineConfig.from_env()
+    if model_loaded(config):
+        return get_engine_model(config)
+    print(f"⚙️  Cargando modelo '{config.model_size}' (esto descarga unos 500MB la primera vez)...")
+    model = get_engine_model(config)
+    print(f"⚙️  Modelo cargado en {model_load_time(config) or 0:.1f}s")
+    return model
+
+def descargar_audio(url, destino, modo: Optional[str] = None, info: Optional[Dict[str, Any]] = None):
+    """Descarga solo el audio en <destino>.<ext> (mp3 solo si modo="mp3")"""
     print(f"⬇️  Descargando audio de: {url}")
-    
-    opciones = {
-        'format': 'bestaudio/best',
-        'outtmpl': 'temp_audio.%(ext)s', 
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'quiet': True,
-        'no_warnings': True
-    }
 
     try:
-        with yt_dlp.YoutubeDL(opciones) as ydl:
-            ydl.download([url])
-        return "temp_audio.mp3"
+        return descargar(url, destino, modo, info=info)
     except Exception as e:
         print(f"❌ Error descargando: {e}")
         return None
 
-def transcribir(archivo):
-    """Usa la IA para convertir audio a texto"""
+def transcribir_stream(archivo, modo: Optional[str] = None, config: Optional[EngineConfig] = None):
+    """
+    Inicia la transcripción y devuelve (info, generador de segmentos como dicts).
+    Los segmentos se producen a medida que faster-whisper los decodifica (o por chunks
+    de voz en paralelo si `config.chunk_workers` > 0). También lo usa main.py.
+    """
+    config = config or EngineConfig.from_env()
+    if config.chunk_workers:
+        from chunking import transcribir_por_chunks
+        return transcribir_por_chunks(archivo, config, pcm_path=f"{archivo}.pcm")
+
+    entrada = preparar_entrada(archivo, modo, mmap_path=f"{archivo}.pcm")
+    segments, info = get_model(config).transcribe(entrada, **config.transcribe_kwargs())
+    return info, ({"start": s.start, "end": s.end, "text": s.text} for s in segments)
+
+def transcribir_detalle(archivo, verbose: bool = True, modo: Optional[str] = None,
+                        config: Optional[EngineConfig] = None) -> Dict[str, Any]:
+    """Transcribe y devuelve texto, idioma, segmentos y duración del audio en segundos"""
     if not os.path.exists(archivo):
-        return "Error: No se encontró el archivo de audio."
+        return {"error": "Error: No se encontró el archivo de audio.", "texto": "", "idioma": "", "duracion": 0.0}
 
-    print("🎙️  La IA está escuchando y transcribiendo...")
+    if verbose:
+        print("🎙️  La IA está escuchando y transcribiendo...")
     
-    # beam_size=5 ayuda a que la IA explore mejores traducciones
-    segments, info = model.transcribe(archivo, beam_size=5)
+    # beam_size=5 (default) ayuda a que la IA explore mejores traducciones
+    info, segments = transcribir_stream(archivo, modo, config)
 
-    print(f"🌍 Idioma detectado: {info.language.upper()} (Probabilidad: {info.language_probability:.2f})")
-    print("-" * 50)
+    if verbose:
+        print(f"🌍 Idioma detectado: {info.language.upper()} (Probabilidad: {info.language_probability:.2f})")
+        print("-" * 50)
 
-    texto_completo = ""
+    segmentos_lista: List[Dict[str, Any]] = []
     for segment in segments:
-        # Imprimimos en tiempo real con marcas de tiempo
-        linea = f"[{segment.start:.1f}s -> {segment.end:.1f}s] {segment.text}"
-        print(linea)
-        texto_completo += segment.text + " "
+        if verbose:
+            # Imprimimos en tiempo real con marcas de tiempo
+            linea = f"[{segment['start']:.1f}s -> {segment['end']:.1f}s] {segment['text']}"
+            print(linea)
+        segmentos_lista.append(segment)
     
-    print("-" * 50)
-    return texto_completo
+    if verbose:
+        print("-" * 50)
+    return {
+        "texto": " ".join(seg["text"] for seg in segmentos_lista).strip(),
+        "idioma": info.language,
+        "probabilidad_idioma": info.language_probability,
+        "segmentos": segmentos_lista,
+        "duracion": info.duration
+    }
 
-def limpiar():
-    """Borra el archivo temporal"""
-    if os.path.exists("temp_audio.mp3"):
-        os.remove("temp_audio.mp3")
-        print("🧹 Archivo temporal eliminado.")
+def transcribir_a_jsonl(archivo, sink: JsonlSink, modo: Optional[str] = None, url: Optional[str] = None,
+                        config: Optional[EngineConfig] = None) -> Dict[str, Any]:
+    """Escribe cada segmento al sink apenas sale de Whisper, sin acumular la lista completa"""
+    t_inicio = time.perf_counter()
+    info, segmentos = transcribir_stream(archivo, modo, config)
+    print(f"🌍 Idioma detectado: {info.language.upper()} (Probabilidad: {info.language_probability:.2f})")
+
+    sink.write({
+        "tipo": "meta",
+        "url_origen": url,
+        "fecha_transcripcion": datetime.now().isoformat(),
+        "idioma": info.language,
+        "probabilidad_idioma": info.language_probability
+    })
+    stats = escribir_segmentos(segmentos, sink, t_inicio)
+    sink.write({"tipo": "fin", **stats})
+    print(f"⏱️  Primer segmento a los {stats['first_segment_latency_s'] or 0:.1f}s, "
+          f"{stats['total_segmentos']} segmentos en {stats['duracion_s']:.1f}s")
+    return stats
+
+def transcribir(archivo, modo: Optional[str] = None, config: Optional[EngineConfig] = None):
+    """Usa la IA para convertir audio a texto"""
+    resultado = transcribir_detalle(archivo, modo=modo, config=config)
+    return resultado.get("error") or resultado["texto"]
+
+def limpiar(archivo: Optional[str]):
+    """Borra el archivo temporal (y el PCM decodificado, si existe)"""
+    if not archivo:
+        return
+    for ruta in (archivo, f"{archivo}.pcm"):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+            print("🧹 Archivo temporal eliminado.")
 
 # --- EJECUCIÓN ---
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Descarga audio y transcribe con Faster-Whisper")
     parser.add_argument("--url", help="URL del video (Facebook, TikTok, YouTube)")
     parser.add_argument("--outdir", default="datos-crudos", help="Carpeta destino para transcripción")
+    parser.add_argument("--audio-mode", choices=AUDIO_MODES, default=None,
+                        help="native (sin re-encode, default), pcm (16 kHz en memoria) o mp3 (re-encode)")
+    parser.add_argument("--ram", action="store_true", help="Usar un tmpfs en RAM para los archivos temporales")
+    parser.add_argument("--jsonl", action="store_true",
+                        help="Escribir los segmentos en JSONL a medida que se transcriben (sobrevive a caídas)")
+    add_cli_args(parser)
     args = parser.parse_args()
+    config = from_cli_args(args)
 
     url = args.url or "https://www.facebook.com/cesardockweilersuarez/videos/1399478394994936"
 
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    try:
-        archivo = descargar_audio(url)
-        if archivo:
-            texto = transcribir(archivo)
+    with JobWorkspace("transcriptor", ram=args.ram or None) as ws:
+        archivo = descargar_audio(url, ws.path("audio"), args.audio_mode)
+        if archivo and args.jsonl:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            outpath = outdir / f"transcripcion_{stamp}.jsonl"
+            with JsonlSink(str(outpath)) as sink:
+                transcribir_a_jsonl(archivo, sink, args.audio_mode, url=url, config=config)
+            print(f"✅ ¡Listo! Guardado en '{outpath}'")
+        elif archivo:
+            texto = transcribir(archivo, args.audio_mode, config)
 
             # Guardar con nombre único
             stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
@@ -90,5 +156,3 @@ if __name__ == "__main__":
             print(f"✅ ¡Listo! Guardado en '{outpath}'")
         else:
             print("❌ No se pudo descargar el audio. Revisa la URL o cookies si es Facebook/TikTok.")
-    finally:
-        limpiar()
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Subida de resultados JSON a Appwrite Storage desde memoria.
+
+Antes cada resultado se escribía con `indent=2` a un archivo temporal, se volvía
+a leer con `InputFile.from_path` y se borraba. Ahora:
+- se serializa compacto (sin indentación ni espacios),
+- opcionalmente se comprime con gzip (el nombre lleva `.gz`),
+- se sube con `InputFile.from_bytes`; el SDK parte en chunks de 5 MB los
+  archivos más grandes, sin pasar por disco.
+
+Variables de entorno:
+- UPLOAD_GZIP: "1" para comprimir por defecto (default: "0")
+- APPWRITE_STORAGE_DIR: si está definido, se usa local_storage.LocalStorage en
+  ese directorio en vez del servidor (desarrollo, pruebas y benchmarks)
+"""
+
+import gzip
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+
+def get_storage(client=None):
+    """Storage de Appwrite, o el stand-in local si APPWRITE_STORAGE_DIR está definido"""
+    directory = os.environ.get("APPWRITE_STORAGE_DIR")
+    if directory:
+        from local_storage import LocalStorage
+        return LocalStorage(directory)
+    from appwrite.services.storage import Storage
+    return Storage(client)
+
+
+def gzip_default() -> bool:
+    return os.environ.get("UPLOAD_GZIP", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def serialize_json(data: Any, filename: str, compress: Optional[bool] = None) -> Tuple[bytes, str, str]:
+    """(bytes, nombre final, mime type) del JSON compacto, comprimido si corresponde"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if compress if compress is not None else gzip_default():
+        # mtime=0: el mismo resultado produce los mismos bytes
+        return gzip.compress(payload, compresslevel=6, mtime=0), f"{filename}.gz", "application/gzip"
+    return payload, filename, "application/json"
+
+
+def upload_json(storage, bucket_id: str, data: Any, filename: str, compress: Optional[bool] = None,
+                file_id: Optional[str] = None) -> Dict[str, Any]:
+    """Serializa y sube `data` sin archivo temporal; devuelve el archivo creado (con "name" final)"""
+    from appwrite.id import ID
+    from appwrite.input_file import InputFile
+
+    payload, name, mime_type = serialize_json(data, filename, compress)
+    return storage.create_file(
+        bucket_id=bucket_id,
+        file_id=file_id or ID.unique(),
+        file=InputFile.from_bytes(payload, filename=name, mime_type=mime_type)
+    )
@@ -0,0 +1,182 @@
+"""
+Esperas por eventos para los loops de expansión del scraper.
+
+En vez de dormir un tiempo fijo después de cada scroll o click, se espera a que
+pase algo en la página:
+- un MutationObserver instalado en la página cuenta los nodos agregados y marca
+  el momento del último cambio,
+- los eventos request / requestfinished / requestfailed llevan la cuenta de las
+  peticiones XHR/fetch en vuelo.
+
+`wait_for_growth` vuelve apenas aparecen nodos nuevos y la página queda quieta
+(sin cambios en el DOM durante `quiet_ms` y sin peticiones en vuelo), o al
+llegar a `max_wait`. Opcionalmente se agrega un jitter aleatorio después de cada
+espera para no golpear a Facebook con clicks a intervalos exactos.
+
+`AsyncPageWaiter` es la misma espera para páginas de playwright.async_api.
+
+Variables de entorno:
+- SCRAPE_MAX_WAIT: tope de cada espera en segundos (default: 8)
+- SCRAPE_QUIET_MS: tiempo sin cambios para considerar la página quieta (default: 500)
+- SCRAPE_JITTER: "min,max" en segundos, pausa extra después de cada espera (default: "0.2,0.8")
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Optional, Tuple
+
+INSTALL_JS = """
+() => {
+    if (!window.__scrapWatch) {
+        const watch = {added: 0, last: performance.now()};
+        new MutationObserver((mutations) => {
+            for (const m of mutations) watch.added += m.addedNodes.length;
+            watch.last = performance.now();
+        }).observe(document.documentElement, {childList: true, subtree: true});
+        window.__scrapWatch = watch;
+    }
+    return [window.__scrapWatch.added, performance.now() - window.__scrapWatch.last];
+}
+"""
+
+NETWORK_TYPES = ("xhr", "fetch")
+
+
+def _parse_jitter(value: Optional[str]) -> Tuple[float, float]:
+    if not value:
+        return (0.0, 0.0)
+    partes = [float(p) for p in value.split(",")]
+    return (partes[0], partes[-1])
+
+
+class PageWaiter:
+    """Esperas acotadas que terminan cuando la página cambia y se queda quieta"""
+
+    def __init__(self, page, max_wait: Optional[float] = None, quiet_ms: Optional[int] = None,
+                 jitter: Optional[Tuple[float, float]] = None, poll_ms: int = 100):
+        self.page = page
+        self.max_wait = max_wait if max_wait is not None else float(os.environ.get("SCRAPE_MAX_WAIT", "8"))
+        self.quiet_ms = quiet_ms if quiet_ms is not None else int(os.environ.get("SCRAPE_QUIET_MS", "500"))
+        self.jitter = jitter if jitter is not None else _parse_jitter(os.environ.get("SCRAPE_JITTER", "0.2,0.8"))
+        self.poll_ms = poll_ms
+        self.inflight = 0
+        self.stats = {"waits": 0, "timeouts": 0, "waited_s": 0.0}
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_done)
+        page.on("requestfailed", self._on_done)
+
+    def _on_request(self, request):
+        if request.resource_type in NETWORK_TYPES:
+            self.inflight += 1
+
+    def _on_done(self, request):
+        if request.resource_type in NETWORK_TYPES:
+            self.inflight = max(0, self.inflight - 1)
+
+    def _state(self) -> Tuple[int, float]:
+        """(nodos agregados desde que se instaló el observer, ms desde el último cambio)"""
+        try:
+            added, idle_ms = self.page.evaluate(INSTALL_JS)
+            return int(added), float(idle_ms)
+        except Exception:
+            # Navegación en curso: el contexto de JS se está reemplazando
+            return 0, 0.0
+
+    def mark(self) -> int:
+        """Punto de referencia antes de una acción (scroll, click)"""
+        return self._state()[0]
+
+    def _wait(self, base: Optional[int], max_wait: Optional[float]) -> bool:
+        t0 = time.perf_counter()
+        deadline = t0 + (max_wait if max_wait is not None else self.max_wait)
+        grew = base is None
+        while True:
+            added, idle_ms = self._state()
+            if base is not None and added > base:
+                grew = True
+            if grew and idle_ms >= self.quiet_ms and self.inflight == 0:
+                break
+            if time.perf_counter() >= deadline:
+                self.stats["timeouts"] += 1
+                break
+            self.page.wait_for_timeout(self.poll_ms)
+
+        self.stats["waits"] += 1
+        self.stats["waited_s"] += time.perf_counter() - t0
+        self.polite()
+        return base is None or grew
+
+    def wait_for_growth(self, base: int, max_wait: Optional[float] = None) -> bool:
+        """
+        Espera nodos nuevos respecto a `base` (de `mark()`) y que la página se quede quieta.
+        Devuelve False si no apareció nada antes de `max_wait`.
+        """
+        return self._wait(base, max_wait)
+
+    def settle(self, max_wait: Optional[float] = None):
+        """Espera a que el DOM y la red se queden quietos (p. ej. después de navegar)"""
+        self._wait(None, max_wait)
+
+    def polite(self):
+        low, high = self.jitter
+        if high > 0:
+            self.page.wait_for_timeout(random.uniform(low, high) * 1000)
+
+    def close(self):
+        for event, handler in (("request", self._on_request), ("requestfinished", self._on_done),
+                               ("requestfailed", self._on_done)):
+            try:
+                self.page.remove_listener(event, handler)
+            except Exception:
+                pass
+
+    def summary(self) -> str:
+        return (f"{self.stats['waits']} esperas, {self.stats['waited_s']:.1f}s en total, "
+                f"{self.stats['timeouts']} al tope de {self.max_wait:.0f}s")
+
+
+class AsyncPageWaiter(PageWaiter):
+    """PageWaiter para páginas de playwright.async_api (mismos eventos y estadísticas)"""
+
+    async def _state(self) -> Tuple[int, float]:
+        try:
+            added, idle_ms = await self.page.evaluate(INSTALL_JS)
+            return int(added), float(idle_ms)
+        except Exception:
+            return 0, 0.0
+
+    async def mark(self) -> int:
+        return (await self._state())[0]
+
+    async def _wait(self, base: Optional[int], max_wait: Optional[float]) -> bool:
+        t0 = time.perf_counter()
+        deadline = t0 + (max_wait if max_wait is not None else self.max_wait)
+        grew = base is None
+        while True:
+            added, idle_ms = await self._state()
+            if base is not None and added > base:
+                grew = True
+            if grew and idle_ms >= self.quiet_ms and self.inflight == 0:
+                break
+            if time.perf_counter() >= deadline:
+                self.stats["timeouts"] += 1
+                break
+            await asyncio.sleep(self.poll_ms / 1000)
+
+        self.stats["waits"] += 1
+        self.stats["waited_s"] += time.perf_counter() - t0
+        await self.polite()
+        return base is None or grew
+
+    async def wait_for_growth(self, base: int, max_wait: Optional[float] = None) -> bool:
+        return await self._wait(base, max_wait)
+
+    async def settle(self, max_wait: Optional[float] = None):
+        await self._wait(None, max_wait)
+
+    async def polite(self):
+        low, high = self.jitter
+        if high > 0:
+            await asyncio.sleep(random.uniform(low, high))
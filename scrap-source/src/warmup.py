@@ -0,0 +1,44 @@
+"""
+Pre-descarga y calentamiento del modelo Whisper.
+
+En el build / deploy (deja los pesos en WHISPER_CACHE_DIR, sin cargarlos):
+    WHISPER_CACHE_DIR=src/models python src/warmup.py --download-only
+
+Al arrancar una instancia (carga el modelo e inferencia sobre 1 s de silencio):
+    python src/warmup.py --preset fast
+
+La función de Appwrite expone lo mismo con {"action": "warmup"}.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from engine import add_cli_args, download_model, from_cli_args, warmup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descarga y calienta el modelo Whisper")
+    parser.add_argument("--download-only", action="store_true",
+                        help="Solo descargar los pesos a WHISPER_CACHE_DIR / --download-root (para el build)")
+    add_cli_args(parser)
+    args = parser.parse_args()
+    config = from_cli_args(args)
+
+    if args.download_only:
+        t0 = time.perf_counter()
+        ruta = download_model(config)
+        print(f"⬇️  Modelo '{config.model_size}' en {ruta} ({time.perf_counter() - t0:.1f}s)")
+        return
+
+    print(f"⚙️  Calentando modelo '{config.model_size}' ({config.compute_type}, {config.device})...")
+    resultado = warmup(config)
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Espacios de trabajo temporales por job.
+
+Cada job (una transcripción, un scraping, una corrida del runner) obtiene su propio
+directorio único, así dos invocaciones en el mismo contenedor nunca comparten
+archivos temporales. El directorio se borra al salir del bloque `with`, y como
+respaldo también cuando el objeto se recolecta o el intérprete termina.
+
+Variables de entorno:
+- SCRAP_WORKSPACE_DIR: directorio raíz (default: el temporal del sistema)
+- SCRAP_WORKSPACE_RAM: "1" para usar un tmpfs en RAM (/dev/shm) si está disponible
+"""
+
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+from typing import Optional
+
+RAM_DIRS = ["/dev/shm"]
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def resolve_root(root: Optional[str] = None, ram: Optional[bool] = None) -> str:
+    """Elige el directorio raíz: explícito, tmpfs si se pide y existe, o el temporal del sistema"""
+    if root:
+        return root
+    if ram is None:
+        ram = _env_flag("SCRAP_WORKSPACE_RAM")
+    if ram:
+        for candidate in RAM_DIRS:
+            if os.path.isdir(candidate) and os.access(candidate, os.W_OK):
+                return candidate
+        print("⚠️  No hay tmpfs disponible, usando el directorio temporal del sistema")
+    return os.environ.get("SCRAP_WORKSPACE_DIR") or tempfile.gettempdir()
+
+
+class JobWorkspace:
+    """
+    Directorio temporal único para un job.
+
+        with JobWorkspace("transcribe") as ws:
+            audio = descargar_audio(url, temp_path=ws.path("audio"))
+    """
+
+    def __init__(self, prefix: str = "job", root: Optional[str] = None, ram: Optional[bool] = None):
+        self.prefix = prefix
+        self.root = resolve_root(root, ram)
+        self.job_id = uuid.uuid4().hex[:12]
+        self.dir: Optional[str] = None
+        self._finalizer = None
+
+    def create(self) -> "JobWorkspace":
+        if self.dir is None:
+            os.makedirs(self.root, exist_ok=True)
+            self.dir = tempfile.mkdtemp(prefix=f"{self.prefix}-{self.job_id}-", dir=self.root)
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self.dir, True)
+        return self
+
+    def path(self, name: str) -> str:
+        """Ruta dentro del workspace (solo el nombre base, nunca sale del directorio)"""
+        self.create()
+        return os.path.join(self.dir, os.path.basename(name))
+
+    def cleanup(self):
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self.dir = None
+
+    def __enter__(self) -> "JobWorkspace":
+        return self.create()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+        return False
@@ -0,0 +1,6 @@
+"""Los módulos de src/ se importan directo, como en los scripts y la función"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
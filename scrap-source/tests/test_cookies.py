@@ -0,0 +1,44 @@
+import pytest
+
+from cookies import CookieError, check_expiry, parse_cookies, to_netscape
+
+AHORA = 1_800_000_000
+
+
+def cookie(name, expires=None, **campos):
+    return {"name": name, "value": "v", "domain": ".facebook.com", "path": "/",
+            **({"expires": expires} if expires is not None else {}), **campos}
+
+
+def test_check_expiry_sesion_vigente():
+    info = check_expiry([cookie("c_user", AHORA + 60), cookie("xs", AHORA + 120), cookie("datr", AHORA - 1)],
+                        now=AHORA)
+    assert info["cookies"] == 3 and info["expired"] == ["datr"]
+    assert info["session_expires"].startswith("2027-01-15")
+
+
+def test_check_expiry_sesion_vencida():
+    with pytest.raises(CookieError, match="xs"):
+        check_expiry([cookie("c_user", AHORA + 60), cookie("xs", AHORA - 1)], now=AHORA)
+
+
+def test_check_expiry_todas_vencidas():
+    with pytest.raises(CookieError):
+        check_expiry([cookie("datr", AHORA - 1)], now=AHORA)
+
+
+def test_parse_cookies_sanea_y_acepta_expiration_date():
+    cookies = parse_cookies('[{"name": "xs", "value": "1", "domain": ".facebook.com", '
+                            '"expirationDate": 123, "sameSite": "no_restriction", "httpOnly": 1}]')
+    assert cookies == [{"name": "xs", "value": "1", "domain": ".facebook.com", "path": "/", "sameSite": "Lax",
+                        "httpOnly": True, "expires": 123}]
+    with pytest.raises(CookieError):
+        parse_cookies("{}")
+
+
+def test_to_netscape():
+    texto = to_netscape([cookie("xs", AHORA, httpOnly=True, secure=True), cookie("lang", domain="facebook.com")])
+    lineas = texto.splitlines()
+    assert lineas[0] == "# Netscape HTTP Cookie File"
+    assert lineas[1].split("\t") == ["#HttpOnly_.facebook.com", "TRUE", "/", "TRUE", str(AHORA), "xs", "v"]
+    assert lineas[2].split("\t") == ["facebook.com", "FALSE", "/", "FALSE", "0", "lang", "v"]
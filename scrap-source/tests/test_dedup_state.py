@@ -0,0 +1,86 @@
+import json
+
+from cache import LocalCacheBackend
+from dedup import CommentIndex, comment_key, dedup_comments
+from scrape_state import (STATE_VERSION, ScrapeStateStore, comment_keys, is_known, known_keys, new_comments,
+                          normalize_post_url, post_key, update_state)
+
+
+def comentario(comment_id=None, author="Ana", text="👏", **campos):
+    return {"comment_id": comment_id, "author": author, "text": text, **campos}
+
+
+def test_comment_key_prefiere_el_id():
+    assert comment_key(comentario("10")) == "id:10"
+    assert comment_key(comentario()).startswith("h:")
+    # El hash normaliza espacios y mayúsculas
+    assert comment_key(comentario(text="Hola  Mundo")) == comment_key(comentario(text="hola mundo"))
+
+
+def test_comment_index_no_fusiona_ids_distintos_con_el_mismo_texto():
+    index = CommentIndex([comentario("1"), comentario("2")])
+    assert len(index) == 2
+
+
+def test_comment_index_completa_campos_del_repetido():
+    index = CommentIndex()
+    assert index.add(comentario("1", reactions=0))
+    assert not index.add(comentario("1", reactions=5, created_time="2026-01-01"))
+    assert index.duplicates == 1
+    assert index.records[0]["reactions"] == 5 and index.records[0]["created_time"] == "2026-01-01"
+
+
+def test_dedup_comments_conserva_el_orden():
+    assert [c["comment_id"] for c in dedup_comments([comentario("2"), comentario("1"), comentario("2")])] == ["2", "1"]
+
+
+def test_comment_keys_guarda_id_y_contenido():
+    keys = comment_keys(comentario("1"))
+    assert keys[0] == "id:1" and keys[1].startswith("h:")
+    assert comment_keys(comentario()) == [comment_key(comentario())]
+
+
+def test_mismo_autor_y_texto_con_otro_id_es_nuevo():
+    known = set(comment_keys(comentario("1")))
+    nuevo = comentario("2")
+    assert not is_known(nuevo, known)
+    assert new_comments([comentario("1"), nuevo], known) == [nuevo]
+
+
+def test_sin_id_se_reconoce_por_contenido_contra_estado_con_id():
+    known = set(comment_keys(comentario("1")))
+    assert is_known(comentario(), known)
+
+
+def test_new_comments_sin_estado_devuelve_todo():
+    comments = [comentario("1"), comentario("2")]
+    assert new_comments(comments, None) == comments
+
+
+def test_update_state_acumula():
+    url = "https://www.facebook.com/post/1?fbclid=abc"
+    estado = update_state(None, url, [comentario("1", created_time="2026-01-01")], {"filename": "a.json"})
+    estado = update_state(estado, url, [comentario("2", created_time="2026-01-02")], None)
+    assert estado["comment_count"] == 2
+    assert estado["last_created_time"] == "2026-01-02"
+    assert estado["snapshot"] == {"filename": "a.json"} and estado["snapshot_count"] == 1
+    assert {"id:1", "id:2"} <= known_keys(estado)
+
+
+def test_normalize_post_url_quita_tracking_y_host():
+    assert normalize_post_url("https://m.facebook.com/post/1/?fbclid=x&id=2#c") == "https://facebook.com/post/1?id=2"
+    assert post_key("https://www.facebook.com/post/1") == post_key("https://web.facebook.com/post/1/")
+
+
+def test_state_store_gana_el_mas_reciente(tmp_path):
+    bucket = LocalCacheBackend(str(tmp_path / "bucket"))
+    local = LocalCacheBackend(str(tmp_path / "local"))
+    url = "https://facebook.com/post/1"
+    key = post_key(url)
+    bucket.put(key, json.dumps({"version": STATE_VERSION, "updated_at": "2026-01-02", "n": "bucket"}).encode())
+    local.put(key, json.dumps({"version": STATE_VERSION, "updated_at": "2026-01-01", "n": "local"}).encode())
+
+    store = ScrapeStateStore([bucket, local])
+    assert store.get(url)["n"] == "bucket"
+    # El backend atrasado se refresca con el ganador
+    assert json.loads(local.get(key))["n"] == "bucket"
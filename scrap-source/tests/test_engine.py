@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from engine import ENV_VARS, EngineConfig
+
+
+@pytest.fixture(autouse=True)
+def entorno_limpio(monkeypatch):
+    for var in list(ENV_VARS.values()) + ["WHISPER_PRESET", "WHISPER_ALLOWED_MODELS"]:
+        monkeypatch.delenv(var, raising=False)
+
+
+def test_precedencia_preset_y_campos():
+    config = EngineConfig.resolve({"preset": "fast", "beam_size": "3"})
+    assert config.greedy and config.vad_filter and config.beam_size == 3
+
+
+def test_resolve_job_acepta_los_valores_conocidos():
+    config = EngineConfig.resolve_job({"preset": "accurate", "language": "es", "chunk_workers": 1})
+    assert config.compute_type == "int8_float32" and config.language == "es"
+
+
+@pytest.mark.parametrize("overrides", [
+    {"model_size": "large-v3"},
+    {"download_root": "/etc"},
+    {"device": "tpu"},
+    {"compute_type": "float64"},
+    {"chunk_backend": "fork"},
+    {"beam_size": 50},
+    {"preset": "turbo"},
+    {"num_workers": 0},
+])
+def test_resolve_job_rechaza(overrides):
+    with pytest.raises(ValueError):
+        EngineConfig.resolve_job(overrides)
+
+
+def test_resolve_job_con_modelos_permitidos(monkeypatch):
+    monkeypatch.setenv("WHISPER_ALLOWED_MODELS", "small, medium")
+    assert EngineConfig.resolve_job({"model_size": "medium"}).model_size == "medium"
+
+
+def test_hilos_recortados_a_los_nucleos():
+    config = EngineConfig.resolve_job({"cpu_threads": 10_000, "num_workers": 10_000})
+    assert config.cpu_threads == config.num_workers == (os.cpu_count() or 1)
+
+
+def test_model_key_ignora_la_decodificacion():
+    base = EngineConfig()
+    assert base.model_key() == base.with_values({"beam_size": 1, "chunk_workers": 4}).model_key()
+    assert base.model_key() != base.with_values({"model_size": "tiny"}).model_key()
@@ -0,0 +1,35 @@
+import json
+
+from graphql_capture import comments_from_har, parse_payload
+
+COMENTARIO = {
+    "__typename": "Comment", "legacy_fbid": "111", "author": {"name": "Ana", "id": "9"},
+    "body": {"text": "Hola"}, "created_time": 1_700_000_000, "feedback": {"reactors": {"count": 3}},
+}
+
+
+def test_parse_payload_varios_documentos():
+    respuesta = {"data": {"node": {"comments": {"edges": [{"node": COMENTARIO}]}}}}
+    # Facebook manda varios JSON seguidos en la misma respuesta
+    texto = json.dumps(respuesta) + "\n" + json.dumps({"extensions": {}})
+    comments = parse_payload(texto)
+    assert len(comments) == 1
+    assert comments[0]["comment_id"] == "111" and comments[0]["author"] == "Ana"
+    assert comments[0]["text"] == "Hola" and comments[0]["reactions"] == 3
+    assert comments[0]["created_time"].startswith("2023-11-14")
+
+
+def test_parse_payload_ignora_basura():
+    assert parse_payload("for (;;);") == []
+
+
+def test_comments_from_har(tmp_path):
+    har = {"log": {"entries": [
+        {"request": {"url": "https://www.facebook.com/api/graphql/"},
+         "response": {"content": {"text": json.dumps({"data": {"comment": COMENTARIO}})}}},
+        {"request": {"url": "https://www.facebook.com/static/app.js"},
+         "response": {"content": {"text": json.dumps({"data": {"comment": {**COMENTARIO, "legacy_fbid": "2"}}})}}},
+    ]}}
+    path = tmp_path / "post.har"
+    path.write_text(json.dumps(har), encoding="utf-8")
+    assert [c["comment_id"] for c in comments_from_har(str(path))] == ["111"]
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from jobs import DONE, FAILED, QUEUED, RUNNING, JobScheduler, SqliteJobQueue, public_view
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SqliteJobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2)
+
+
+def test_claim_toma_el_mas_antiguo_una_sola_vez(queue):
+    primero = queue.enqueue("transcribe", {"url": "a"})
+    queue.enqueue("transcribe", {"url": "b"})
+
+    job = queue.claim("w1")
+    assert job["id"] == primero["id"]
+    assert job["status"] == RUNNING and job["attempts"] == 1
+    assert job["worker"].startswith("w1:")
+
+    otro = queue.claim("w2")
+    assert otro["payload"] == {"url": "b"}
+    assert queue.claim("w3") is None
+
+
+def test_complete_borra_el_payload(queue):
+    queue.enqueue("transcribe", {"url": "a", "cookies": "x"})
+    job = queue.claim("w")
+    assert queue.complete(job["id"], {"ok": True}, job["worker"])
+
+    guardado = queue.get(job["id"])
+    assert guardado["status"] == DONE and guardado["result"] == {"ok": True}
+    assert guardado["payload"] is None
+    assert "payload" not in public_view(guardado)
+
+
+def test_fail_reintenta_hasta_max_attempts(queue):
+    queue.enqueue("transcribe", {"url": "a"})
+    job = queue.claim("w")
+    assert queue.fail(job["id"], "boom", job["worker"])
+    assert queue.get(job["id"])["status"] == QUEUED
+
+    job = queue.claim("w")
+    assert job["attempts"] == 2
+    assert queue.fail(job["id"], "boom", job["worker"])
+    final = queue.get(job["id"])
+    assert final["status"] == FAILED and final["error"] == "boom" and final["payload"] is None
+
+
+def test_claim_viejo_no_escribe_despues_de_requeue(queue):
+    queue.enqueue("transcribe", {"url": "a"})
+    viejo = queue.claim("w1")
+    # Sin heartbeat: vuelve a la cola y otro worker lo toma
+    assert queue.requeue_stale(-1) == 1
+    nuevo = queue.claim("w2")
+    assert nuevo["id"] == viejo["id"] and nuevo["worker"] != viejo["worker"]
+
+    assert not queue.update_progress(viejo["id"], {"stage": "x"}, viejo["worker"])
+    assert not queue.complete(viejo["id"], {"de": "viejo"}, viejo["worker"])
+    assert not queue.fail(viejo["id"], "tarde", viejo["worker"])
+
+    assert queue.complete(nuevo["id"], {"de": "nuevo"}, nuevo["worker"])
+    assert queue.get(nuevo["id"])["result"] == {"de": "nuevo"}
+
+
+def test_requeue_stale_respeta_el_heartbeat(queue):
+    queue.enqueue("transcribe", {"url": "a"})
+    job = queue.claim("w")
+    assert queue.requeue_stale(60) == 0
+    assert queue.get(job["id"])["status"] == RUNNING
+
+
+def test_enqueue_con_clave_no_duplica_jobs_activos(queue):
+    job = queue.enqueue("transcribe", {"url": "a"}, key="a")
+    assert queue.enqueue("transcribe", {"url": "a"}, key="a") is None
+
+    claim = queue.claim("w")
+    assert queue.enqueue("transcribe", {"url": "a"}, key="a") is None
+    queue.complete(claim["id"], {"ok": True}, claim["worker"])
+
+    # Un job terminado se vuelve a encolar desde cero con el mismo ID
+    again = queue.enqueue("transcribe", {"url": "a"}, key="a")
+    assert again["id"] == job["id"]
+    reiniciado = queue.get(job["id"])
+    assert reiniciado["status"] == QUEUED and reiniciado["attempts"] == 0 and reiniciado["result"] is None
+    assert queue.counts()[QUEUED] == 1
+
+
+def test_scheduler_drain(queue):
+    for url in ("a", "b", "c"):
+        queue.enqueue("transcribe", {"url": url})
+
+    def handler(job, progress):
+        progress("working", url=job["payload"]["url"])
+        if job["payload"]["url"] == "b":
+            return {"ok": False}, 400
+        if job["payload"]["url"] == "c" and job["attempts"] == 1:
+            raise RuntimeError("transitorio")
+        return {"ok": True}, 200
+
+    scheduler = JobScheduler(queue, handler, workers=2, poll_interval=0.01, log=lambda *_: None)
+    stats = scheduler.drain(time_budget=10)
+    assert stats["done"] == 2 and stats["failed"] == 1 and stats["retried"] == 1
+    assert queue.counts() == {QUEUED: 0, RUNNING: 0, DONE: 2, FAILED: 1}
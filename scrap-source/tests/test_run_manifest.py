@@ -0,0 +1,52 @@
+from run_manifest import DOWNLOADED, FAILED, PENDING, TRANSCRIBED, RunManifest, media_id, output_name
+
+
+def test_media_id_y_output_name():
+    info = {"id": "Ab/C", "extractor_key": "Youtube"}
+    assert media_id(info) == "youtube-ab_c"
+    assert media_id({}) is None
+    assert output_name("https://x", info) == "transcripcion_youtube-ab_c.txt"
+    assert output_name("https://x") == output_name("https://x") != output_name("https://y")
+
+
+def test_resume_gana_el_ultimo_registro(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    manifest = RunManifest(path)
+    manifest.record("u1", PENDING, output="a.txt")
+    manifest.record("u1", DOWNLOADED)
+    manifest.record("u2", FAILED, error="boom")
+
+    retomado = RunManifest(path, resume=True)
+    assert retomado.get("u1")["state"] == DOWNLOADED and retomado.get("u1")["output"] == "a.txt"
+    assert retomado.counts() == {PENDING: 0, DOWNLOADED: 1, TRANSCRIBED: 0, FAILED: 1}
+
+
+def test_sin_resume_empieza_de_cero(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    RunManifest(path).record("u1", TRANSCRIBED)
+    assert RunManifest(path).get("u1") is None
+
+
+def test_linea_truncada_no_corrompe_el_siguiente_registro(tmp_path):
+    path = tmp_path / "run.jsonl"
+    RunManifest(str(path)).record("u1", TRANSCRIBED, output="a.txt")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"url": "u2", "sta')
+
+    retomado = RunManifest(str(path), resume=True)
+    assert retomado.get("u2") is None
+    retomado.record("u3", PENDING)
+    assert RunManifest(str(path), resume=True).get("u3")["state"] == PENDING
+
+
+def test_remaining_y_done_media(tmp_path):
+    (tmp_path / "a.txt").write_text("texto", encoding="utf-8")
+    manifest = RunManifest(str(tmp_path / "run.jsonl"))
+    manifest.record("u1", TRANSCRIBED, output="a.txt", media_id="yt-1")
+    manifest.record("u2", TRANSCRIBED, output="borrado.txt")
+    manifest.record("u3", FAILED)
+
+    # Transcrita pero sin la salida en disco se repite; las fallidas también
+    assert manifest.remaining(["u1", "u2", "u3", "u4"], str(tmp_path)) == ["u2", "u3", "u4"]
+    assert manifest.done_media("yt-1", str(tmp_path))["url"] == "u1"
+    assert manifest.done_media("yt-2", str(tmp_path)) is None
@@ -0,0 +1,67 @@
+import threading
+
+from spool import PCM_BYTES_POR_SEGUNDO, DownloadSpool, estimate_pcm, estimate_size
+
+
+def test_estimate_size():
+    assert estimate_size(None) == 0
+    assert estimate_size({"filesize": 1234, "duration": 10}) == 1234
+    assert estimate_size({"filesize_approx": 99}) == 99
+    assert estimate_size({"duration": 10}) == 160000
+
+
+def test_estimate_pcm(tmp_path):
+    assert estimate_pcm({"duration": 10}) == 10 * PCM_BYTES_POR_SEGUNDO
+    audio = tmp_path / "audio.m4a"
+    audio.write_bytes(b"x" * 16000)
+    # Sin duración se deduce del tamaño del audio (~128 kbps)
+    assert estimate_pcm({}, str(audio)) == PCM_BYTES_POR_SEGUNDO
+
+
+def test_settle_ajusta_al_tamano_real(tmp_path):
+    spool = DownloadSpool(str(tmp_path), max_bytes=1000)
+    ticket = spool.acquire(800)
+    audio = tmp_path / "a"
+    audio.write_bytes(b"x" * 100)
+    spool.settle(ticket, str(audio), extra=50)
+    assert spool.used_bytes == 150
+    spool.release(ticket)
+    assert spool.used_bytes == 0 and spool.stats["pico_bytes"] == 800
+
+
+def test_el_primero_pasa_aunque_supere_el_presupuesto(tmp_path):
+    spool = DownloadSpool(str(tmp_path), max_bytes=10)
+    spool.acquire(1000)
+    assert spool.used_bytes == 1000
+
+
+def _espera(spool, estimate, resultado):
+    hilo = threading.Thread(target=lambda: resultado.append(spool.acquire(estimate)), daemon=True)
+    hilo.start()
+    hilo.join(0.2)
+    return hilo
+
+
+def test_acquire_bloquea_por_bytes_hasta_release(tmp_path):
+    spool = DownloadSpool(str(tmp_path), max_bytes=1000)
+    primero = spool.acquire(700)
+    resultado = []
+    hilo = _espera(spool, 500, resultado)
+    assert hilo.is_alive() and not resultado
+
+    spool.release(primero)
+    hilo.join(2)
+    assert resultado and spool.used_bytes == 500
+    assert spool.stats["esperas"] == 1
+
+
+def test_acquire_bloquea_por_items(tmp_path):
+    spool = DownloadSpool(str(tmp_path), max_items=1)
+    primero = spool.acquire(0)
+    resultado = []
+    hilo = _espera(spool, 0, resultado)
+    assert hilo.is_alive()
+
+    spool.release(primero)
+    hilo.join(2)
+    assert resultado and spool.stats["pico_items"] == 1